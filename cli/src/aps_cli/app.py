@@ -2,21 +2,29 @@
 # APS CLI – clean baseline
 # ------------------------------------------------------------
 # Features:
-# - validate | build | publish | pull | run (sync/--stream) | logs | inspect | registry serve
-# - Self-healing registry:// resolver with cache verification
+# - validate | build | publish | pull | warm | run (sync/--stream/--batch) | logs | inspect | registry serve
+# - Warm execution via `aps pool serve`: worker pool (`worker: true`) or fork server (`-m module`)
+# - Self-healing registry:// resolver with cache verification; cache-first
+#   (pinned id@version needs no network, TTL'd metadata cache, --offline)
+# - Content-addressed package cache (sha256 blobs + index), locked atomic installs
 # - Robust streaming (write->flush->close stdin BEFORE reading)
-# - Sync path merges stderr->stdout to avoid 3.13 pipe race
+# - Sync path merges stderr->stdout to avoid 3.13 pipe race; output is streamed
+#   to the log with a bounded tail for final-frame detection
 # - Log persistence under ~/.aps/logs
 # - Clear stderr logging for all non-JSON chatter
 # ------------------------------------------------------------
 
 from __future__ import annotations
-import os, sys, json, argparse, tarfile, shutil, subprocess, threading, time, shlex
+import os, io, sys, json, argparse, tarfile, shutil, subprocess, threading, time, shlex, gzip, hashlib, stat
+from collections import deque
 from pathlib import Path
 from typing import Any, Dict, Optional
 from pathlib import Path
 import base64
 
+from . import cache as _cache
+from . import merkle
+
 # Optional cryptography imports - only needed for sign/verify
 try:
     from cryptography.hazmat.primitives.asymmetric import ed25519
@@ -124,7 +132,88 @@ def _verify_sig(pub_key, payload: bytes, sig: bytes) -> bool:
         return True
     except Exception:
         return False
-    
+
+# Signature envelope (<pkg>.sig): Ed25519 over a small canonical JSON payload
+# naming the package's sha256, size, id@version and the signing key, so the
+# tarball is only ever streamed through the hash. Packages built with
+# aps/files.json also get its Merkle root signed ("files", see merkle.py), which
+# lets extracted agents be checked file by file. Older .sig files are a raw
+# Ed25519 signature over the whole tarball and still verify.
+SIG_FORMAT = "aps-sig/v1"
+
+def _canonical_json(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def _pub_fingerprint(pub_key) -> str:
+    return _fingerprint_pubkey(pub_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    ))
+
+def _sign_envelope(priv_key, pkg: Path, digest: str, size: int, agent_id: Optional[str] = None,
+                   version: Optional[str] = None, files: Optional[dict] = None) -> dict:
+    meta = {
+        "format": SIG_FORMAT,
+        "file": pkg.name,
+        "digest": f"sha256:{digest}",
+        "size": size,
+        "id": agent_id,
+        "version": version,
+        "key": _pub_fingerprint(priv_key.public_key()),
+    }
+    if files:
+        meta["files"] = files
+    payload = _canonical_json(meta)
+    return {
+        "payload": base64.b64encode(payload).decode("ascii"),
+        "signature": base64.b64encode(_sign_bytes(priv_key, payload)).decode("ascii"),
+    }
+
+def _open_envelope(pub_key, sig_bytes: bytes) -> tuple[bool, str, Optional[dict]]:
+    """Check an envelope's signature and key; returns (ok, message, payload)."""
+    try:
+        env = json.loads(sig_bytes)
+        payload = base64.b64decode(env["payload"], validate=True)
+        sig = base64.b64decode(env["signature"], validate=True)
+    except Exception:
+        return False, "not an envelope", None
+    if not _verify_sig(pub_key, payload, sig):
+        return False, "Signature does not match", None
+    meta = json.loads(payload)
+    if meta.get("format") != SIG_FORMAT:
+        return False, f"unsupported signature format: {meta.get('format')!r}", meta
+    if meta.get("key") != _pub_fingerprint(pub_key):
+        return False, "signature names a different key", meta
+    return True, "ok", meta
+
+def _check_signature(pub_key, sig_bytes: bytes, pkg: Path, digest: Optional[str] = None,
+                     size: Optional[int] = None, agent_id: Optional[str] = None,
+                     version: Optional[str] = None) -> tuple[bool, str, Optional[dict]]:
+    """
+    Verify sig_bytes (envelope or legacy raw signature) for pkg.
+    A known digest/size (e.g. computed while downloading) is used instead of
+    re-reading the file. Returns (ok, message, envelope payload or None).
+    """
+    ok, msg, meta = _open_envelope(pub_key, sig_bytes)
+    if msg == "not an envelope":
+        # legacy: raw signature over the whole tarball
+        ok = _verify_sig(pub_key, pkg.read_bytes(), sig_bytes)
+        return ok, ("ok" if ok else "Signature does not match"), None
+    if not ok:
+        return False, msg, meta
+    if size is None:
+        size = pkg.stat().st_size
+    if meta.get("size") != size:
+        return False, f"size mismatch (signed {meta.get('size')}, got {size})", meta
+    for field, want in (("id", agent_id), ("version", version)):
+        if want is not None and meta.get(field) is not None and meta[field] != want:
+            return False, f"signature is for {field} {meta[field]!r}, not {want!r}", meta
+    if digest is None:
+        digest = _cache.file_sha256(pkg)
+    if meta.get("digest") != f"sha256:{digest}":
+        return False, f"digest mismatch (signed {meta.get('digest')}, got sha256:{digest})", meta
+    return True, "ok", meta
+
 def _http_get_bytes(url: str, timeout=30) -> bytes | None:
     try:
         r = requests.get(url, timeout=timeout, stream=True)
@@ -138,28 +227,127 @@ def _http_get_bytes(url: str, timeout=30) -> bytes | None:
     except Exception:
         return None
 
-def _download_package(reg: str, agent_id: str, ver: str) -> Path:
-    """Download the tarball to a temp file and return its path (caller extracts/cleans)."""
-    urls = [
-        f"{reg}/v1/pull/{agent_id}/{ver}",
-        f"{reg}/v1/pull?id={agent_id}&version={ver}",
-        f"{reg}/v1/pull?id={agent_id}",  # legacy
-    ]
-    last_err = None
-    for url in urls:
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".aps.tar.gz") as tmp:
-                tmp_path = Path(tmp.name)
-                with requests.get(url, stream=True, timeout=30) as r:
-                    r.raise_for_status()
-                    for chunk in r.iter_content(chunk_size=65536):
-                        if chunk:
-                            tmp.write(chunk)
-            return tmp_path
-        except Exception as e:
-            last_err = e
-    raise RuntimeError(f"failed to download {agent_id}@{ver}: {last_err}")
+# ------------------------------ Downloads (resumable, optionally parallel)
+
+PIECE_SIZE = 8 * 1024 * 1024  # parallel download unit (and resume granularity)
+
+def _content_range_total(r) -> Optional[int]:
+    """Total size from a 206 `Content-Range: bytes a-b/total` header."""
+    cr = r.headers.get("Content-Range", "")
+    total = cr.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+def _digest_header(r) -> Optional[str]:
+    """sha256 hex from `X-APS-Digest: sha256:<hex>`, if the registry sent one (also on a redirect to storage)."""
+    for resp in [r, *getattr(r, "history", [])]:
+        algo, _, value = resp.headers.get("X-APS-Digest", "").partition(":")
+        if algo == "sha256" and value:
+            return value
+    return None
 
+def _fetch_sequential(url: str, blob, http=None) -> tuple[Optional[str], int]:
+    http = http or requests
+    headers = {}
+    if blob.size:
+        # resume; If-Range makes the server send the full body if the file changed
+        headers["Range"] = f"bytes={blob.size}-"
+        if blob.etag:
+            headers["If-Range"] = blob.etag
+    r = http.get(url, stream=True, timeout=60, headers=headers)
+    if r.status_code == 416:
+        # nothing left to fetch by range (stale partial): start over
+        r.close()
+        blob.reset()
+        r = http.get(url, stream=True, timeout=60, headers={})
+    r.raise_for_status()
+    if blob.size and r.status_code != 206:
+        blob.reset()
+    blob.etag = r.headers.get("ETag")
+    fetched = 0
+    for chunk in r.iter_content(chunk_size=_cache.CHUNK):
+        if chunk:
+            blob.write(chunk)
+            fetched += len(chunk)
+    return _digest_header(r), fetched
+
+def _fetch_parallel(url: str, blob, total: int, workers: int, etag: Optional[str], http=None) -> int:
+    """Fetch PIECE_SIZE ranges concurrently into blob.path; finished pieces survive for resume."""
+    from concurrent.futures import ThreadPoolExecutor
+    http = http or requests
+    done_file = blob.sidecar("chunks")
+    try:
+        done = set(json.loads(done_file.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        done = set()
+    pieces = [i for i in range((total + PIECE_SIZE - 1) // PIECE_SIZE) if i not in done]
+    lock = threading.Lock()
+    fd = os.open(blob.path, os.O_RDWR | os.O_CREAT)
+    try:
+        os.ftruncate(fd, total)
+
+        def fetch(i: int):
+            start, end = i * PIECE_SIZE, min(total, (i + 1) * PIECE_SIZE) - 1
+            headers = {"Range": f"bytes={start}-{end}"}
+            if etag:
+                headers["If-Range"] = etag
+            r = http.get(url, stream=True, timeout=60, headers=headers)
+            if r.status_code != 206:
+                raise RuntimeError(f"range request refused (HTTP {r.status_code})")
+            off = start
+            for chunk in r.iter_content(chunk_size=_cache.CHUNK):
+                if chunk:
+                    os.pwrite(fd, chunk, off)
+                    off += len(chunk)
+            if off != end + 1:
+                raise RuntimeError(f"short read for bytes {start}-{end}")
+            with lock:
+                done.add(i)
+                done_file.write_text(json.dumps(sorted(done)), encoding="utf-8")
+            return end + 1 - start
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            fetched = sum(ex.map(fetch, pieces))
+    finally:
+        os.close(fd)
+    blob.rehash()
+    return fetched
+
+def _not_modified(url: str, digest: str, http=None) -> bool:
+    """True if the registry answers If-None-Match: "<digest>" with 304 (we hold its bytes)."""
+    http = http or requests
+    try:
+        r = http.get(url, stream=True, timeout=30, headers={"If-None-Match": f'"{digest}"'})
+    except Exception:
+        return False
+    r.close()  # a 200 here means new content: the full download follows
+    return r.status_code == 304
+
+def _fetch_to_blob(url: str, blob, parallel: int = 1, http=None) -> tuple[Optional[str], int]:
+    """
+    Download url into a resumable BlobWriter. Resumes from bytes already on disk
+    via HTTP Range; with parallel > 1 and a large, range-capable resource, fetches
+    pieces concurrently. Returns (server X-APS-Digest sha256 or None, bytes fetched now);
+    by then every byte is on disk, so blob.path can be read before commit().
+    """
+    http = http or requests
+    done_file = blob.sidecar("chunks")
+    if parallel > 1 and (blob.size == 0 or done_file.exists()):
+        probe = http.get(url, stream=True, timeout=60, headers={"Range": "bytes=0-0"})
+        total = _content_range_total(probe) if probe.status_code == 206 else None
+        probe.close()
+        if total and total >= 2 * PIECE_SIZE:
+            etag = probe.headers.get("ETag")
+            if blob.etag and etag != blob.etag:
+                blob.reset()  # content changed since the partial download
+            blob.etag = etag
+            fetched = _fetch_parallel(url, blob, total, parallel, etag, http=http)
+            return _digest_header(probe), fetched
+    if done_file.exists():
+        blob.reset()  # partial parallel download is not a contiguous prefix
+    try:
+        return _fetch_sequential(url, blob, http=http)
+    finally:
+        blob.flush()
 
 def eprint(*a, **k):
     print(*a, file=sys.stderr, **k)
@@ -170,26 +358,46 @@ def _now_ts() -> str:
 def _logs_dir_for(agent_id: str, version: str) -> Path:
     return LOGS_DIR / agent_id / version
 
-def _write_log(agent_root: Path, manifest: Dict[str, Any], stderr_lines: list[str], final_json: Optional[dict]):
-    """Persist a run log. Enabled when APS_SAVE_LOGS in {"1","true"} (default: on)."""
-    if os.environ.get("APS_SAVE_LOGS", "1") not in ("1", "true", "True"):
-        return
-    agent_id = manifest.get("id", "unknown")
-    version  = manifest.get("version", "unknown")
-    d = _logs_dir_for(agent_id, version)
-    d.mkdir(parents=True, exist_ok=True)
-    p = d / f"{_now_ts()}.log"
-    with p.open("w", encoding="utf-8") as f:
-        f.write(f"# APS LOG\nid: {agent_id}\nversion: {version}\n")
-        f.write(f"time: {_now_ts()}\n\n")
-        f.write("## STDERR/LOGS\n")
-        for line in stderr_lines:
-            f.write(line.rstrip("\n") + "\n")
-        f.write("\n## RESULT\n")
-        f.write(json.dumps(final_json if final_json else {
+class _LogSink:
+    """
+    Incremental run-log writer: lines go to disk as they arrive, the result is
+    appended by close(). Disabled unless APS_SAVE_LOGS in {"1","true"} (default: on).
+    """
+    def __init__(self, manifest: Dict[str, Any]):
+        self._f = None
+        if os.environ.get("APS_SAVE_LOGS", "1") not in ("1", "true", "True"):
+            return
+        agent_id = manifest.get("id", "unknown")
+        version  = manifest.get("version", "unknown")
+        d = _logs_dir_for(agent_id, version)
+        d.mkdir(parents=True, exist_ok=True)
+        self.path = d / f"{_now_ts()}.log"
+        self._f = self.path.open("w", encoding="utf-8")
+        self._f.write(f"# APS LOG\nid: {agent_id}\nversion: {version}\n")
+        self._f.write(f"time: {_now_ts()}\n\n")
+        self._f.write("## STDERR/LOGS\n")
+
+    def write(self, line: str):
+        if self._f is not None:
+            self._f.write(line.rstrip("\n") + "\n")
+
+    def close(self, final_json: Optional[dict]):
+        if self._f is None:
+            return
+        self._f.write("\n## RESULT\n")
+        self._f.write(json.dumps(final_json if final_json else {
             "status":"error","error":{"code":"NO_FINAL_RESPONSE","message":"Agent exited without valid JSON"}
         }))
-    eprint(f"[logs] wrote {p}")
+        self._f.close()
+        self._f = None
+        eprint(f"[logs] wrote {self.path}")
+
+def _write_log(agent_root: Path, manifest: Dict[str, Any], stderr_lines: list[str], final_json: Optional[dict]):
+    """Persist a run log from already-collected lines (see _LogSink for the streaming form)."""
+    sink = _LogSink(manifest)
+    for line in stderr_lines:
+        sink.write(line)
+    sink.close(final_json)
 
 def agent_root(p: str | Path) -> Path:
     """Return the agent root Path (dir containing aps/agent.yaml)."""
@@ -250,6 +458,30 @@ def _get_python_entrypoint(manifest: Dict[str, Any]) -> Optional[list[str]]:
     
     return None
 
+def _agent_env(root: Path, stream: bool = False) -> Dict[str, str]:
+    """Child environment for an agent process rooted at `root`."""
+    env = os.environ.copy()
+    src_dir = root / "src"
+    if src_dir.exists():
+        env["PYTHONPATH"] = str(src_dir) + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("PYTHONUNBUFFERED", "1")
+    if stream:
+        env["APS_STREAM"] = "1"
+    env["APS_AGENT_ROOT"] = str(root)
+    return env
+
+def _module_entrypoint(entry: Optional[list[str]]) -> Optional[tuple[str, list[str]]]:
+    """Return (module, extra_args) for a `python -m module ...` entrypoint, else None."""
+    if entry and len(entry) >= 3 and entry[1] == "-m" and "python" in Path(entry[0]).name:
+        return entry[2], list(entry[3:])
+    return None
+
+def _worker_capable(manifest: Dict[str, Any]) -> bool:
+    """True when the python runtime opts in to persistent-worker execution (`worker: true`)."""
+    rt = next((r for r in manifest.get("runtimes", []) or []
+               if r.get("kind") == "python" and r.get("entrypoint")), None)
+    return bool(rt and rt.get("worker"))
+
 def cached_agent_dir(agent_id: str, version: str) -> Path:
     return CACHE_DIR / agent_id / version
 
@@ -265,6 +497,65 @@ def _is_json_status_line(line: str) -> Optional[dict]:
         return None
     return None
 
+def _split_final(lines: list[str]) -> tuple[Optional[dict], list[str]]:
+    """Pick the last status JSON line as the final frame; everything else is log."""
+    final_json, final_idx = None, -1
+    for i, line in enumerate(lines):
+        obj = _is_json_status_line(line)
+        if obj:
+            final_json, final_idx = obj, i
+    logs_lines = lines[:final_idx] + lines[final_idx+1:] if final_idx >= 0 else lines
+    return final_json, logs_lines
+
+class _FrameScanner:
+    """
+    Incremental final-frame detection for agent output.
+      - feed() forwards lines to `sink` as they age out of a small tail window,
+        so memory stays flat no matter how much an agent logs
+      - only lines that can be a frame ('{' ... '}') are ever json-parsed, and
+        only at finish(), scanning the tail backwards
+    The final frame is the last status line in the tail; if none is there, the
+    last status line that aged out is used (it was already logged). Aged-out
+    lines that mention "status" are kept raw (the last `tail` of them) and
+    parsed, newest first, only in that case.
+    """
+    def __init__(self, sink=None, tail: int = 32):
+        self._sink = sink or (lambda line: None)
+        self._tail: "deque[str]" = deque()
+        self._max = max(1, tail)
+        self._aged: "deque[str]" = deque(maxlen=self._max)
+
+    @staticmethod
+    def _frame_shaped(line: str) -> bool:
+        return bool(line) and line[0] == "{" and line[-1] == "}"
+
+    def feed(self, line: str):
+        self._tail.append(line.rstrip("\r\n"))
+        if len(self._tail) > self._max:
+            old = self._tail.popleft()
+            if self._frame_shaped(old) and '"status"' in old:
+                self._aged.append(old)
+            self._sink(old)
+
+    def finish(self, parse: bool = True) -> Optional[dict]:
+        """Flush the tail to the sink (minus the final frame) and return the final frame."""
+        final_json, final_idx = None, -1
+        if parse:
+            for i in range(len(self._tail) - 1, -1, -1):
+                if self._frame_shaped(self._tail[i]):
+                    obj = _is_json_status_line(self._tail[i])
+                    if obj:
+                        final_json, final_idx = obj, i
+                        break
+            while final_json is None and self._aged:
+                final_json = _is_json_status_line(self._aged.pop())
+        for i, line in enumerate(self._tail):
+            if i != final_idx:
+                self._sink(line)
+        self._tail.clear()
+        self._aged.clear()
+        return final_json
+
 def _emit_implicit_error() -> int:
     print(json.dumps({"status":"error","error":{"code":"NO_FINAL_RESPONSE","message":"Agent produced no final JSON"}}))
     return 1
@@ -342,29 +633,102 @@ def _extract_agent_pkg(pkg_path: str, target: Path):
 
 # ------------------------------ Registry resolution / Pull
 
-def _resolve_registry_path_if_needed(path: str) -> str:
-    """Resolve registry://ID to local cache path (and self-heal incomplete cache)."""
+def _offline() -> bool:
+    return os.environ.get("APS_OFFLINE", "") not in ("", "0")
+
+def _meta_ttl() -> float:
+    return float(os.environ.get("APS_META_TTL", "300"))
+
+def _parse_registry_ref(path: str) -> tuple[str, Optional[str]]:
+    """registry://id[@version] -> (id, version or None for latest)."""
+    agent_id, _, version = path[len("registry://"):].partition("@")
+    return agent_id, (version if version and version != "latest" else None)
+
+def _latest_meta(reg: str, agent_id: str, max_age: Optional[float] = None,
+                 offline: Optional[bool] = None, http=None) -> Optional[dict]:
+    """
+    Latest-version metadata for agent_id. Served from CACHE_DIR/.meta while
+    younger than max_age (default APS_META_TTL), then revalidated with
+    If-None-Match. Falls back to stale metadata if the registry is unreachable.
+    Offline (`offline`, default $APS_OFFLINE): cached metadata of any age, or None.
+    `http`: a shared requests.Session (warm), else one-off requests.
+    """
+    offline = _offline() if offline is None else offline
+    cached = _cache.meta_get(CACHE_DIR, agent_id)
+    if cached and cached.get("registry") != reg:
+        cached = None
+    max_age = _meta_ttl() if max_age is None else max_age
+    if cached and (offline or time.time() - cached.get("fetched_at", 0) < max_age):
+        return cached["meta"]
+    if offline:
+        return None
+
+    http = http or requests
+    url = f"{reg}/v1/agents/{agent_id}"
+    r, err = None, None
+    try:
+        if cached and cached.get("etag"):
+            r = http.get(url, timeout=10, headers={"If-None-Match": cached["etag"]})
+        else:
+            r = http.get(url, timeout=10)
+    except Exception as e:
+        err = e
+
+    if r is not None and r.status_code == 304 and cached:
+        meta, etag = cached["meta"], cached.get("etag")
+    elif r is not None and r.status_code == 200:
+        meta, etag = r.json(), r.headers.get("ETag")
+    else:
+        why = f"HTTP {r.status_code}" if r is not None else str(err)
+        if cached:
+            eprint(f"[run] registry unavailable ({why}); using cached metadata for {agent_id}")
+            return cached["meta"]
+        raise RuntimeError(f"failed to resolve {agent_id}: {why}")
+    _cache.meta_put(CACHE_DIR, agent_id, {"registry": reg, "meta": meta, "etag": etag, "fetched_at": time.time()})
+    return meta
+
+def _resolve_registry_path_if_needed(path: str, offline: Optional[bool] = None,
+                                     policy: Optional[argparse.Namespace] = None) -> str:
+    """
+    Resolve registry://ID[@VERSION] to local cache path (and self-heal incomplete cache).
+    Pinned versions already in the cache need no network; latest-version lookups
+    go through the metadata cache (_latest_meta). Offline (`offline`, default
+    APS_OFFLINE=1) never touches the network. With a verifying `policy` (default
+    _signature_policy()) the package's signature is checked (once; later runs hit
+    the trust cache).
+    """
     if not path.startswith("registry://"):
         return path
 
-    agent_id = path.replace("registry://", "")
+    agent_id, version = _parse_registry_ref(path)
     reg = DEFAULT_REGISTRY
 
-    # Get metadata (latest version)
-    r = requests.get(f"{reg}/v1/agents/{agent_id}", timeout=10)
-    if r.status_code != 200:
-        raise RuntimeError(f"failed to resolve {agent_id}: HTTP {r.status_code}")
-    meta = r.json()
-    version = meta["version"]
+    offline = _offline() if offline is None else offline
+    if version is None:
+        meta = _latest_meta(reg, agent_id, offline=offline)
+        if meta is not None:
+            version = meta["version"]
+        else:
+            # offline without metadata: newest installed version
+            installed = _cache.installed_versions(CACHE_DIR, agent_id)
+            if not installed:
+                raise FileNotFoundError(f"offline: {agent_id} is not in the cache")
+            version = installed[0]
     target = cached_agent_dir(agent_id, version)
+    policy = _signature_policy() if policy is None else policy
 
     # Self-heal if cache is missing
     if not (target / "aps" / "agent.yaml").exists():
+        if offline:
+            raise FileNotFoundError(f"offline: {agent_id}@{version} is not in the cache")
         eprint(f"[run] cache incomplete for {agent_id}@{version}; pulling…")
-        ns = argparse.Namespace(agent=agent_id, registry=reg, version=version)
+        ns = argparse.Namespace(agent=agent_id, registry=reg, version=version, **vars(policy))
         rc = cmd_pull(ns)
         if rc != 0 or not (target / "aps" / "agent.yaml").exists():
             raise FileNotFoundError(f"Missing manifest after pull: {target}/aps/agent.yaml")
+    elif policy.verify and _verify_installed(policy, agent_id, version):
+        # answered from the trust cache unless the blob changed since it was verified
+        raise RuntimeError(f"signature verification failed for {agent_id}@{version}")
 
     eprint(f"[run] resolved registry://{agent_id} -> {target}")
     return str(target)
@@ -382,6 +746,49 @@ def cmd_validate(args):
     print(json.dumps({"status":"ok"}))
     return 0
 
+# Builds are reproducible: entries sorted by path, mtime = $SOURCE_DATE_EPOCH
+# (default 0), uid/gid 0 with no owner names, modes normalized to 0644/0755,
+# and a gzip header with no name or timestamp. Bytecode is never packaged.
+# dist/.<id>.build.json remembers each file's stat and sha256 plus the
+# artifact's stat: when nothing changed the build is a handful of stats.
+BUILD_PATHS = ["aps", "src", "README.md", "assets", "LICENSE"]
+BUILD_FORMAT = "aps-build/1"
+
+def _build_members(root: Path) -> list[tuple[str, os.stat_result]]:
+    """Sorted (arcname, lstat) of everything packaged from root."""
+    out = []
+    for rel in BUILD_PATHS:
+        top = root / rel
+        if not os.path.lexists(top):
+            continue
+        out.append((rel, os.lstat(top)))
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            for name in dirnames + filenames:
+                arc = (Path(dirpath) / name).relative_to(root).as_posix()
+                if not name.endswith((".pyc", ".pyo")) and arc != merkle.FILES_MANIFEST:
+                    out.append((arc, os.lstat(root / arc)))
+    return sorted(out)
+
+def _build_tarinfo(root: Path, arc: str, st: os.stat_result, epoch: int) -> Optional[tarfile.TarInfo]:
+    ti = tarfile.TarInfo(arc)
+    ti.mtime, ti.uid, ti.gid, ti.uname, ti.gname = epoch, 0, 0, "", ""
+    if stat.S_ISDIR(st.st_mode):
+        ti.type, ti.mode = tarfile.DIRTYPE, 0o755
+    elif stat.S_ISLNK(st.st_mode):
+        ti.type, ti.mode, ti.linkname = tarfile.SYMTYPE, 0o777, os.readlink(root / arc)
+    elif stat.S_ISREG(st.st_mode):
+        ti.size, ti.mode = st.st_size, (0o755 if st.st_mode & 0o111 else 0o644)
+    else:
+        return None  # sockets, fifos, devices
+    return ti
+
+def _build_stamp(st: os.stat_result) -> list:
+    return [st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino]
+
+def _build_key(layout: list, epoch: int) -> str:
+    return hashlib.sha256(_canonical_json({"format": BUILD_FORMAT, "epoch": epoch, "layout": layout})).hexdigest()
+
 def cmd_build(args):
     root = Path(args.path).resolve()
     dist_dir = Path(args.dist or (root / "dist"))
@@ -390,14 +797,61 @@ def cmd_build(args):
     mf = load_manifest(root)
     agent_id = mf["id"]; version = mf["version"]
     out_path = dist_dir / f"{agent_id}.aps.tar.gz"
+    record_path = dist_dir / f".{agent_id}.build.json"
+    epoch = int(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+
+    members = [(arc, st, ti) for arc, st in _build_members(root)
+               if (ti := _build_tarinfo(root, arc, st, epoch)) is not None]
+    try:
+        record = {} if getattr(args, "no_cache", False) else json.loads(record_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        record = {}
+    if record.get("root") != str(root):
+        record = {}
+    stamps = record.get("stamps", {})
+
+    def layout(hashes):
+        return [[arc, ti.type.decode(), ti.mode, hashes.get(arc) or ti.linkname] for arc, _, ti in members]
+
+    # Unchanged sources (by stat) and untouched artifact: nothing to do
+    known = {arc: stamps[arc][-1] for arc, st, ti in members
+             if ti.isfile() and stamps.get(arc, [None])[:-1] == _build_stamp(st)}
+    if (len(known) == sum(ti.isfile() for _, _, ti in members)
+            and record.get("artifact") == _cache.file_stamp(out_path)
+            and record.get("key") == _build_key(layout(known), epoch)):
+        eprint(f"[build] {agent_id}@{version} up to date: {out_path}")
+        print(str(out_path))
+        return 0
 
     eprint(f"[build] packaging {agent_id}@{version} -> {out_path}")
-    with tarfile.open(out_path, "w:gz") as tf:
+    hashes, entries = {}, []
+    tmp = out_path.with_name(f".{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as raw, \
+            gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as gz, \
+            tarfile.open(fileobj=gz, mode="w", format=tarfile.PAX_FORMAT) as tf:
         # Add select paths at top-level; avoid nesting (no arcname=root.name)
-        for rel in ["aps", "src", "README.md", "assets","LICENSE"]:
-            p = root / rel
-            if p.exists():
-                tf.add(p, arcname=rel)
+        for arc, st, ti in members:
+            if not ti.isfile():
+                tf.addfile(ti)
+                continue
+            with open(root / arc, "rb") as f:
+                reader = merkle.HashingReader(f)  # files are read once: hashed as they are written
+                tf.addfile(ti, reader)
+            hashes[arc] = reader.hash.hexdigest()
+            entries.append({"path": arc, "size": ti.size, "sha256": hashes[arc]})
+        # per-file hashes (aps/files.json); `aps sign` signs their Merkle root
+        files_json = merkle.manifest_bytes(entries)
+        ti = tarfile.TarInfo(merkle.FILES_MANIFEST)
+        ti.size, ti.mode, ti.mtime, ti.uid, ti.gid, ti.uname, ti.gname = len(files_json), 0o644, epoch, 0, 0, "", ""
+        tf.addfile(ti, io.BytesIO(files_json))
+    os.replace(tmp, out_path)
+
+    _cache.write_atomic(record_path, json.dumps({
+        "root": str(root),
+        "key": _build_key(layout(hashes), epoch),
+        "stamps": {arc: _build_stamp(st) + [hashes[arc]] for arc, st, ti in members if ti.isfile()},
+        "artifact": _cache.file_stamp(out_path),
+    }).encode("utf-8"))
     print(str(out_path))
     return 0
 
@@ -479,99 +933,350 @@ def cmd_publish(args):
     print(json.dumps(r.json()))
     return 0
 
-def cmd_sig_validate(args, agent_id: str, ver: str, tmp_pkg: Path):
-    # --- Optional signature verification ---
-    if getattr(args, "verify", False):
-        # Try to fetch a detached signature from common endpoints
-        sig_candidates = [
-            f"{reg}/v1/signature/{agent_id}/{ver}",
-            f"{reg}/v1/signature?id={agent_id}&version={ver}",
-            f"{reg}/v1/pull/{agent_id}/{ver}.sig",
-            f"{reg}/v1/pull?id={agent_id}&version={ver}&sig=1",
-        ]
-        sig_bytes = None
-        for url in sig_candidates:
-            sig_bytes = _http_get_bytes(url)
-            if sig_bytes:
-                print(f"[pull] Retrieved signature from {url}")
-                break
+def _signature_pubkey(args, agent_id: str) -> Optional[Path]:
+    """--pubkey, else ~/.aps/keys.pub/<agent_id>.pub, else ~/.aps/keys.pub/default.pub."""
+    if getattr(args, "pubkey", None):
+        p = Path(args.pubkey).expanduser().resolve()
+        return p if p.exists() else None
+    for cand in (PUBS_DIR / f"{agent_id}.pub", PUBS_DIR / "default.pub"):
+        if cand.exists():
+            return cand
+    return None
 
-        if sig_bytes is None:
-            if getattr(args, "require_signature", False):
-                print("[pull] ERROR: signature not available and --require-signature set", file=sys.stderr)
-                try: tmp_pkg.unlink(missing_ok=True)
-                except Exception: pass
-                return 2
-            else:
-                print("[pull] WARN: no signature found; skipping verification", file=sys.stderr)
-        else:
-            # Determine pubkey path
-            pub_path = None
-            if getattr(args, "pubkey", None):
-                pub_path = Path(args.pubkey).expanduser().resolve()
-            else:
-                # If no pubkey provided, look for a conventional name:
-                # ~/.aps/keys.pub/<agent_id>.pub  OR ~/.aps/keys.pub/default.pub
-                candidate1 = PUBS_DIR / f"{agent_id}.pub"
-                candidate2 = PUBS_DIR / "default.pub"
-                pub_path = candidate1 if candidate1.exists() else (candidate2 if candidate2.exists() else None)
-
-            if not pub_path or not pub_path.exists():
-                if getattr(args, "require_signature", False):
-                    print("[pull] ERROR: no public key available for verification", file=sys.stderr)
-                    try: tmp_pkg.unlink(missing_ok=True)
-                    except Exception: pass
-                    return 2
-                else:
-                    print("[pull] WARN: no public key provided; skipping verification", file=sys.stderr)
-            else:
-                # Write signature to temp file and verify using existing verify logic
-                tmp_sig = Path(str(tmp_pkg) + ".sig")
-                tmp_sig.write_bytes(sig_bytes)
-                rc = cmd_verify(argparse.Namespace(package=str(tmp_pkg), signature=str(tmp_sig), pubkey=str(pub_path)))
-                try: tmp_sig.unlink(missing_ok=True)
-                except Exception: pass
-                if rc != 0 and getattr(args, "require_signature", False):
-                    # Hard fail if required
-                    try: tmp_pkg.unlink(missing_ok=True)
-                    except Exception: pass
-                    return rc
-                elif rc != 0:
-                    print("[pull] WARN: signature verification failed; continuing (no --require-signature)", file=sys.stderr)
+def _signature_policy(args=None) -> argparse.Namespace:
+    """
+    Signature options for registry:// resolution: --verify/--require-signature/--pubkey
+    from `args` when given, else $APS_VERIFY, $APS_REQUIRE_SIGNATURE, $APS_PUBKEY.
+    """
+    require = (getattr(args, "require_signature", False)
+               or os.environ.get("APS_REQUIRE_SIGNATURE", "") not in ("", "0"))
+    return argparse.Namespace(
+        verify=bool(require or getattr(args, "verify", False)
+                    or os.environ.get("APS_VERIFY", "") not in ("", "0")),
+        require_signature=bool(require),
+        pubkey=getattr(args, "pubkey", None) or os.environ.get("APS_PUBKEY") or None,
+    )
 
+def cmd_sig_validate(args, agent_id: str, ver: str, pkg: Path, digest: Optional[str] = None,
+                     size: Optional[int] = None, stored: Optional[str] = None) -> int:
+    """
+    Apply --verify/--require-signature to pkg. digest/size describe its bytes when
+    already known (hashed while downloading); `stored` instead names the cached blob
+    pkg is, whose bytes are re-hashed on a check. Successes go to the trust cache
+    (digest + key fingerprint), so an already-verified package costs a stat, not a
+    signature fetch and Ed25519 check.
+    """
+    if not getattr(args, "verify", False):
+        return 0
+    require = getattr(args, "require_signature", False)
+    pub_path = _signature_pubkey(args, agent_id)
+    if pub_path is None:
+        if require:
+            eprint("[verify] ERROR: no public key available for verification")
+            return 2
+        eprint("[verify] WARN: no public key provided; skipping verification")
+        return 0
+    pub = _load_public_key(pub_path)
+    fp = _pub_fingerprint(pub)
+    key = digest or stored
+    trusted = _cache.trust_get(CACHE_DIR, key, fp) if key else None
+    if trusted and trusted.get("id") == agent_id and trusted.get("version") == ver:
+        eprint(f"[verify] {agent_id}@{ver} already verified (sha256:{key[:12]}, {pub_path.name})")
+        return 0
+
+    reg = getattr(args, "registry", None) or DEFAULT_REGISTRY
+    # Try to fetch a detached signature from common endpoints
+    sig_candidates = [
+        f"{reg}/v1/signature/{agent_id}/{ver}",
+        f"{reg}/v1/signature?id={agent_id}&version={ver}",
+        f"{reg}/v1/pull/{agent_id}/{ver}.sig",
+        f"{reg}/v1/pull?id={agent_id}&version={ver}&sig=1",
+    ]
+    sig_bytes = None
+    for url in sig_candidates:
+        sig_bytes = _http_get_bytes(url)
+        if sig_bytes:
+            eprint(f"[verify] retrieved signature from {url}")
+            break
+    if sig_bytes is None:
+        if require:
+            eprint("[verify] ERROR: signature not available and --require-signature set")
+            return 2
+        eprint("[verify] WARN: no signature found; skipping verification")
+        return 0
+
+    # Envelopes are checked against the digest hashed during download
+    ok, msg, meta = _check_signature(pub, sig_bytes, Path(pkg), digest=digest, size=size,
+                                  agent_id=agent_id, version=ver)
+    if ok:
+        eprint(f"[verify] signature verified ({pub_path.name})")
+        key = key or _cache.file_sha256(pkg)
+        # stamped from pkg: a download keeps its size/mtime/inode when committed (renamed)
+        _cache.trust_put(CACHE_DIR, key, fp,
+                         {"id": agent_id, "version": ver, "verified_at": time.time(),
+                          "files": (meta or {}).get("files")}, path=pkg)
+        _cache.sig_put(CACHE_DIR, key, sig_bytes)  # kept for offline audits (verify --all)
+        return 0
+    eprint(f"[verify] signature check failed: {msg}")
+    if require:
+        return 1
+    eprint("[verify] WARN: signature verification failed; continuing (no --require-signature)")
+    return 0
+
+def _verify_installed(args, agent_id: str, version: str) -> int:
+    """Signature policy for an installed id@version, checked against its cached blob."""
+    if not getattr(args, "verify", False):
+        return 0
+    have = _cache.index_get(CACHE_DIR, agent_id, version)
+    if not have or not _cache.blob_path(CACHE_DIR, have).exists():
+        if getattr(args, "require_signature", False):
+            eprint(f"[verify] ERROR: no cached package for {agent_id}@{version} to verify; pull again with --force")
+            return 2
+        eprint(f"[verify] WARN: no cached package for {agent_id}@{version}; skipping verification")
+        return 0
+    return cmd_sig_validate(args, agent_id, version, _cache.blob_path(CACHE_DIR, have), stored=have)
+
+
+def _pull_version(reg: str, agent_id: str, version: str, args, http=None, log=eprint) -> dict:
+    """
+    Fetch and install id@version into the cache (locked, resumable, digest-checked).
+    Returns {"status": "cached"|"pulled"|"error", "rc", "bytes", "seconds", "digest"}.
+    args supplies force/parallel/digest (expected sha256) and the signature options.
+    """
+    t0 = time.monotonic()
+    target = cached_agent_dir(agent_id, version)
+    want = getattr(args, "digest", None)
+
+    def result(status, rc=0, fetched=0, digest=None):
+        return {"status": status, "rc": rc, "bytes": fetched, "seconds": time.monotonic() - t0,
+                "digest": digest or _cache.index_get(CACHE_DIR, agent_id, version)}
+
+    # One installer per id@version on this host; others wait, then find it installed
+    with _cache.locked(CACHE_DIR, f"{agent_id}@{version}"):
+        force = getattr(args, "force", False) or (want and _cache.index_get(CACHE_DIR, agent_id, version) != want)
+        if _cache.is_installed(target) and not force:
+            log(f"[pull] cached: {target}")
+            rc = _verify_installed(args, agent_id, version)
+            return result("error", rc=rc) if rc else result("cached")
+
+        url = f"{reg}/v1/agents/{agent_id}/download?version={version}"
+        # Extracted copy gone but its blob is still here: a conditional GET
+        # (304, no body) confirms the registry still serves those bytes
+        have = _cache.index_get(CACHE_DIR, agent_id, version)
+        if have and not force and _cache.verify_blob(CACHE_DIR, have) and _not_modified(url, have, http=http):
+            rc = _verify_installed(args, agent_id, version)
+            if rc:
+                return result("error", rc=rc)
+            _cache.install(_cache.blob_path(CACHE_DIR, have), target, _extract_agent_pkg)
+            log(f"[pull] not modified; reinstalled {target} from cached blob sha256:{have[:12]}")
+            return result("cached", digest=have)
+
+        # Download into the blob store (hashed while streaming, resumable)
+        parallel = getattr(args, "parallel", None) or int(os.environ.get("APS_PULL_PARALLEL", "1"))
+        log(f"[pull] GET {url}")
+        with _cache.BlobWriter(CACHE_DIR, key=f"{agent_id}@{version}") as blob:
+            expected, fetched = _fetch_to_blob(url, blob, parallel=parallel, http=http)
+            for label, sha in (("registry", expected), ("requested", want)):
+                if sha and blob.digest != sha:
+                    blob.discard()
+                    eprint(f"[pull] ERROR: sha256 mismatch for {agent_id}@{version} "
+                           f"(got {blob.digest}, {label} {sha})")
+                    return result("error", rc=1, fetched=fetched)
+
+            # Optional signature validation (before the blob enters the store)
+            rc = cmd_sig_validate(args, agent_id, version, blob.path, digest=blob.digest, size=blob.size)
+            if rc:
+                blob.discard()
+                return result("error", rc=rc, fetched=fetched)
+            size = blob.size
+            digest = blob.commit()
+        elapsed = max(time.monotonic() - t0, 1e-6)
+        resumed = size - fetched
+        log(f"[pull] {fetched / 1e6:.1f} MB in {elapsed:.2f}s ({fetched / 1e6 / elapsed:.1f} MB/s)"
+            + (f", resumed at {resumed / 1e6:.1f} MB" if resumed else ""))
+
+        # Extract (flatten if needed) into staging, then rename into place
+        _cache.install(blob.path, target, _extract_agent_pkg)
+        _cache.index_put(CACHE_DIR, agent_id, version, digest)
+    log(f"[pull] ready: {target} (sha256:{digest[:12]})")
+    return result("pulled", fetched=fetched, digest=digest)
 
 def cmd_pull(args):
     agent_id = args.agent
     reg = args.registry or DEFAULT_REGISTRY
 
-    # Resolve version
-    r = requests.get(f"{reg}/v1/agents/{agent_id}", timeout=10)
-    r.raise_for_status()
-    meta = r.json()
-    version = args.version if getattr(args, "version", None) and args.version != "latest" else meta["version"]
+    # Resolve version (pinned versions need no metadata lookup)
+    version = getattr(args, "version", None)
+    if not version or version == "latest":
+        meta = _latest_meta(reg, agent_id, max_age=0)
+        if meta is None:
+            raise FileNotFoundError(f"offline: {agent_id} is not in the cache")
+        version = meta["version"]
+    return _pull_version(reg, agent_id, version, args)["rc"]
+
+def _http_session(pool_size: int):
+    """Shared keep-alive session sized for `pool_size` concurrent requests."""
+    http = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+def _read_lockfile(path: str) -> list[tuple[str, Optional[str], Optional[str]]]:
+    """
+    Lockfile lines: `id@version [sha256:<hex>]`; `id` alone means latest.
+    Blank lines and `#` comments are ignored. Returns [(id, version|None, digest|None)].
+    """
+    entries = []
+    src = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in src:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            ref, _, digest = line.partition(" ")
+            agent_id, version = _parse_registry_ref("registry://" + ref.strip())
+            digest = digest.strip()
+            if digest and not digest.startswith("sha256:"):
+                raise ValueError(f"bad digest in lockfile: {digest!r}")
+            entries.append((agent_id, version, digest[len("sha256:"):] or None))
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    return entries
 
-    # Download
-    url = f"{reg}/v1/agents/{agent_id}/download?version={version}"
-    eprint(f"[pull] GET {url}")
-    rd = requests.get(url, stream=True, timeout=60)
-    rd.raise_for_status()
+def cmd_warm(args):
+    """
+    Prefetch many packages into the cache before a node takes traffic.
+      - Entries come from a lockfile (`id@version [sha256:...]` per line) or a registry search
+      - Pulls run concurrently (--workers) over one shared requests.Session
+      - Entries whose cached digest already matches are skipped without network
+      - stderr: per-package timing table and a summary line; rc 1 if any pull failed
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-    target = cached_agent_dir(agent_id, version)
-    target.mkdir(parents=True, exist_ok=True)
-    tmp_pkg = target.parent / f"{agent_id}-{version}.tmp.tar.gz"
-    with open(tmp_pkg, "wb") as f:
-        for chunk in rd.iter_content(8192):
-            if chunk:
-                f.write(chunk)
+    reg = args.registry or DEFAULT_REGISTRY
+    workers = max(1, int(args.workers or 8))
+    http = _http_session(pool_size=workers)
+
+    if args.lockfile:
+        entries = _read_lockfile(args.lockfile)
+    elif args.search is not None:
+        latest: Dict[str, str] = {}
+        params = {"q": args.search, "limit": 500}
+        while True:
+            r = http.get(f"{reg}/v1/search", params=params, timeout=30)
+            r.raise_for_status()
+            body = r.json()
+            for a in body.get("agents", []):
+                latest.setdefault(a["id"], a["version"])  # newest version is listed first
+            if not body.get("next"):
+                break
+            params["after"] = body["next"]
+        entries = [(agent_id, ver, None) for agent_id, ver in latest.items()]
+    else:
+        eprint("[warm] ERROR: give a LOCKFILE or --search QUERY")
+        return 2
+    entries = list(dict.fromkeys(entries))
 
-    # Optional signature validation
-    cmd_sig_validate(args, agent_id, version, tmp_pkg)
+    def task(entry) -> tuple[str, dict]:
+        agent_id, version, digest = entry
+        try:
+            if version is None:
+                meta = _latest_meta(reg, agent_id, http=http)
+                if meta is None:
+                    raise FileNotFoundError(f"offline: {agent_id} is not in the cache")
+                version = meta["version"]
+            ns = argparse.Namespace(digest=digest, force=False, parallel=args.parallel)
+            return f"{agent_id}@{version}", _pull_version(reg, agent_id, version, ns, http=http,
+                                                          log=lambda *a, **k: None)
+        except Exception as e:
+            eprint(f"[warm] ERROR {agent_id}@{version or 'latest'}: {e}")
+            return f"{agent_id}@{version or 'latest'}", {"status": "error", "rc": 1, "bytes": 0, "seconds": 0.0}
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(task, entries))
+    elapsed = time.monotonic() - started
+
+    counts = {"pulled": 0, "cached": 0, "error": 0}
+    width = max((len(ref) for ref, _ in results), default=0)
+    for ref, res in results:
+        counts[res["status"]] += 1
+        size = f"{res['bytes'] / 1e6:7.1f} MB" if res["bytes"] else "      - MB"
+        eprint(f"[warm] {ref:<{width}}  {res['status']:<6}  {size}  {res['seconds']:6.2f}s")
+    total_mb = sum(res["bytes"] for _, res in results) / 1e6
+    eprint(f"[warm] {len(results)} packages in {elapsed:.2f}s (workers={workers}) "
+           f"pulled={counts['pulled']} cached={counts['cached']} error={counts['error']} "
+           f"{total_mb:.1f} MB ({total_mb / elapsed if elapsed else 0:.1f} MB/s)")
+    return 0 if counts["error"] == 0 else 1
+
+def _timeout_error(timeout_s) -> dict:
+    return {"status":"error","error":{"code":"TIMEOUT","message":f"Agent exceeded timeout ({timeout_s}s)"}}
+
+def _no_final_error() -> dict:
+    return {"status":"error","error":{"code":"NO_FINAL_RESPONSE","message":"Agent produced no final JSON"}}
+
+def _worker_error(e: Exception) -> dict:
+    return {"status":"error","error":{"code":"WORKER_ERROR","message":str(e) or type(e).__name__}}
+
+def _spawn_once(root: Path, entry: list[str], env: Dict[str, str], req: str,
+                timeout_s=None, sink=None) -> tuple[Optional[dict], bool]:
+    """
+    Run one request in a fresh process (stderr merged into stdout).
+    Output is streamed line by line: log lines go to `sink` as they arrive and
+    only a bounded tail is kept for final-frame detection (see _FrameScanner).
+    Returns (final_json, timed_out); prints nothing.
+    """
+    proc = subprocess.Popen(
+        entry,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,  # merged to avoid 3.13 EBADF race
+        text=True,
+        env=env,
+        cwd=str(root)
+    )
 
-    # Extract (flatten if needed)
-    _extract_agent_pkg(str(tmp_pkg), target)
-    tmp_pkg.unlink(missing_ok=True)
-    eprint(f"[pull] ready: {target}")
-    return 0
+    def _feed_stdin():
+        try:
+            proc.stdin.write(req)
+            proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+        finally:
+            try: proc.stdin.close()
+            except Exception: pass
+
+    timed_out = threading.Event()
+
+    def _on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    # stdin is fed from a helper thread so a chatty agent can't deadlock a large request
+    feeder = threading.Thread(target=_feed_stdin, daemon=True)
+    feeder.start()
+    timer = threading.Timer(timeout_s, _on_timeout) if timeout_s else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+
+    scanner = _FrameScanner(sink)
+    try:
+        for line in proc.stdout:
+            scanner.feed(line)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+        if timer:
+            timer.cancel()
+        feeder.join(timeout=1)
+
+    if timed_out.is_set():
+        scanner.finish(parse=False)
+        return None, True
+    return scanner.finish(), False
 
 def helper_run_agent(path: str, req: str, timeout_s=None) -> int:
     """
@@ -582,13 +1287,7 @@ def helper_run_agent(path: str, req: str, timeout_s=None) -> int:
     """
     root = agent_root(path)
     mf = load_manifest(root)
-
-    env = os.environ.copy()
-    src_dir = root / "src"
-    if src_dir.exists():
-        env["PYTHONPATH"] = str(src_dir) + os.pathsep + env.get("PYTHONPATH", "")
-    env.setdefault("PYTHONUNBUFFERED", "1")
-    env["APS_AGENT_ROOT"] = str(root)
+    env = _agent_env(root)
 
     # Select python runtime (supports both old and new manifest formats)
     entry = _get_python_entrypoint(mf)
@@ -596,38 +1295,15 @@ def helper_run_agent(path: str, req: str, timeout_s=None) -> int:
         eprint("[run] ERROR: no python runtime found in manifest")
         return 2
 
-    proc = subprocess.Popen(
-        entry,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,  # merged to avoid 3.13 EBADF race
-        text=True,
-        env=env,
-        cwd=str(root)
-    )
-
-    try:
-        out, _ = proc.communicate(input=req, timeout=timeout_s)
-    except subprocess.TimeoutExpired:
-        proc.kill()
-        try:
-            out, _ = proc.communicate(timeout=1)
-        except Exception:
-            out = out or ""
-        err_obj = {"status":"error","error":{"code":"TIMEOUT","message":f"Agent exceeded timeout ({timeout_s}s)"}}
-        _write_log(root, mf, (out.splitlines() if out else []), err_obj)
+    sink = _LogSink(mf)
+    final_json, timed_out = _spawn_once(root, entry, env, req, timeout_s, sink=sink.write)
+    if timed_out:
+        err_obj = _timeout_error(timeout_s)
+        sink.close(err_obj)
         print(json.dumps(err_obj))
         return 124
 
-    lines = out.splitlines() if out else []
-    final_json, final_idx = None, -1
-    for i, line in enumerate(lines):
-        obj = _is_json_status_line(line)
-        if obj:
-            final_json, final_idx = obj, i
-
-    logs_lines = lines[:final_idx] + lines[final_idx+1:] if final_idx >= 0 else lines
-    _write_log(root, mf, logs_lines, final_json)
+    sink.close(final_json)
 
     if final_json:
         print(json.dumps(final_json))
@@ -636,26 +1312,22 @@ def helper_run_agent(path: str, req: str, timeout_s=None) -> int:
 
 def cmd_run_stream(args):
     """
-    STREAM path:
+    STREAM path (asyncio, see runner.AsyncRunner.stream):
       - Set APS_STREAM=1 for agent behavior switch
       - Write -> flush -> close stdin BEFORE reading any output
-      - Drain stderr concurrently; mirror non-JSON stdout lines to stderr
+      - Drain stdout/stderr on one event loop; mirror log lines to stderr
       - Persist logs; print final JSON once to stdout
+      - --events jsonl: print typed, timestamped events (log, progress, token,
+        partial_output, metric, final) to stdout instead, one JSON per line
     """
+    import asyncio
+    from .runner import AsyncRunner
+
     root = agent_root(args.path)
     mf = load_manifest(root)
 
-    env = os.environ.copy()
-    src_dir = root / "src"
-    if src_dir.exists():
-        env["PYTHONPATH"] = str(src_dir) + os.pathsep + env.get("PYTHONPATH", "")
-    env.setdefault("PYTHONUNBUFFERED", "1")
-    env["APS_STREAM"] = "1"
-    env["APS_AGENT_ROOT"] = str(root)
-    
     # Select python runtime (supports both old and new manifest formats)
-    entry = _get_python_entrypoint(mf)
-    if not entry:
+    if not _get_python_entrypoint(mf):
         eprint("[run] ERROR: no python runtime found in manifest")
         return 2
 
@@ -663,63 +1335,189 @@ def cmd_run_stream(args):
     raw = sys.stdin.read() or ""
     req = _wrap_request(raw, getattr(args, "input", None))
 
-    proc = subprocess.Popen(
-        entry, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-        text=True, env=env, cwd=str(root), bufsize=1
-    )
+    events = getattr(args, "events", None) == "jsonl"
+
+    async def _consume() -> dict:
+        final_json = {}
+        async for ev in AsyncRunner(root).stream(req, timeout=getattr(args, "timeout", None), events=events):
+            if ev["type"] == "final":
+                final_json = ev["result"]
+            if events:
+                # JSONL event stream: every event (final included) is one stdout line
+                sys.stdout.write(json.dumps(ev) + "\n")
+                sys.stdout.flush()
+            elif ev["type"] == "log":
+                eprint(ev["line"])
+        return final_json
+
+    final_json = asyncio.run(_consume())
+    if not events:
+        print(json.dumps(final_json))
+    if final_json.get("status") == "ok":
+        return 0
+    return 124 if (final_json.get("error") or {}).get("code") == "TIMEOUT" else 1
+
+def _run_warm(path: str, req: str, timeout_s=None, mode: str = "pool") -> Optional[int]:
+    """
+    WARM path: hand the request to the `aps pool serve` daemon.
+      - pool: persistent workers, needs `worker: true` in the runtime
+      - fork: fork server, needs a `python -m module` entrypoint
+    Returns None when the agent doesn't qualify or no daemon is reachable,
+    so the caller falls back to a one-shot spawn.
+    """
+    root = agent_root(path)
+    mf = load_manifest(root)
+    if mode == "pool" and not _worker_capable(mf):
+        return None
+    if mode == "fork" and not (hasattr(os, "fork") and _module_entrypoint(_get_python_entrypoint(mf))):
+        eprint("[run] fork mode needs a `python -m module` entrypoint; falling back to spawn")
+        return None
+    from . import pool
+    reply = pool.request(pool.default_socket(), str(root), req, timeout=timeout_s, mode=mode)
+    if reply is None:
+        eprint("[run] pool daemon not reachable; falling back to spawn")
+        return None
+    if "error" in reply:
+        err_obj = {"status": "error", "error": reply["error"]}
+        _write_log(root, mf, [], err_obj)
+        print(json.dumps(err_obj))
+        return 124 if reply["error"].get("code") == "TIMEOUT" else 1
+    final_json = reply.get("result")
+    _write_log(root, mf, reply.get("logs") or [], final_json)
+    if final_json:
+        print(json.dumps(final_json))
+        return 0 if final_json.get("status") == "ok" else 1
+    return _emit_implicit_error()
+
+def _batch_runner(root: Path, mf: Dict[str, Any], mode: str, workers: int):
+    """
+    Return (run, close) for batch items: run(req, timeout) -> (final_json, timed_out).
+    pool/fork modes keep warm runners in-process for the whole batch; otherwise spawn.
+    """
+    entry = _get_python_entrypoint(mf)
+    warm = None
+    if mode == "pool" and _worker_capable(mf):
+        from .pool import WorkerPool
+        warm = WorkerPool(root, size=workers, max_requests=0)
+    elif mode == "fork" and hasattr(os, "fork") and _module_entrypoint(entry):
+        from .forkserver import ForkServer
+        warm = ForkServer(root, max_children=workers)
+    elif mode != "spawn":
+        eprint(f"[batch] agent does not support --mode {mode}; spawning per item")
+
+    if warm is None:
+        env = _agent_env(root)
+        return (lambda req, timeout: _spawn_once(root, entry, env, req, timeout)), (lambda: None)
+
+    def run(req, timeout):
+        try:
+            final_json, _ = warm.run(req, timeout=timeout)
+            return final_json, False
+        except TimeoutError:
+            return None, True
+    return run, warm.close
 
-    # Strict ordering: write->flush->close BEFORE reads
+def cmd_run_batch(args, path: str) -> int:
+    """
+    BATCH path: one request per JSONL input line, run across `--workers` concurrent agents.
+      - Each line is wrapped with _wrap_request (same rules as a single run)
+      - stdout: one JSONL record per item {"index","result","elapsed_ms"},
+        in input order (--order input) or as items finish (--order completion)
+      - stderr: throughput summary; per-item run logs are not persisted
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    root = agent_root(path)
+    mf = load_manifest(root)
+    if not _get_python_entrypoint(mf):
+        eprint("[run] ERROR: no python runtime found in manifest")
+        return 2
+
+    workers = max(1, int(getattr(args, "workers", None) or os.cpu_count() or 4))
+    ordered = getattr(args, "order", "input") != "completion"
+    single_input = getattr(args, "input", None)
+    timeout_s = getattr(args, "timeout", None)
+    run, close = _batch_runner(root, mf, getattr(args, "mode", "spawn"), workers)
+
+    def task(i: int, line: str) -> dict:
+        t0 = time.perf_counter()
+        try:
+            final_json, timed_out = run(_wrap_request(line, single_input), timeout_s)
+        except Exception as e:  # a crashed worker fails its own item, not the batch
+            final_json, timed_out = _worker_error(e), False
+        if timed_out:
+            final_json = _timeout_error(timeout_s)
+        elif not final_json:
+            final_json = _no_final_error()
+        return {"index": i, "result": final_json, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2)}
+
+    stats = {"ok": 0, "error": 0}
+    latencies: list[float] = []
+
+    def emit(rec: dict):
+        stats["ok" if rec["result"].get("status") == "ok" else "error"] += 1
+        latencies.append(rec["elapsed_ms"])
+        sys.stdout.write(json.dumps(rec) + "\n")
+        sys.stdout.flush()
+
+    src = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+    window = workers * 4  # bounds in-flight + buffered items, so memory stays flat
+    started = time.perf_counter()
     try:
-        to_send = req if req.endswith("\n") else req + "\n"
-        proc.stdin.write(to_send)
-        proc.stdin.flush()
-    except BrokenPipeError:
-        pass
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            pending: set = set()
+            done_buf: Dict[int, dict] = {}
+            next_idx = 0
+
+            def drain():
+                nonlocal pending, next_idx
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    rec = fut.result()
+                    if ordered:
+                        done_buf[rec["index"]] = rec
+                    else:
+                        emit(rec)
+                while next_idx in done_buf:
+                    emit(done_buf.pop(next_idx))
+                    next_idx += 1
+
+            idx = 0
+            for line in src:
+                if not line.strip():
+                    continue
+                pending.add(ex.submit(task, idx, line.rstrip("\n")))
+                idx += 1
+                while len(pending) + len(done_buf) >= window:
+                    drain()
+            while pending:
+                drain()
     finally:
-        try: proc.stdin.close()
-        except Exception: pass
-
-    collected_stderr: list[str] = []
+        close()
+        if src is not sys.stdin:
+            src.close()
 
-    def _drain_err(pipe):
-        for line in iter(pipe.readline, ''):
-            if not line:
-                break
-            collected_stderr.append(line)
-            eprint(line.rstrip("\n"))
-        try: pipe.close()
-        except Exception: pass
-
-    t = threading.Thread(target=_drain_err, args=(proc.stderr,), daemon=True)
-    t.start()
-
-    final_json = None
-    for line in iter(proc.stdout.readline, ''):
-        s = line.rstrip("\n")
-        if not s:
-            continue
-        obj = _is_json_status_line(s)
-        if obj:
-            final_json = obj
-            if obj.get("status") == "error":
-                break
-        else:
-            # Non-JSON stdout is treated as log; mirror to stderr
-            eprint(s)
+    elapsed = time.perf_counter() - started
+    total = stats["ok"] + stats["error"]
+    latencies.sort()
 
-    try: proc.stdout.close()
-    except Exception: pass
-    proc.wait()
+    def pct(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
 
-    _write_log(root, mf, collected_stderr, final_json)
-    if final_json:
-        print(json.dumps(final_json))
-        return 0 if final_json.get("status") == "ok" else 1
-    return _emit_implicit_error()
+    eprint(
+        f"[batch] {total} items in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f}/s, "
+        f"workers={workers}) ok={stats['ok']} error={stats['error']} "
+        f"p50={pct(0.50):.1f}ms p95={pct(0.95):.1f}ms max={latencies[-1] if latencies else 0:.1f}ms"
+    )
+    return 0 if stats["error"] == 0 else 1
 
 def cmd_run(args):
-    path = _resolve_registry_path_if_needed(args.path)
-    if getattr(args, "stream", False):
+    # passed explicitly: exporting them would leak into the agent's environment
+    path = _resolve_registry_path_if_needed(args.path, offline=getattr(args, "offline", False) or _offline(),
+                                            policy=_signature_policy(args))
+    if getattr(args, "batch", None):
+        return cmd_run_batch(args, path)
+    if getattr(args, "stream", False) or getattr(args, "events", None):
         # stream mode uses its own runner (already reads stdin internally)
         args.path = path
         return cmd_run_stream(args)
@@ -728,6 +1526,11 @@ def cmd_run(args):
         raw = sys.stdin.read() or ""
         req = _wrap_request(raw, getattr(args, "input", None))
         args.path = path
+        mode = getattr(args, "mode", "spawn")
+        if mode in ("pool", "fork"):
+            rc = _run_warm(args.path, req, timeout_s=args.timeout, mode=mode)
+            if rc is not None:
+                return rc
         return helper_run_agent(args.path, req, timeout_s=args.timeout)
 
 def cmd_logs(args):
@@ -750,6 +1553,22 @@ def cmd_logs(args):
     return 0
 
 def cmd_inspect(args):
+    if args.path.startswith("registry://"):
+        # answered from the registry index; nothing is downloaded
+        reg = getattr(args, "registry", None) or DEFAULT_REGISTRY
+        agent_id, version = _parse_registry_ref(args.path)
+        url = f"{reg}/v1/agents/{agent_id}" + ("/package" if getattr(args, "files", False) else "")
+        try:
+            r = requests.get(url, params={"version": version} if version else None, timeout=10)
+            r.raise_for_status()
+        except Exception as e:
+            eprint(f"[inspect] ERROR: {e}")
+            return 1
+        print(json.dumps(r.json(), indent=2))
+        return 0
+    if getattr(args, "files", False):
+        eprint("[inspect] ERROR: --files needs a registry://ID[@VERSION] reference")
+        return 2
     p = Path(args.path)
     if p.is_file() and p.suffixes[-2:] == [".tar", ".gz"]:
         try:
@@ -804,25 +1623,34 @@ def cmd_sign(args):
     keyname = args.key
     priv = _load_private_key(_key_path(keyname))
 
-    payload = pkg.read_bytes()
-    sig = _sign_bytes(priv, payload)
+    # one streamed pass over the tarball; only the small envelope is signed
+    scan = merkle.scan_package(pkg)
+    digest = scan["sha256"]
+    try:
+        mf = yaml.safe_load(scan["agent_yaml"].decode("utf-8")) or {}
+    except Exception:  # no aps/agent.yaml: id/version stay null
+        mf = {}
+    files = None
+    if scan["files_json"] is not None:
+        listed = merkle.load_manifest(scan["files_json"])
+        if merkle.manifest_bytes(listed) != merkle.manifest_bytes(scan["entries"]):
+            eprint(f"[sign] ERROR: {merkle.FILES_MANIFEST} does not match the package contents; rebuild with `aps build`")
+            return 1
+        files = {"root": f"sha256:{merkle.merkle_root(listed)}", "count": len(listed)}
+    version = str(mf["version"]) if mf.get("version") is not None else None
+    env = _sign_envelope(priv, pkg, digest, scan["size"], mf.get("id"), version, files=files)
 
     sig_path = pkg.with_suffix(pkg.suffix + ".sig") if pkg.suffix else Path(str(pkg) + ".sig")
-    sig_path.write_bytes(sig)
-
-    # also print pubkey fingerprint for convenience
-    pub_pem = priv.public_key().public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo,
-    )
-    fp = _fingerprint_pubkey(pub_pem)
+    sig_path.write_text(json.dumps(env, indent=2) + "\n", encoding="utf-8")
 
     print(json.dumps({
         "status": "ok",
         "package": str(pkg),
         "signature": str(sig_path),
+        "digest": f"sha256:{digest}",
+        "files_root": files["root"] if files else None,
         "key": keyname,
-        "fingerprint": fp
+        "fingerprint": _pub_fingerprint(priv.public_key())
     }))
     return 0
 
@@ -831,6 +1659,20 @@ def cmd_verify(args):
         print("[verify] ERROR: cryptography library not installed. Install with: pip install apstool[dev]", file=sys.stderr)
         return 2
     
+    if getattr(args, "all", False):
+        return cmd_verify_all(args)
+    if not args.package:
+        eprint("[verify] ERROR: a package (or --all) is required")
+        return 2
+    if args.package.startswith("registry://") or Path(args.package).is_dir():
+        return _verify_agent_tree(args)
+    if getattr(args, "file", None):
+        eprint("[verify] ERROR: --file needs an extracted agent (directory or registry://ID[@VERSION])")
+        return 2
+    if not args.pubkey:
+        eprint("[verify] ERROR: --pubkey is required to verify a package")
+        return 2
+
     pkg = Path(args.package).resolve()
     sig_path = Path(args.signature).resolve() if args.signature else pkg.with_suffix(pkg.suffix + ".sig")
     pubfile = Path(args.pubkey).resolve()
@@ -845,27 +1687,218 @@ def cmd_verify(args):
         print(f"[verify] ERROR: pubkey not found: {pubfile}", file=sys.stderr)
         return 2
 
-    payload = pkg.read_bytes()
-    sig = sig_path.read_bytes()
     pub = _load_public_key(pubfile)
-
-    ok = _verify_sig(pub, payload, sig)
+    ok, msg, meta = _check_signature(pub, sig_path.read_bytes(), pkg)
     if ok:
-        print(json.dumps({"status":"ok","verified":True,"package":str(pkg),"signature":str(sig_path)}))
+        out = {"status":"ok","verified":True,"package":str(pkg),"signature":str(sig_path)}
+        if meta:
+            out.update({"digest": meta["digest"], "id": meta.get("id"), "version": meta.get("version"),
+                        "fingerprint": meta["key"]})
+        print(json.dumps(out))
         return 0
     else:
-        print(json.dumps({"status":"error","error":{"code":"BAD_SIGNATURE","message":"Signature does not match"}}))
+        print(json.dumps({"status":"error","error":{"code":"BAD_SIGNATURE","message":msg}}))
+        return 1
+
+
+
+def _verify_agent_tree(args) -> int:
+    """
+    Check an extracted agent file by file against the Merkle root in its signature:
+    a directory plus --signature, or an installed registry:// package verified at
+    pull time (trust cache). Only --file paths are hashed when given; for installed
+    packages files unchanged since their last clean check are skipped.
+    """
+    record = stamps = None
+    if args.package.startswith("registry://"):
+        agent_id, version = _parse_registry_ref(args.package)
+        version = version or next(iter(_cache.installed_versions(CACHE_DIR, agent_id)), None)
+        digest = _cache.index_get(CACHE_DIR, agent_id, version) if version else None
+        pub_path = _signature_pubkey(args, agent_id)
+        if not digest or pub_path is None:
+            eprint(f"[verify] ERROR: {args.package} is not installed or no public key is available")
+            return 2
+        fp = _pub_fingerprint(_load_public_key(pub_path))
+        record = _cache.trust_get(CACHE_DIR, digest, fp)
+        if record is None:
+            eprint(f"[verify] ERROR: {agent_id}@{version} has no verified signature for {pub_path.name}; "
+                   "run `aps pull --verify --force` first")
+            return 2
+        root, files, stamps = cached_agent_dir(agent_id, version), record.get("files"), record.get("file_stamps")
+    else:
+        root = Path(args.package).resolve()
+        if not args.signature or not args.pubkey:
+            eprint("[verify] ERROR: verifying a directory needs --signature and --pubkey")
+            return 2
+        ok, msg, meta = _open_envelope(_load_public_key(Path(args.pubkey)), Path(args.signature).read_bytes())
+        if not ok:
+            print(json.dumps({"status":"error","error":{"code":"BAD_SIGNATURE","message":msg}}))
+            return 1
+        files = meta.get("files")
+    if not files:
+        eprint(f"[verify] ERROR: signature has no file manifest root (package built without {merkle.FILES_MANIFEST})")
+        return 2
+
+    try:
+        entries = merkle.load_manifest((root / merkle.FILES_MANIFEST).read_bytes())
+    except (OSError, ValueError, KeyError) as e:
+        eprint(f"[verify] ERROR: cannot read {root / merkle.FILES_MANIFEST}: {e}")
+        return 2
+    if f"sha256:{merkle.merkle_root(entries)}" != files["root"]:
+        problems = [f"{merkle.FILES_MANIFEST}: does not match the signed root"]
+    else:
+        problems, stamps = merkle.verify_tree(root, entries, paths=getattr(args, "file", None) or None,
+                                              jobs=getattr(args, "jobs", None), stamps=stamps)
+        if record is not None:
+            _cache.trust_put(CACHE_DIR, digest, fp, {**record, "file_stamps": stamps})
+    if problems:
+        print(json.dumps({"status":"error","error":{"code":"TAMPERED","agent":str(root),"files":problems}}))
         return 1
+    print(json.dumps({"status":"ok","verified":True,"agent":str(root),"files_root":files["root"],
+                      "files": len(args.file) if getattr(args, "file", None) else len(entries)}))
+    return 0
+
+# Batch verification (aps verify --all): packages are hashed and checked in a
+# process pool; each worker loads the keyring once. Envelopes name their key,
+# so lookup is by fingerprint; legacy raw signatures try every key.
+_KEYRING: Dict[str, tuple] = {}
+
+def _load_keyring(paths: list[str]):
+    global _KEYRING
+    _KEYRING = {}
+    for p in paths:
+        try:
+            pub = _load_public_key(Path(p))
+        except Exception:
+            continue
+        _KEYRING[_pub_fingerprint(pub)] = (Path(p).stem, pub)
 
+def _verify_job(job: dict) -> dict:
+    """Verify one package for `aps verify --all`; runs in a pool worker."""
+    t0 = time.perf_counter()
+    pkg = Path(job["package"])
+    rec = {"package": job["package"], "id": job.get("id"), "version": job.get("version"), "status": "ok"}
 
+    def done(status, **kw):
+        rec.update(status=status, seconds=round(time.perf_counter() - t0, 4), **kw)
+        return rec
+
+    try:
+        sig_bytes = Path(job["signature"]).read_bytes()
+    except OSError:
+        return done("no_signature")
+    try:
+        named = json.loads(base64.b64decode(json.loads(sig_bytes)["payload"])).get("key")
+        keys = [(named, *_KEYRING[named])] if named in _KEYRING else []
+    except Exception:
+        keys = [(fp, name, pub) for fp, (name, pub) in _KEYRING.items()]  # legacy raw signature
+    if not keys:
+        return done("unknown_key")
+
+    stored, root = job.get("stored"), job.get("cache_root")
+    for fp, name, _ in keys:
+        hit = _cache.trust_get(root, stored, fp) if stored else None
+        if hit and hit.get("id") == rec["id"] and hit.get("version") == rec["version"]:
+            return done("ok", key=name, digest=f"sha256:{stored}", cached=True)
+    msg = "Signature does not match"
+    try:
+        for fp, name, pub in keys:
+            ok, msg, meta = _check_signature(pub, sig_bytes, pkg, agent_id=rec["id"], version=rec["version"])
+            if ok:
+                digest = meta["digest"] if meta else f"sha256:{_cache.file_sha256(pkg)}"
+                if stored and digest == f"sha256:{stored}":
+                    _cache.trust_put(root, stored, fp, {"id": rec["id"], "version": rec["version"],
+                                                        "verified_at": time.time(),
+                                                        "files": (meta or {}).get("files")})
+                return done("ok", key=name, digest=digest, size=pkg.stat().st_size)
+    except OSError as e:
+        return done("error", error=str(e))
+    return done("bad_signature", error=msg)
+
+def _verify_jobs(source: Optional[str]) -> list[dict]:
+    """
+    Packages for `aps verify --all`: a cache root (default CACHE_DIR; its index,
+    blobs and signatures stored at pull), a directory searched for *.aps.tar.gz
+    (signature <pkg>.sig), one package, or a file listing package paths ('-': stdin).
+    """
+    src = Path(source) if source and source != "-" else None
+    if source is None or (src.is_dir() and (src / ".index").is_dir()):
+        root = Path(source) if source else Path(CACHE_DIR)
+        return [{"package": str(_cache.blob_path(root, d)), "signature": str(_cache.sig_path(root, d)),
+                 "id": i, "version": v, "stored": d, "cache_root": str(root)}
+                for i, v, d in _cache.index_entries(root)]
+    if src is not None and src.is_dir():
+        pkgs = sorted(src.rglob("*.aps.tar.gz"))
+    elif src is not None and src.name.endswith(".tar.gz"):
+        pkgs = [src]
+    else:
+        fh = sys.stdin if src is None else open(src, "r", encoding="utf-8")
+        with fh:
+            pkgs = [Path(line.strip()) for line in fh if line.strip() and not line.startswith("#")]
+    return [{"package": str(p), "signature": f"{p}.sig"} for p in pkgs]
+
+def cmd_verify_all(args) -> int:
+    """
+    Verify many packages against the keyring (--pubkey, else every key in
+    ~/.aps/keys.pub) in a process pool. stdout (or --report): one JSONL record
+    per package, in input order; stderr: throughput summary.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    keys = [args.pubkey] if getattr(args, "pubkey", None) else sorted(str(p) for p in PUBS_DIR.glob("*.pub"))
+    if not keys:
+        eprint(f"[verify] ERROR: no public keys (--pubkey or {PUBS_DIR}/*.pub)")
+        return 2
+    if args.package not in (None, "-") and not Path(args.package).exists():
+        msg = f"no such file or directory: {args.package}"
+        print(json.dumps({"status":"error","error":{"code":"NOT_FOUND","message":msg}}))
+        return 1
+    jobs = _verify_jobs(args.package)
+    workers = max(1, min(int(getattr(args, "jobs", None) or os.cpu_count() or 1), len(jobs) or 1))
+    report = getattr(args, "report", None)
+    out = open(report, "w", encoding="utf-8") if report else sys.stdout
+    counts: Dict[str, int] = {}
+    total = 0
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_load_keyring, initargs=(keys,)) as pool:
+            for rec in pool.map(_verify_job, jobs):
+                counts[rec["status"]] = counts.get(rec["status"], 0) + 1
+                total += rec.get("size", 0)
+                out.write(json.dumps(rec) + "\n")
+                out.flush()
+    finally:
+        if report:
+            out.close()
+    elapsed = max(time.perf_counter() - t0, 1e-6)
+    eprint(f"[verify] {len(jobs)} packages in {elapsed:.2f}s ({total / 1e6 / elapsed:.1f} MB/s hashed, "
+           f"workers={workers}) " + " ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    return 0 if counts.get("ok", 0) == len(jobs) else 1
+
+def cmd_pool_serve(args):
+    # Long-lived warm worker daemon for `aps run --mode pool`
+    from . import pool
+    manager = pool.PoolManager(
+        size=args.size,
+        max_requests=args.max_requests,
+        idle_timeout=args.idle_timeout,
+        health_interval=args.health_interval,
+    )
+    try:
+        pool.serve(args.socket or pool.default_socket(), manager)
+    except KeyboardInterrupt:
+        pass
+    return 0
 
 def cmd_registry_serve(args):
-    # Launch FastAPI registry in-process
-    import uvicorn
-    from aps_registry.server import create_app
-    app = create_app(args.root)
-    eprint(f"[registry] serving at 0.0.0.0:{args.port} (root={args.root})")
-    uvicorn.run(app, host="0.0.0.0", port=int(args.port), log_level="info")
+    # Launch FastAPI registry: in-process, or N uvicorn worker processes
+    from aps_registry.server import serve
+    storage = getattr(args, "storage", None)
+    workers = int(getattr(args, "workers", None) or 1)
+    eprint(f"[registry] serving at 0.0.0.0:{args.port} (root={args.root}, storage={storage or 'fs'}, workers={workers})")
+    serve(str(args.root), port=int(args.port), workers=workers,
+          max_upload_mb=getattr(args, "max_upload_mb", None), storage=storage)
+    return 0
 
 # ------------------------------ Argparse / Main
 
@@ -881,6 +1914,8 @@ def main(argv=None):
     p = sub.add_parser("build", help="Build an APS package (.aps.tar.gz)")
     p.add_argument("path")
     p.add_argument("--dist", default=None)
+    p.add_argument("--no-cache", action="store_true",
+                   help="Rebuild even if sources are unchanged since the last build (output is identical)")
     p.set_defaults(func=cmd_build)
 
     #
@@ -906,13 +1941,47 @@ def main(argv=None):
         action="store_true",
         help="Fail if signature is missing or invalid when --verify is set",
     )
+    p.add_argument("--force", action="store_true", help="Re-download even if id@version is already cached")
+    p.add_argument("--parallel", type=int, default=None,
+                   help="Concurrent range requests for large packages (default: $APS_PULL_PARALLEL or 1)")
     p.set_defaults(func=cmd_pull)
 
-    p = sub.add_parser("run", help="Run an agent (dir or registry://id)")
+    # warm
+    p = sub.add_parser("warm", help="Prefetch many agents into the local cache concurrently")
+    p.add_argument("lockfile", nargs="?", help="Lines of `id@version [sha256:<hex>]` ('-' for stdin)")
+    p.add_argument("--search", default=None, metavar="QUERY",
+                   help="Warm the latest version of every registry search hit instead of a lockfile")
+    p.add_argument("--registry", default=DEFAULT_REGISTRY)
+    p.add_argument("--workers", type=int, default=8, help="Concurrent pulls (default: 8)")
+    p.add_argument("--parallel", type=int, default=None, help="Range requests per package (see `aps pull`)")
+    p.set_defaults(func=cmd_warm)
+
+    p = sub.add_parser("run", help="Run an agent (dir, registry://id or registry://id@version)")
     p.add_argument("path")
+    p.add_argument("--offline", action="store_true",
+                   help="Resolve registry:// from the local cache only (same as APS_OFFLINE=1)")
+    p.add_argument("--verify", action="store_true",
+                   help="Check the registry:// package signature (same as APS_VERIFY=1; cached after the first check)")
+    p.add_argument("--require-signature", action="store_true",
+                   help="Refuse to run a registry:// package without a valid signature (APS_REQUIRE_SIGNATURE=1)")
+    p.add_argument("--pubkey", default=None, help="Public key PEM for --verify (APS_PUBKEY)")
     p.add_argument("--stream", action="store_true", help="Enable streaming mode")
+    p.add_argument("--events", choices=["jsonl"], default=None,
+                   help="Streaming with a JSONL event stream on stdout (log/progress/token/partial_output/metric/final)")
     p.add_argument("--input", default=None, help="When raw input, wrap under inputs.{key}")
-    p.add_argument("--timeout", type=int, default=None, help="Timeout seconds (sync only)")
+    p.add_argument("--timeout", type=int, default=None, help="Timeout seconds (per run / per batch item)")
+    p.add_argument(
+        "--mode",
+        choices=["spawn", "pool", "fork"],
+        default=os.environ.get("APS_RUN_MODE", "spawn"),
+        help="Execution mode (sync and --batch): spawn a fresh process, or use warm workers "
+             "(pool) / a pre-imported fork server (fork); single runs go through `aps pool serve`",
+    )
+    p.add_argument("--batch", default=None, metavar="FILE",
+                   help="Run every line of a JSONL file ('-' for stdin); prints JSONL results")
+    p.add_argument("--workers", type=int, default=None, help="Concurrent agent runs for --batch (default: CPU count)")
+    p.add_argument("--order", choices=["input", "completion"], default="input",
+                   help="--batch output order (default: input)")
     p.set_defaults(func=cmd_run)
 
     p = sub.add_parser("logs", help="Show saved logs for an agent")
@@ -920,8 +1989,11 @@ def main(argv=None):
     p.add_argument("--latest", action="store_true")
     p.set_defaults(func=cmd_logs)
 
-    p = sub.add_parser("inspect", help="Inspect manifest from dir or tarball")
+    p = sub.add_parser("inspect", help="Inspect manifest from dir, tarball or registry://ID[@VERSION]")
     p.add_argument("path")
+    p.add_argument("--files", action="store_true",
+                   help="registry:// only: show the package digest, sizes and per-file hashes instead")
+    p.add_argument("--registry", default=None, help="Registry URL (default from env)")
     p.set_defaults(func=cmd_inspect)
 
     #
@@ -937,12 +2009,34 @@ def main(argv=None):
     s.add_argument("--key", default="default", help="Key name (default: 'default')")
     s.set_defaults(func=cmd_sign)
 
-    s = sub.add_parser("verify", help="Verify a package signature with a public key")
-    s.add_argument("package", help="Path to .aps.tar.gz")
+    s = sub.add_parser("verify", help="Verify a package signature, or an extracted agent file by file")
+    s.add_argument("package", nargs="?",
+                   help="Path to .aps.tar.gz, an extracted agent directory, or registry://ID[@VERSION]; "
+                        "with --all: a cache root (default), package directory or list file ('-' for stdin)")
+    s.add_argument("--all", action="store_true",
+                   help="Batch-verify many packages against the keyring; JSONL report on stdout")
+    s.add_argument("--report", default=None, metavar="PATH", help="With --all: write the JSONL report here")
     s.add_argument("--signature", help="Path to detached signature (defaults to <pkg>.sig)")
-    s.add_argument("--pubkey", required=True, help="Path to public key PEM (e.g., ~/.aps/keys.pub/default.pub)")
+    s.add_argument("--pubkey", help="Path to public key PEM (e.g., ~/.aps/keys.pub/default.pub)")
+    s.add_argument("--file", action="append", metavar="PATH",
+                   help="With an agent directory or registry:// ref: check only this file (repeatable)")
+    s.add_argument("--jobs", type=int, default=None,
+                   help="Files (or with --all, packages) hashed in parallel (default: CPU count)")
     s.set_defaults(func=cmd_verify)
 
+    #
+    # warm worker pool
+    #
+    p = sub.add_parser("pool", help="Warm worker pool commands")
+    s = p.add_subparsers(dest="subcmd")
+    r = s.add_parser("serve", help="Keep warm workers (`worker: true`) and fork servers (`-m module`) per agent")
+    r.add_argument("--socket", default=None, help="Unix socket path (default: $APS_POOL_SOCKET or ~/.aps/pool.sock)")
+    r.add_argument("--size", type=int, default=2, help="Workers (pool) / concurrent forked children (fork) per agent id@version")
+    r.add_argument("--max-requests", type=int, default=1000, help="Recycle a worker after N requests (0 = never)")
+    r.add_argument("--idle-timeout", type=float, default=300.0, help="Evict workers idle for this many seconds")
+    r.add_argument("--health-interval", type=float, default=30.0, help="Ping workers idle longer than this before reuse")
+    r.set_defaults(func=cmd_pool_serve)
+
     #
     # registry serve
     #
@@ -952,6 +2046,12 @@ def main(argv=None):
     r = s.add_parser("serve", help="Start a local APS registry")
     r.add_argument("--root", default="registry_data")
     r.add_argument("--port", type=int, default=8080)
+    r.add_argument("--max-upload-mb", type=float, default=None,
+                   help="Reject publishes larger than this (default: $APS_REGISTRY_MAX_UPLOAD_MB, else unlimited)")
+    r.add_argument("--storage", default=None, metavar="SPEC",
+                   help="Package storage: fs, sharded or s3://BUCKET[/PREFIX] (default: $APS_REGISTRY_STORAGE, else fs)")
+    r.add_argument("--workers", type=int, default=1,
+                   help="Worker processes sharing the root (uvicorn --workers); default 1, in-process")
     r.set_defaults(func=cmd_registry_serve)
 
     args = parser.parse_args(argv)
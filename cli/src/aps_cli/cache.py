@@ -0,0 +1,312 @@
+# cli/src/aps_cli/cache.py
+# APS content-addressed package cache
+# ------------------------------------------------------------
+# Layout under the cache root (CACHE_DIR):
+#   .blobs/sha256/<digest>   package tarballs, named by their sha256 (immutable)
+#   .blobs/tmp/              in-flight downloads (hashed while written);
+#                            <id>@<version>.part (+ .etag/.chunks) is kept for resume
+#   .index/<id>/<version>    "sha256:<digest>" - which blob id@version was installed from
+#   .locks/<id>@<version>    per-key install locks (fcntl.flock; no-op where unavailable)
+#   .meta/<id>.json          last registry metadata for <id> (+ ETag, fetch time)
+#   .trust/<digest>/<key>    signature verified for blob <digest> with key fingerprint <key>,
+#                            pinned to the blob's stat (size, mtime, inode) at verification
+#   .sigs/<digest>.sig       signature the blob verified with at pull (for `aps verify --all`)
+#   <id>/<version>/          extracted agent, the path `aps run` uses
+#
+# Installs extract into a staging dir next to the target and are renamed
+# into place, so a reader either sees no agent or a complete one. Callers
+# take the per-key lock and re-check is_installed() inside it, so
+# concurrent `aps run registry://x` on one host download x once.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import os, json, hashlib, shutil, tempfile, threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: best effort, no cross-process locking
+    fcntl = None
+
+CHUNK = 1024 * 1024
+
+
+def blob_path(cache_root: Path, digest: str) -> Path:
+    return Path(cache_root) / ".blobs" / "sha256" / digest
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BlobWriter:
+    """
+    Stream bytes into the blob store; hashes on the fly, commit() moves the file into place.
+    With a `key` the temp file is .blobs/tmp/<key>.part and survives failures:
+    a later writer with the same key picks up the bytes already on disk.
+    """
+
+    def __init__(self, cache_root: Path, key: Optional[str] = None):
+        self.cache_root = Path(cache_root)
+        tmpdir = self.cache_root / ".blobs" / "tmp"
+        tmpdir.mkdir(parents=True, exist_ok=True)
+        self.resumable = key is not None
+        if self.resumable:
+            self.path = tmpdir / f"{key.replace(os.sep, '_')}.part"
+            self.path.touch()
+            self.rehash()
+            self._fh = open(self.path, "ab")
+        else:
+            fd, name = tempfile.mkstemp(dir=tmpdir, suffix=".part")
+            self.path = Path(name)
+            self._fh = os.fdopen(fd, "wb")
+            self._hash = hashlib.sha256()
+            self.size = 0
+
+    def write(self, chunk: bytes):
+        self._fh.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    def flush(self):
+        """Push buffered bytes to the file so readers (signature checks) see all of it."""
+        self._fh.flush()
+
+    def rehash(self):
+        """Recompute digest/size from the file on disk (after out-of-order writes)."""
+        h, size = hashlib.sha256(), 0
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK), b""):
+                h.update(chunk)
+                size += len(chunk)
+        self._hash, self.size = h, size
+
+    def reset(self):
+        """Drop partial content (server content changed, or not resumable)."""
+        self._fh.close()
+        self._fh = open(self.path, "wb")
+        self._hash, self.size = hashlib.sha256(), 0
+        for side in self._sidecars():
+            side.unlink(missing_ok=True)
+
+    def sidecar(self, name: str) -> Path:
+        return self.path.with_name(f"{self.path.name}.{name}")
+
+    def _sidecars(self):
+        return [self.sidecar(n) for n in ("etag", "chunks")]
+
+    @property
+    def etag(self) -> Optional[str]:
+        try:
+            return self.sidecar("etag").read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    @etag.setter
+    def etag(self, value: Optional[str]):
+        if value:
+            self.sidecar("etag").write_text(value, encoding="utf-8")
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def commit(self) -> str:
+        self._fh.close()
+        digest = self.digest
+        dst = blob_path(self.cache_root, digest)
+        if dst.exists():
+            # same content already stored
+            self.path.unlink(missing_ok=True)
+        else:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.path, dst)
+        for side in self._sidecars():
+            side.unlink(missing_ok=True)
+        self.path = dst
+        return digest
+
+    def discard(self):
+        if not self._fh.closed:
+            self._fh.close()
+        self.path.unlink(missing_ok=True)
+        for side in self._sidecars():
+            side.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            return
+        if self.resumable:
+            self._fh.close()  # keep the partial download for the next attempt
+        else:
+            self.discard()
+
+
+def write_atomic(p: Path, data: bytes):
+    """Atomically replace p; the temp name is unique per process and thread."""
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, p)
+
+
+def _index_file(cache_root: Path, agent_id: str, version: str) -> Path:
+    return Path(cache_root) / ".index" / agent_id / version
+
+
+def index_get(cache_root: Path, agent_id: str, version: str) -> Optional[str]:
+    """Digest id@version was installed from, or None."""
+    try:
+        ref = _index_file(cache_root, agent_id, version).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return ref.split(":", 1)[1] if ref.startswith("sha256:") else None
+
+
+def index_put(cache_root: Path, agent_id: str, version: str, digest: str):
+    p = _index_file(cache_root, agent_id, version)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(p, f"sha256:{digest}\n".encode("utf-8"))
+
+
+def index_entries(cache_root: Path) -> Iterator[tuple[str, str, str]]:
+    """Every (id, version, digest) in the index, sorted by id then version."""
+    idx = Path(cache_root) / ".index"
+    if not idx.is_dir():
+        return
+    for d in sorted(p for p in idx.iterdir() if p.is_dir()):
+        for f in sorted(d.iterdir()):
+            digest = index_get(cache_root, d.name, f.name) if not f.name.startswith(".") else None
+            if digest:
+                yield d.name, f.name, digest
+
+
+def sig_path(cache_root: Path, digest: str) -> Path:
+    return Path(cache_root) / ".sigs" / f"{digest}.sig"
+
+
+def sig_put(cache_root: Path, digest: str, data: bytes):
+    p = sig_path(cache_root, digest)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(p, data)
+
+
+def meta_get(cache_root: Path, agent_id: str) -> Optional[dict]:
+    """{"registry", "meta", "etag", "fetched_at"} or None."""
+    try:
+        return json.loads((Path(cache_root) / ".meta" / f"{agent_id}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def meta_put(cache_root: Path, agent_id: str, record: dict):
+    p = Path(cache_root) / ".meta" / f"{agent_id}.json"
+    p.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(p, json.dumps(record).encode("utf-8"))
+
+
+def file_stamp(path: Path) -> Optional[list]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def trust_get(cache_root: Path, digest: str, fingerprint: str) -> Optional[dict]:
+    """
+    Verification record for blob <digest> under key <fingerprint>, or None.
+    Costs one read and one stat; a record whose blob was rewritten or removed
+    since it was verified is dropped.
+    """
+    p = Path(cache_root) / ".trust" / digest / fingerprint
+    try:
+        record = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if record.get("blob") != file_stamp(blob_path(cache_root, digest)):
+        p.unlink(missing_ok=True)
+        return None
+    return record
+
+
+def trust_put(cache_root: Path, digest: str, fingerprint: str, record: dict, path: Optional[Path] = None):
+    """
+    Record that blob <digest> verified against key <fingerprint>. `path` is the
+    file that was checked if it is not the stored blob yet (a download about to
+    be committed by rename, which keeps its stamp).
+    """
+    stamp = file_stamp(path or blob_path(cache_root, digest))
+    if stamp is None:
+        return
+    p = Path(cache_root) / ".trust" / digest / fingerprint
+    p.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(p, json.dumps({**record, "blob": stamp}).encode("utf-8"))
+
+
+def _version_key(v: str):
+    # release > its prereleases; numeric parts compare as numbers
+    core, _, pre = v.partition("-")
+    part = lambda x: (0, int(x), "") if x.isdigit() else (1, 0, x)
+    return (tuple(part(x) for x in core.split(".")), not pre, tuple(part(x) for x in pre.split(".")) if pre else ())
+
+
+def installed_versions(cache_root: Path, agent_id: str) -> list[str]:
+    """Installed versions of agent_id, newest first."""
+    d = Path(cache_root) / agent_id
+    if not d.is_dir():
+        return []
+    vers = [p.name for p in d.iterdir() if not p.name.startswith(".") and is_installed(p)]
+    return sorted(vers, key=_version_key, reverse=True)
+
+
+def verify_blob(cache_root: Path, digest: str) -> bool:
+    p = blob_path(cache_root, digest)
+    return p.exists() and file_sha256(p) == digest
+
+
+def is_installed(target: Path) -> bool:
+    return (Path(target) / "aps" / "agent.yaml").exists()
+
+
+@contextmanager
+def locked(cache_root: Path, key: str) -> Iterator[None]:
+    """Exclusive per-key lock shared by all processes using this cache root."""
+    d = Path(cache_root) / ".locks"
+    d.mkdir(parents=True, exist_ok=True)
+    with open(d / key.replace(os.sep, "_"), "a+") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def install(blob: Path, target: Path, extract: Callable[[str, Path], None]):
+    """Extract `blob` into a staging dir beside `target`, then rename it into place."""
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}.staging-", dir=target.parent))
+    try:
+        extract(str(blob), staging)
+        if target.exists():
+            # incomplete or stale install: swap it out, then remove it
+            trash = Path(tempfile.mkdtemp(prefix=f".{target.name}.old-", dir=target.parent))
+            os.rename(target, trash / "agent")
+            os.rename(staging, target)
+            shutil.rmtree(trash, ignore_errors=True)
+        else:
+            os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
@@ -0,0 +1,276 @@
+# cli/src/aps_cli/forkserver.py
+# APS fork server ("zygote") runtime
+# ------------------------------------------------------------
+# For agents whose entrypoint is `python -m <module> [args]`:
+#   - a zygote process imports <module> (and with it the heavy
+#     dependencies: sklearn, yaml, ...) exactly once
+#   - every request is served by os.fork() of the zygote; the child
+#     re-runs <module> as __main__ with the envelope on stdin, gets
+#     copy-on-write memory, and exits after one request
+# Protocol (client <-> zygote, binary pipes):
+#   -> {"id": n, "request": "<envelope>", "timeout": s}\n
+#   <- {"id": n, "rc": int, "timeout": bool, "size": k}\n + k bytes of child stdout/stderr
+#   first frame after start-up: {"ready": true} or {"ready": false, "error": "..."}
+# Requests are served concurrently (one child each, at most `max_children` at a time).
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import os, sys, io, json, queue, runpy, selectors, signal, subprocess, threading, time, traceback
+from pathlib import Path
+from typing import Dict, Optional
+
+from .app import (
+    agent_root, load_manifest, _agent_env, _get_python_entrypoint, _module_entrypoint, _split_final,
+)
+from .pool import Result, WorkerError
+
+
+# ------------------------------ Zygote side (runs in the agent's environment)
+
+def _send(obj: dict, body: bytes = b""):
+    # unbuffered writes so a forked child never inherits half-written frames
+    data = (json.dumps(obj) + "\n").encode("utf-8") + body
+    while data:
+        n = os.write(1, data)
+        data = data[n:]
+
+
+def _preimport(module: str) -> Optional[str]:
+    """Import the agent module with stdin empty and stdout silenced (main() is guarded by __name__)."""
+    saved = sys.stdin, sys.stdout
+    sys.stdin, sys.stdout = io.StringIO(""), sys.stderr
+    try:
+        __import__(module)
+    except BaseException as e:  # SystemExit from unguarded scripts included
+        return f"{type(e).__name__}: {e}"
+    finally:
+        sys.stdin, sys.stdout = saved
+    return None
+
+
+def _child(module: str, args: list[str], req: str, wfd: int, inherited: list[int]):
+    code = 1
+    try:
+        for fd in inherited:
+            try: os.close(fd)
+            except OSError: pass
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(wfd, 1)
+        os.dup2(wfd, 2)
+        os.close(wfd)
+        sys.stdin = io.TextIOWrapper(io.BytesIO(req.encode("utf-8")), encoding="utf-8")
+        sys.stdout = open(1, "w", buffering=1, encoding="utf-8", closefd=False)
+        sys.stderr = open(2, "w", buffering=1, encoding="utf-8", closefd=False)
+        sys.argv = [module] + args
+        # re-execute the entry module itself; its dependencies stay cached in sys.modules
+        sys.modules.pop(module, None)
+        code = 0
+        try:
+            runpy.run_module(module, run_name="__main__", alter_sys=True)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code)
+
+
+def zygote(module: str, args: list[str]) -> int:
+    err = _preimport(module)
+    if err:
+        _send({"ready": False, "error": err})
+        return 1
+    _send({"ready": True})
+
+    sel = selectors.DefaultSelector()
+    sel.register(0, selectors.EVENT_READ, None)
+    jobs: Dict[int, dict] = {}  # read fd -> job
+    inbuf = b""
+    stdin_open = True
+
+    while stdin_open or jobs:
+        deadlines = [j["deadline"] for j in jobs.values() if j["deadline"] and not j["killed"]]
+        wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        for key, _ in sel.select(wait):
+            if key.data is None:
+                data = os.read(0, 65536)
+                if not data:
+                    sel.unregister(0)
+                    stdin_open = False
+                    continue
+                inbuf += data
+                while b"\n" in inbuf:
+                    line, inbuf = inbuf.split(b"\n", 1)
+                    if not line.strip():
+                        continue
+                    msg = json.loads(line)
+                    rfd, wfd = os.pipe()
+                    pid = os.fork()
+                    if pid == 0:
+                        _child(module, args, msg["request"], wfd, [rfd, *jobs.keys()])
+                    os.close(wfd)
+                    t = msg.get("timeout")
+                    job = {"id": msg["id"], "pid": pid, "chunks": [], "killed": False,
+                           "deadline": time.monotonic() + t if t else None}
+                    jobs[rfd] = job
+                    sel.register(rfd, selectors.EVENT_READ, job)
+            else:
+                job = key.data
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    job["chunks"].append(chunk)
+                    continue
+                sel.unregister(key.fd)
+                os.close(key.fd)
+                _, status = os.waitpid(job["pid"], 0)
+                body = b"".join(job["chunks"])
+                _send({"id": job["id"], "rc": os.waitstatus_to_exitcode(status),
+                       "timeout": job["killed"], "size": len(body)}, body)
+                del jobs[key.fd]
+
+        now = time.monotonic()
+        for job in jobs.values():
+            if job["deadline"] and not job["killed"] and now >= job["deadline"]:
+                os.kill(job["pid"], signal.SIGKILL)
+                job["killed"] = True
+    return 0
+
+
+# ------------------------------ Client side (used by the pool daemon / batch runs)
+
+class ForkServer:
+    """
+    Drives one zygote for an agent root. Same run()/evict_idle()/close() surface as WorkerPool.
+      - max_children : concurrent requests (forked children); further run() calls wait
+    """
+
+    def __init__(self, root: str | Path, idle_timeout: float = 300.0, max_children: Optional[int] = None):
+        self.root = agent_root(root)
+        self.manifest = load_manifest(self.root)
+        entry = _get_python_entrypoint(self.manifest)
+        spec = _module_entrypoint(entry)
+        if not spec:
+            raise ValueError("fork server needs a `python -m module` entrypoint")
+        if not hasattr(os, "fork"):
+            raise RuntimeError("fork server requires os.fork()")
+        self.module, self.args = spec
+        python = sys.executable if entry[0] in ("python", "python3") else entry[0]
+        self.cmd = [python, "-m", "aps_cli.forkserver", self.module, *self.args]
+        self.env = _agent_env(self.root)
+        # the zygote imports aps_cli from wherever this copy lives
+        pkg_parent = str(Path(__file__).resolve().parent.parent)
+        self.env["PYTHONPATH"] = self.env.get("PYTHONPATH", "") + os.pathsep + pkg_parent
+        self.idle_timeout = idle_timeout
+        self.last_used = time.monotonic()
+        self._proc: Optional[subprocess.Popen] = None
+        self._pending: Dict[int, tuple] = {}  # rid -> (zygote it was sent to, reply queue)
+        self._lock = threading.Lock()        # _proc, _pending, _next_id
+        self._write_lock = threading.Lock()  # whole request frames on the zygote's stdin
+        self._slots = threading.BoundedSemaphore(max(1, int(max_children or 2 * (os.cpu_count() or 1))))
+        self._next_id = 0
+
+    def _ensure(self) -> subprocess.Popen:
+        # caller holds self._lock
+        if self._proc is not None and self._proc.poll() is None:
+            return self._proc
+        proc = subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                env=self.env, cwd=str(self.root))
+        hello = proc.stdout.readline()
+        ready = json.loads(hello) if hello else {"ready": False, "error": "zygote exited"}
+        if not ready.get("ready"):
+            proc.kill()
+            proc.wait()
+            raise WorkerError(f"fork server failed to import {self.module}: {ready.get('error')}")
+        threading.Thread(target=self._read_frames, args=(proc,), daemon=True).start()
+        self._proc = proc
+        return proc
+
+    def _read_frames(self, proc: subprocess.Popen):
+        while True:
+            header = proc.stdout.readline()
+            if not header:
+                break
+            h = json.loads(header)
+            body = proc.stdout.read(h["size"]) if h["size"] else b""
+            with self._lock:
+                _, q = self._pending.pop(h["id"], (None, None))
+            if q is not None:
+                q.put((h, body))
+        # fail only this zygote's requests: a replacement may already be serving newer ones
+        with self._lock:
+            mine = [rid for rid, (owner, _) in self._pending.items() if owner is proc]
+            lost = [self._pending.pop(rid)[1] for rid in mine]
+        for q in lost:
+            q.put(None)
+
+    def run(self, req: str, timeout: Optional[float] = None) -> Result:
+        """Fork one child for `req`; return (final_json, log_lines). Raises TimeoutError/WorkerError."""
+        with self._slots:
+            q: "queue.Queue" = queue.Queue()
+            with self._lock:
+                proc = self._ensure()
+                self._next_id += 1
+                rid = self._next_id
+                self._pending[rid] = (proc, q)
+            frame = (json.dumps({"id": rid, "request": req, "timeout": timeout}) + "\n").encode("utf-8")
+            try:
+                # a large envelope can block on the pipe; don't hold up frame delivery meanwhile
+                with self._write_lock:
+                    proc.stdin.write(frame)
+                    proc.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError) as e:
+                with self._lock:
+                    self._pending.pop(rid, None)
+                raise WorkerError(f"fork server stdin closed: {e}")
+            # the zygote enforces `timeout` itself; the grace period covers a wedged zygote
+            try:
+                item = q.get(timeout=None if timeout is None else timeout + 5)
+            except queue.Empty:
+                with self._lock:
+                    self._pending.pop(rid, None)
+                raise TimeoutError(f"fork server exceeded timeout ({timeout}s)")
+        self.last_used = time.monotonic()
+        if item is None:
+            raise WorkerError("fork server exited", sent=True)
+        h, body = item
+        if h.get("timeout"):
+            raise TimeoutError(f"agent exceeded timeout ({timeout}s)")
+        return _split_final(body.decode("utf-8", errors="replace").splitlines())
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            busy = bool(self._pending)
+        if busy or self._proc is None or time.monotonic() - self.last_used <= self.idle_timeout:
+            return 0
+        self.close()
+        return 1
+
+    def close(self):
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m aps_cli.forkserver <module> [args...]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(zygote(sys.argv[1], sys.argv[2:]))
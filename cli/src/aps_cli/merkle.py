@@ -0,0 +1,154 @@
+# cli/src/aps_cli/merkle.py
+# APS per-file Merkle manifest
+# ------------------------------------------------------------
+# `aps build` writes aps/files.json into the package: every regular file's
+# path, size and sha256, sorted by path (the manifest itself excluded):
+#   {"version": 1, "files": [{"path": "src/main.py", "size": 12, "sha256": "<hex>"}, ...]}
+#
+# The list is committed to by a Merkle root that `aps sign` puts in the
+# signature envelope:
+#   leaf = sha256(0x00 || path || 0x00 || file sha256)
+#   node = sha256(0x01 || left || right)   (an odd last node moves up as is)
+# Once files.json matches the signed root (hashing only the list), any subset
+# of an extracted agent can be checked by hashing just those files, in
+# parallel, and unchanged files (same stat stamp) can be skipped next time.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import hashlib, json, os, tarfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+from .cache import CHUNK, file_sha256, file_stamp
+
+FILES_MANIFEST = "aps/files.json"
+
+
+def leaf_hash(path: str, sha256_hex: str) -> bytes:
+    return hashlib.sha256(b"\x00" + path.encode("utf-8") + b"\x00" + bytes.fromhex(sha256_hex)).digest()
+
+
+def merkle_root(entries: list[dict]) -> str:
+    """Root (hex) over entries sorted by path."""
+    level = [leaf_hash(e["path"], e["sha256"]) for e in sorted(entries, key=lambda e: e["path"])]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        nxt = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0].hex()
+
+
+def manifest_bytes(entries: list[dict]) -> bytes:
+    files = sorted(({"path": e["path"], "size": e["size"], "sha256": e["sha256"]} for e in entries),
+                   key=lambda e: e["path"])
+    return json.dumps({"version": 1, "files": files}, indent=1, sort_keys=True).encode("utf-8") + b"\n"
+
+
+def load_manifest(data: bytes) -> list[dict]:
+    return json.loads(data)["files"]
+
+
+class HashingReader:
+    """File wrapper hashing the bytes as they are read (tarball scans, build)."""
+
+    def __init__(self, fh: BinaryIO):
+        self.fh, self.hash, self.size = fh, hashlib.sha256(), 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.fh.read(n)
+        self.hash.update(data)
+        self.size += len(data)
+        return data
+
+
+def scan_package(pkg: Path) -> dict:
+    """
+    One streamed pass over a .tar.gz: sha256 and size of the tarball, plus (if
+    it is a readable package) per-file entries, aps/agent.yaml and aps/files.json.
+    Nested layouts (<name>/aps/...) are reported relative to the agent root.
+    """
+    out = {"sha256": None, "size": 0, "entries": None, "agent_yaml": None, "files_json": None}
+    with open(pkg, "rb") as fh:
+        reader = HashingReader(fh)
+        try:
+            entries, blobs = [], {}
+            with tarfile.open(fileobj=reader, mode="r|gz") as tf:
+                for m in tf:
+                    if not m.isfile():
+                        continue
+                    name = m.name.removeprefix("./")
+                    h, f = hashlib.sha256(), tf.extractfile(m)
+                    keep = name.endswith(("aps/agent.yaml", FILES_MANIFEST))
+                    body = bytearray()
+                    for chunk in iter(lambda: f.read(CHUNK), b""):
+                        h.update(chunk)
+                        if keep:
+                            body.extend(chunk)
+                    if keep:
+                        blobs[name] = bytes(body)
+                    entries.append({"path": name, "size": m.size, "sha256": h.hexdigest()})
+            roots = sorted((n for n in blobs if n == "aps/agent.yaml" or n.endswith("/aps/agent.yaml")), key=len)
+            if roots:
+                prefix = roots[0][:-len("aps/agent.yaml")]
+                out["agent_yaml"] = blobs.get(prefix + "aps/agent.yaml")
+                out["files_json"] = blobs.get(prefix + FILES_MANIFEST)
+                out["entries"] = [dict(e, path=e["path"][len(prefix):]) for e in entries
+                                  if e["path"].startswith(prefix) and e["path"] != prefix + FILES_MANIFEST]
+        except (tarfile.TarError, OSError, EOFError):
+            pass
+        for chunk in iter(lambda: reader.read(CHUNK), b""):  # rest of the file (or all of a non-tarball)
+            pass
+    out["sha256"], out["size"] = reader.hash.hexdigest(), reader.size
+    return out
+
+
+def verify_tree(root: Path, entries: list[dict], paths: Optional[Iterable[str]] = None,
+                jobs: Optional[int] = None, stamps: Optional[dict] = None) -> tuple[list[str], dict]:
+    """
+    Hash the listed files under root (all entries, or just `paths`) in parallel
+    and compare with the manifest. Files whose stat stamp equals stamps[path]
+    (from an earlier clean check) are not re-read. A full check also reports
+    files present under root but missing from the manifest.
+    Returns (problems, stamps of the files now known good).
+    """
+    root = Path(root)
+    by_path = {e["path"]: e for e in entries}
+    stamps = dict(stamps or {})
+    problems = []
+    wanted = list(by_path) if paths is None else [Path(p).as_posix() for p in paths]
+    todo = []
+    for path in wanted:
+        e = by_path.get(path)
+        if e is None:
+            problems.append(f"{path}: not in {FILES_MANIFEST}")
+            continue
+        stamp = file_stamp(root / path)
+        if stamp is None or stamp[0] != e["size"]:
+            stamps.pop(path, None)
+            problems.append(f"{path}: missing" if stamp is None else f"{path}: size {stamp[0]} != {e['size']}")
+        elif stamps.get(path) != stamp:
+            todo.append((path, stamp))
+
+    def check(item):
+        path, stamp = item
+        return path, stamp, file_sha256(root / path) == by_path[path]["sha256"]
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        for path, stamp, ok in pool.map(check, todo):
+            if ok:
+                stamps[path] = stamp
+            else:
+                stamps.pop(path, None)
+                problems.append(f"{path}: sha256 mismatch")
+    if paths is None:
+        for p in sorted(root.rglob("*")):
+            rel = p.relative_to(root).as_posix()
+            if "__pycache__" in Path(rel).parts:  # written by the interpreter when the agent runs
+                continue
+            if p.is_file() and rel != FILES_MANIFEST and rel not in by_path:
+                problems.append(f"{rel}: not in {FILES_MANIFEST}")
+    return problems, stamps
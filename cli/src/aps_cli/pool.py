@@ -0,0 +1,324 @@
+# cli/src/aps_cli/pool.py
+# APS warm worker pool
+# ------------------------------------------------------------
+# Persistent-process execution for agents that opt in with
+# `runtimes[].worker: true`. A worker is spawned once (APS_WORKER=1)
+# and then serves many requests over a line-framed protocol:
+#   - stdin : one request envelope per line (compact JSON)
+#   - stdout: any log lines, then exactly one final JSON frame
+#             (a line with a "status" key) per request
+# Health checks reuse the framing: {"operation":"ping"} must be
+# answered with a status frame.
+#
+# WorkerPool   - N warm workers for one agent root
+# PoolManager  - pools (and fork servers, see forkserver.py) keyed by
+#                id@version and agent root, idle eviction janitor
+# serve()      - unix-socket daemon used by `aps run --mode pool|fork`
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import os, json, queue, socket, socketserver, subprocess, threading, time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .app import (
+    HOME, agent_root, load_manifest, _agent_env, _get_python_entrypoint,
+    _is_json_status_line, eprint,
+)
+
+def default_socket() -> str:
+    return os.environ.get("APS_POOL_SOCKET", str(HOME / ".aps" / "pool.sock"))
+
+
+PING = json.dumps({"aps_version": "0.1", "operation": "ping", "inputs": {}})
+
+Result = Tuple[Optional[dict], list]
+
+
+class WorkerError(RuntimeError):
+    """Worker died or broke the framing; it must not be reused. `sent`: the request had reached it."""
+
+    def __init__(self, message: str, sent: bool = False):
+        super().__init__(message)
+        self.sent = sent
+
+
+class AgentWorker:
+    """One long-lived agent process speaking the line-framed protocol."""
+
+    def __init__(self, root: Path, entry: list[str], env: Dict[str, str]):
+        self.proc = subprocess.Popen(
+            entry,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # logs share the frame stream, like the sync path
+            text=True,
+            env=env,
+            cwd=str(root),
+            bufsize=1,
+        )
+        self.requests = 0
+        self.last_used = time.monotonic()
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._reader = threading.Thread(target=self._pump, daemon=True)
+        self._reader.start()
+
+    def _pump(self):
+        for line in iter(self.proc.stdout.readline, ""):
+            self._lines.put(line)
+        self._lines.put(None)  # EOF marker
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def call(self, req: str, timeout: Optional[float] = None) -> Result:
+        """Send one envelope; return (final_json, log_lines). Raises TimeoutError/WorkerError."""
+        try:
+            self.proc.stdin.write(req.rstrip("\n") + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise WorkerError(f"worker stdin closed: {e}")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        logs: list[str] = []
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                line = self._lines.get(timeout=wait)
+            except queue.Empty:
+                raise TimeoutError(f"worker exceeded timeout ({timeout}s)")
+            if line is None:
+                raise WorkerError(f"worker exited (rc={self.proc.poll()})", sent=True)
+            s = line.rstrip("\n")
+            obj = _is_json_status_line(s)
+            if obj is not None:
+                self.requests += 1
+                self.last_used = time.monotonic()
+                return obj, logs
+            logs.append(s)
+
+    def ping(self, timeout: float = 5.0) -> bool:
+        try:
+            obj, _ = self.call(PING, timeout=timeout)
+        except (TimeoutError, WorkerError):
+            return False
+        self.requests -= 1  # health checks don't count towards recycling
+        return obj.get("status") == "ok"
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class WorkerPool:
+    """
+    Up to `size` warm workers for one agent root.
+      - max_requests : recycle a worker after this many requests (0 = never)
+      - idle_timeout : evict_idle() closes workers unused for this long
+      - health_interval : ping workers idle longer than this before reuse
+    """
+
+    def __init__(self, root: str | Path, size: int = 2, max_requests: int = 1000,
+                 idle_timeout: float = 300.0, health_interval: float = 30.0, prestart: bool = True):
+        self.root = agent_root(root)
+        self.manifest = load_manifest(self.root)
+        entry = _get_python_entrypoint(self.manifest)
+        if not entry:
+            raise ValueError("no python runtime found in manifest")
+        self.entry = entry
+        self.env = _agent_env(self.root)
+        self.env["APS_WORKER"] = "1"
+        self.size = max(1, int(size))
+        self.max_requests = max_requests
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self._idle: list[AgentWorker] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+        if prestart:
+            for _ in range(self.size):
+                self._idle.append(self._spawn())
+
+    def _spawn(self) -> AgentWorker:
+        return AgentWorker(self.root, self.entry, self.env)
+
+    def _checkout(self) -> AgentWorker:
+        while True:
+            with self._lock:
+                w = self._idle.pop() if self._idle else None
+            if w is None:
+                return self._spawn()
+            if not w.alive():
+                w.close()
+                continue
+            if time.monotonic() - w.last_used > self.health_interval and not w.ping():
+                w.close()
+                continue
+            return w
+
+    def _checkin(self, w: AgentWorker):
+        if self._closed or (self.max_requests and w.requests >= self.max_requests) or not w.alive():
+            w.close()
+            return
+        with self._lock:
+            self._idle.append(w)
+
+    def run(self, req: str, timeout: Optional[float] = None) -> Result:
+        """Run one request on a warm worker. Raises TimeoutError on timeout."""
+        with self._slots:
+            w = self._checkout()
+            try:
+                result = w.call(req, timeout=timeout)
+            except TimeoutError:
+                w.proc.kill()
+                w.close()
+                raise
+            except WorkerError as e:
+                w.close()
+                if e.sent:
+                    raise  # it may have acted on the request already; don't run it twice
+                # one retry on a fresh worker: the old one died while idle
+                w = self._spawn()
+                try:
+                    result = w.call(req, timeout=timeout)
+                except (TimeoutError, WorkerError):
+                    w.proc.kill()
+                    w.close()
+                    raise
+            self._checkin(w)
+            return result
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            stale = [w for w in self._idle if now - w.last_used > self.idle_timeout]
+            self._idle = [w for w in self._idle if w not in stale]
+        for w in stale:
+            w.close()
+        return len(stale)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for w in idle:
+            w.close()
+
+
+class PoolManager:
+    """Warm runners keyed by `id@version`, mode and agent root, plus a janitor thread for idle eviction."""
+
+    def __init__(self, size: int = 2, max_requests: int = 1000, idle_timeout: float = 300.0,
+                 health_interval: float = 30.0):
+        self.opts = dict(size=size, max_requests=max_requests, idle_timeout=idle_timeout,
+                         health_interval=health_interval)
+        self._pools: Dict[str, WorkerPool] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._janitor = threading.Thread(target=self._sweep, daemon=True)
+        self._janitor.start()
+
+    def get(self, path: str | Path, mode: str = "pool"):
+        """WorkerPool (mode="pool") or ForkServer (mode="fork") for the agent at `path`."""
+        root = agent_root(path)
+        mf = load_manifest(root)
+        # the same id@version can live in several roots (cache, checkouts); each gets its own runners
+        key = f"{mf.get('id', root.name)}@{mf.get('version', '0')}#{mode}:{root}"
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                if mode == "fork":
+                    from .forkserver import ForkServer
+                    pool = ForkServer(root, idle_timeout=self.opts["idle_timeout"],
+                                      max_children=self.opts["size"])
+                else:
+                    pool = WorkerPool(root, **self.opts)
+                self._pools[key] = pool
+        return pool
+
+    def _sweep(self):
+        interval = max(1.0, min(self.opts["idle_timeout"], 30.0))
+        while not self._stop.wait(interval):
+            with self._lock:
+                pools = list(self._pools.values())
+            for p in pools:
+                p.evict_idle()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for p in pools:
+            p.close()
+
+
+# ------------------------------ Daemon (unix socket, one JSON line per call)
+
+def make_server(socket_path: str, manager: PoolManager):
+    """Unix-socket server: `{"path","request","timeout","mode"}` line in, `{"result","logs"}` or `{"error"}` line out."""
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        raise RuntimeError("pool daemon requires unix domain sockets")
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            try:
+                msg = json.loads(raw)
+                pool = manager.get(msg["path"], msg.get("mode", "pool"))
+                final, logs = pool.run(msg["request"], timeout=msg.get("timeout"))
+                reply = {"result": final, "logs": logs}
+            except TimeoutError as e:
+                reply = {"error": {"code": "TIMEOUT", "message": str(e)}}
+            except Exception as e:
+                reply = {"error": {"code": "POOL_ERROR", "message": str(e)}}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+    Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(socket_path: str, manager: PoolManager):
+    server = make_server(socket_path, manager)
+    eprint(f"[pool] serving on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        manager.close()
+        try: os.unlink(socket_path)
+        except OSError: pass
+
+
+def request(socket_path: str, path: str, req: str, timeout: Optional[float] = None,
+            mode: str = "pool") -> Optional[dict]:
+    """Send one run to the daemon. Returns the reply dict, or None if the daemon is unreachable."""
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+            msg = {"path": str(Path(path).resolve()), "request": req, "timeout": timeout, "mode": mode}
+            s.sendall((json.dumps(msg) + "\n").encode("utf-8"))
+            with s.makefile("r", encoding="utf-8") as f:
+                line = f.readline()
+    except OSError:
+        return None
+    return json.loads(line) if line else None
@@ -0,0 +1,250 @@
+# cli/src/aps_cli/runner.py
+# APS asyncio runner
+# ------------------------------------------------------------
+# Importable, event-loop friendly agent execution:
+#   runner = AsyncRunner("registry://dev.echo", timeout=30)
+#   result = await runner.run({"text": "hi"})            # final JSON dict
+#   async for ev in runner.stream({"text": "hi"}):       # log events, then final
+#       ...
+# - Built on asyncio.create_subprocess_exec: no thread per pipe
+# - Timeouts kill the agent and yield a TIMEOUT error frame
+# - Cancellation (task.cancel(), aclose()) always reaps the child
+# - Same contract as the CLI: final = last status JSON line on stdout;
+#   logs stream to the run log, memory stays flat
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import asyncio, json, time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .app import (
+    agent_root, load_manifest, _agent_env, _get_python_entrypoint, _resolve_registry_path_if_needed,
+    _is_json_status_line, _wrap_request, _timeout_error, _no_final_error, _FrameScanner, _LogSink,
+)
+
+LINE_LIMIT = 16 * 1024 * 1024  # stream buffer; longer lines are read in pieces, not dropped
+
+# JSONL event stream (APS_EVENTS=jsonl): agents emit `{"aps_event": "<type>", ...}`
+# lines (see aps_sdk.events); the key comes first so a prefix check classifies them.
+EVENT_PREFIX = '{"aps_event":'
+AGENT_EVENTS = frozenset({"log", "progress", "token", "partial_output", "metric"})
+
+
+def _ts() -> float:
+    return round(time.time(), 3)
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    """readline() that also returns lines longer than the stream limit (read in pieces); b"" at EOF."""
+    parts = []
+    while True:
+        try:
+            parts.append(await reader.readuntil(b"\n"))
+            break
+        except asyncio.IncompleteReadError as e:  # EOF: last line without a newline (or nothing)
+            parts.append(e.partial)
+            break
+        except asyncio.LimitOverrunError as e:
+            parts.append(await reader.read(max(1, e.consumed)))
+    return b"".join(parts)
+
+
+class AsyncRunner:
+    """Run one agent (dir or registry://id) from asyncio code."""
+
+    def __init__(self, path: str | Path, timeout: Optional[float] = None, input_key: Optional[str] = None):
+        self.path = str(path)
+        self.timeout = timeout
+        self.input_key = input_key
+        self._prepared: Optional[tuple[Path, Dict[str, Any], list[str]]] = None
+
+    async def _prepare(self):
+        if self._prepared is None:
+            # registry resolution may hit the network / pull; keep it off the loop
+            resolved = await asyncio.to_thread(_resolve_registry_path_if_needed, self.path)
+            root = agent_root(resolved)
+            mf = load_manifest(root)
+            entry = _get_python_entrypoint(mf)
+            if not entry:
+                raise ValueError("no python runtime found in manifest")
+            self._prepared = (root, mf, entry)
+        return self._prepared
+
+    def _envelope(self, request: Any) -> str:
+        raw = request if isinstance(request, str) else json.dumps(request if request is not None else {})
+        return _wrap_request(raw, self.input_key)
+
+    @staticmethod
+    def _stream_env(root: Path, events: bool) -> Dict[str, str]:
+        env = _agent_env(root, stream=True)
+        if events:
+            env["APS_EVENTS"] = "jsonl"
+        return env
+
+    @staticmethod
+    def _agent_event(line: str) -> Optional[dict]:
+        """Turn an `{"aps_event": ...}` line into a typed event; None if malformed/unknown."""
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            return None
+        kind = obj.pop("aps_event", None) if isinstance(obj, dict) else None
+        if kind not in AGENT_EVENTS:
+            return None
+        ev = {"type": kind, "ts": obj.pop("ts", None) or _ts()}
+        if kind == "log":
+            ev["stream"] = "agent"
+        ev.update(obj)
+        return ev
+
+    @staticmethod
+    async def _reap(proc: asyncio.subprocess.Process):
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+    async def run(self, request: Any = None, *, timeout: Optional[float] = None) -> dict:
+        """SYNC semantics (stderr merged into stdout). Returns the final JSON or an error frame."""
+        root, mf, entry = await self._prepare()
+        timeout = self.timeout if timeout is None else timeout
+        proc = await asyncio.create_subprocess_exec(
+            *entry,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=_agent_env(root),
+            cwd=str(root),
+            limit=LINE_LIMIT,
+        )
+        sink = _LogSink(mf)
+        scanner = _FrameScanner(sink.write)
+
+        async def consume():
+            try:
+                proc.stdin.write(self._envelope(request).encode("utf-8"))
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                proc.stdin.close()
+            while True:
+                raw = await _readline(proc.stdout)
+                if not raw:
+                    break
+                scanner.feed(raw.decode("utf-8", errors="replace"))
+            await proc.wait()
+
+        try:
+            await asyncio.wait_for(consume(), timeout)
+        except asyncio.TimeoutError:
+            scanner.finish(parse=False)
+            result = _timeout_error(timeout)
+            sink.close(result)
+            return result
+        finally:
+            # also runs on cancellation
+            await self._reap(proc)
+
+        final_json = scanner.finish()
+        sink.close(final_json)
+        return final_json or _no_final_error()
+
+    async def stream(self, request: Any = None, *, timeout: Optional[float] = None,
+                     events: bool = False) -> AsyncIterator[dict]:
+        """
+        STREAM semantics (APS_STREAM=1). Yields timestamped events:
+          {"type": "log", "ts": t, "stream": "stdout"|"stderr", "line": "..."}   while the agent runs
+          {"type": "final", "ts": t, "result": {...}}                            exactly once, last
+        With events=True the agent also gets APS_EVENTS=jsonl, and its
+        `{"aps_event": ...}` lines are yielded as typed events
+        (progress, token, partial_output, metric, log) with their own fields.
+        """
+        root, mf, entry = await self._prepare()
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = None if not timeout else loop.time() + timeout
+
+        proc = await asyncio.create_subprocess_exec(
+            *entry,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self._stream_env(root, events),
+            cwd=str(root),
+            limit=LINE_LIMIT,
+        )
+        lines: asyncio.Queue = asyncio.Queue()
+
+        async def pump(reader: asyncio.StreamReader, name: str):
+            try:
+                while True:
+                    raw = await _readline(reader)
+                    if not raw:
+                        break
+                    await lines.put((name, raw.decode("utf-8", errors="replace").rstrip("\n")))
+            finally:
+                lines.put_nowait((name, None))  # the consumer counts these; never leave it waiting
+
+        pumps = [asyncio.create_task(pump(proc.stdout, "stdout")),
+                 asyncio.create_task(pump(proc.stderr, "stderr"))]
+        sink = _LogSink(mf)
+        final_json, timed_out = None, False
+        try:
+            # Strict ordering: write -> drain -> close stdin BEFORE consuming output
+            try:
+                proc.stdin.write(self._envelope(request).rstrip("\n").encode("utf-8") + b"\n")
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                proc.stdin.close()
+
+            open_streams = 2
+            while open_streams:
+                remaining = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    name, line = await asyncio.wait_for(lines.get(), remaining)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+                if line is None:
+                    open_streams -= 1
+                    continue
+                if name == "stdout":
+                    if events and line.startswith(EVENT_PREFIX):
+                        ev = self._agent_event(line)
+                        if ev is not None:
+                            if ev["type"] == "log":
+                                sink.write(str(ev.get("line", "")))
+                            yield ev
+                            continue
+                    obj = _is_json_status_line(line)
+                    if obj:
+                        final_json = obj
+                        if obj.get("status") == "error":
+                            break
+                        continue
+                    if not line:
+                        continue
+                sink.write(line)
+                yield {"type": "log", "ts": _ts(), "stream": name, "line": line}
+
+            if not timed_out:
+                remaining = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    await asyncio.wait_for(proc.wait(), remaining)
+                except asyncio.TimeoutError:
+                    timed_out = final_json is None
+        finally:
+            for t in pumps:
+                t.cancel()
+            await self._reap(proc)
+
+        if timed_out:
+            final_json = _timeout_error(timeout)
+        sink.close(final_json)
+        yield {"type": "final", "ts": _ts(), "result": final_json or _no_final_error()}
@@ -25,6 +25,7 @@ class DummyResp:
     def __init__(self, payload, status=200):
         self._payload = payload
         self.status_code = status
+        self.headers = {}
         self.text = json.dumps(payload) if isinstance(payload, (dict, list)) else str(payload)
 
     def json(self):
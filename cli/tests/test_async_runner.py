@@ -0,0 +1,164 @@
+# cli/tests/test_async_runner.py
+import asyncio
+import io
+import json
+import os
+import types
+from pathlib import Path
+
+import pytest
+
+import aps_cli.app as app
+from aps_cli.runner import AsyncRunner
+
+
+def _make_agent(root: Path):
+    """Echo agent that can sleep and leave a pid file behind (for cancellation checks)."""
+    (root / "aps").mkdir(parents=True, exist_ok=True)
+    (root / "src").mkdir(parents=True, exist_ok=True)
+    (root / "aps" / "agent.yaml").write_text(
+        """aps_version: 0.1
+id: dev.async
+name: Async
+version: 0.0.1
+runtimes:
+  - kind: python
+    entrypoint: python src/main.py
+""",
+        encoding="utf-8",
+    )
+    (root / "src" / "main.py").write_text(
+        r"""import sys, os, json, time
+req = json.loads(sys.stdin.read() or "{}")
+inputs = req.get("inputs") or {}
+if inputs.get("pidfile"):
+    open(inputs["pidfile"], "w").write(str(os.getpid()))
+print("[agent] starting", flush=True)
+print("[agent] to stderr", file=sys.stderr, flush=True)
+if inputs.get("sleep"):
+    time.sleep(inputs["sleep"])
+if inputs.get("long"):
+    print("L" * inputs["long"], flush=True)
+print(json.dumps({"status": "ok", "outputs": {"text": inputs.get("text", "")}}), flush=True)
+""",
+        encoding="utf-8",
+    )
+    return root
+
+
+def test_run_returns_final_json(tmp_path):
+    root = _make_agent(tmp_path / "agent")
+    result = asyncio.run(AsyncRunner(root).run({"text": "hi"}))
+    assert result == {"status": "ok", "outputs": {"text": "hi"}}
+
+
+def test_stream_yields_logs_then_final(tmp_path):
+    root = _make_agent(tmp_path / "agent")
+
+    async def collect():
+        return [ev async for ev in AsyncRunner(root).stream({"text": "yo"})]
+
+    events = asyncio.run(collect())
+    logs = {(e["stream"], e["line"]) for e in events if e["type"] == "log"}
+    assert ("stdout", "[agent] starting") in logs
+    assert ("stderr", "[agent] to stderr") in logs
+    assert events[-1]["type"] == "final"
+    assert events[-1]["result"] == {"status": "ok", "outputs": {"text": "yo"}}
+    assert all(isinstance(e["ts"], float) for e in events)
+
+
+def test_lines_longer_than_stream_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr("aps_cli.runner.LINE_LIMIT", 1024)
+    root = _make_agent(tmp_path / "agent")
+    big = "x" * 5000  # the final frame itself overruns the limit too
+    result = asyncio.run(AsyncRunner(root).run({"text": big, "long": 10000}))
+    assert result == {"status": "ok", "outputs": {"text": big}}
+
+    async def collect():
+        return [ev async for ev in AsyncRunner(root, timeout=10).stream({"text": big, "long": 10000})]
+
+    events = asyncio.run(collect())
+    assert ("stdout", "L" * 10000) in {(e["stream"], e["line"]) for e in events if e["type"] == "log"}
+    assert events[-1]["result"] == {"status": "ok", "outputs": {"text": big}}
+
+
+def test_timeout_returns_error_frame(tmp_path):
+    root = _make_agent(tmp_path / "agent")
+    result = asyncio.run(AsyncRunner(root, timeout=0.5).run({"sleep": 5}))
+    assert result["error"]["code"] == "TIMEOUT"
+
+    async def collect():
+        return [ev async for ev in AsyncRunner(root).stream({"sleep": 5}, timeout=0.5)]
+
+    assert asyncio.run(collect())[-1]["result"]["error"]["code"] == "TIMEOUT"
+
+
+def test_many_concurrent_runs_on_one_loop(tmp_path):
+    root = _make_agent(tmp_path / "agent")
+    runner = AsyncRunner(root)
+
+    async def fan_out():
+        return await asyncio.gather(*(runner.run({"text": str(i)}) for i in range(20)))
+
+    results = asyncio.run(fan_out())
+    assert [r["outputs"]["text"] for r in results] == [str(i) for i in range(20)]
+
+
+def test_cancel_kills_agent(tmp_path):
+    root = _make_agent(tmp_path / "agent")
+    pidfile = tmp_path / "pid"
+
+    async def cancel_midway():
+        task = asyncio.create_task(AsyncRunner(root).run({"sleep": 30, "pidfile": str(pidfile)}))
+        for _ in range(200):
+            await asyncio.sleep(0.05)
+            if pidfile.exists() and pidfile.read_text():
+                break
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_midway())
+    pid = int(pidfile.read_text())
+    # the child was reaped, so the pid no longer exists
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_events_mode_yields_typed_events(tmp_path, monkeypatch, capsys):
+
+    root = _make_agent(tmp_path / "agent")
+    (root / "src" / "main.py").write_text(
+        r"""import sys, os, json
+sys.stdin.read()
+assert os.environ.get("APS_EVENTS") == "jsonl"
+print("plain text", flush=True)
+print(json.dumps({"aps_event": "progress", "current": 1, "total": 2}), flush=True)
+for t in ("Hel", "lo"):
+    print(json.dumps({"aps_event": "token", "text": t}), flush=True)
+print(json.dumps({"aps_event": "metric", "name": "docs", "value": 3}), flush=True)
+print('{"aps_event": "bogus"}', flush=True)
+print(json.dumps({"status": "ok", "outputs": {"text": "Hello"}}), flush=True)
+""",
+        encoding="utf-8",
+    )
+
+    async def collect():
+        return [ev async for ev in AsyncRunner(root).stream({}, events=True)]
+
+    events = asyncio.run(collect())
+    types_seen = [e["type"] for e in events]
+    assert types_seen.count("final") == 1 and types_seen[-1] == "final"
+    assert [e["text"] for e in events if e["type"] == "token"] == ["Hel", "lo"]
+    assert {"type": "progress", "current": 1, "total": 2}.items() <= next(e for e in events if e["type"] == "progress").items()
+    assert next(e for e in events if e["type"] == "metric")["value"] == 3
+    logs = [e["line"] for e in events if e["type"] == "log"]
+    assert "plain text" in logs and '{"aps_event": "bogus"}' in logs
+
+    # CLI: every event, final included, is one JSON line on stdout
+    monkeypatch.setattr("sys.stdin", io.StringIO("{}"))
+    rc = app.cmd_run(types.SimpleNamespace(path=str(root), stream=False, events="jsonl", input=None, timeout=30))
+    out = [json.loads(line) for line in capsys.readouterr().out.strip().splitlines()]
+    assert rc == 0
+    assert out[-1]["result"] == {"status": "ok", "outputs": {"text": "Hello"}}
+    assert "token" in {e["type"] for e in out}
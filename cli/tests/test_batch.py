@@ -0,0 +1,99 @@
+# cli/tests/test_batch.py
+import io
+import json
+import types
+
+import aps_cli.app as app
+
+
+def _ns(path, batch, **kw):
+    base = dict(path=str(path), stream=False, input=None, timeout=30, mode="spawn",
+                batch=batch, workers=3, order="input")
+    base.update(kw)
+    return types.SimpleNamespace(**base)
+
+
+def _records(out: str):
+    return [json.loads(line) for line in out.strip().splitlines()]
+
+
+def test_batch_preserves_input_order(fabricate_cached_agent, tmp_path, capsys):
+    _, _, root = fabricate_cached_agent
+    inputs = tmp_path / "inputs.jsonl"
+    texts = [f"item-{i}" for i in range(7)]
+    # mix of raw inputs, a full envelope and a blank line (skipped)
+    lines = [json.dumps({"text": t}) for t in texts[:-1]]
+    lines.insert(3, "")
+    lines.append(json.dumps({"aps_version": "0.1", "operation": "run", "inputs": {"text": texts[-1]}}))
+    inputs.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    rc = app.cmd_run(_ns(root, str(inputs)))
+    captured = capsys.readouterr()
+    assert rc == 0
+    recs = _records(captured.out)
+    assert [r["index"] for r in recs] == list(range(7))
+    assert [r["result"]["outputs"]["text"] for r in recs] == texts
+    assert "[batch] 7 items" in captured.err
+
+
+def test_batch_completion_order_from_stdin(fabricate_cached_agent, monkeypatch, capsys):
+    _, _, root = fabricate_cached_agent
+    body = "\n".join(json.dumps({"text": str(i)}) for i in range(5))
+    monkeypatch.setattr("sys.stdin", io.StringIO(body))
+
+    rc = app.cmd_run(_ns(root, "-", order="completion", workers=2))
+    recs = _records(capsys.readouterr().out)
+    assert rc == 0
+    assert sorted(r["index"] for r in recs) == list(range(5))
+    assert all(r["result"]["outputs"]["text"] == str(r["index"]) for r in recs)
+
+
+def test_batch_reports_agent_errors(tmp_path, capsys):
+    root = tmp_path / "bad-agent"
+    (root / "aps").mkdir(parents=True)
+    (root / "src").mkdir()
+    (root / "aps" / "agent.yaml").write_text(
+        "aps_version: 0.1\nid: dev.bad\nname: Bad\nversion: 0.0.1\n"
+        "runtimes:\n  - kind: python\n    entrypoint: python src/main.py\n",
+        encoding="utf-8",
+    )
+    (root / "src" / "main.py").write_text("print('no json here')\n", encoding="utf-8")
+    inputs = tmp_path / "inputs.jsonl"
+    inputs.write_text('{"text":"a"}\n{"text":"b"}\n', encoding="utf-8")
+
+    rc = app.cmd_run(_ns(root, str(inputs)))
+    recs = _records(capsys.readouterr().out)
+    assert rc == 1
+    assert [r["result"]["error"]["code"] for r in recs] == ["NO_FINAL_RESPONSE"] * 2
+
+
+def test_batch_survives_crashing_worker(tmp_path, capsys):
+    root = tmp_path / "crashy"
+    (root / "aps").mkdir(parents=True)
+    (root / "src").mkdir()
+    (root / "aps" / "agent.yaml").write_text(
+        "aps_version: 0.1\nid: dev.crashy\nname: Crashy\nversion: 0.0.1\n"
+        "runtimes:\n  - kind: python\n    entrypoint: python src/main.py\n    worker: true\n",
+        encoding="utf-8",
+    )
+    (root / "src" / "main.py").write_text(
+        "import sys, os, json\n"
+        "for line in sys.stdin:\n"
+        "    text = (json.loads(line).get('inputs') or {}).get('text', '')\n"
+        "    if text == 'crash':\n"
+        "        os._exit(3)\n"
+        "    print(json.dumps({'status': 'ok', 'outputs': {'text': text}}), flush=True)\n",
+        encoding="utf-8",
+    )
+    inputs = tmp_path / "inputs.jsonl"
+    inputs.write_text("\n".join(json.dumps({"text": t}) for t in ["a", "crash", "b"]) + "\n", encoding="utf-8")
+
+    rc = app.cmd_run(_ns(root, str(inputs), mode="pool", workers=1))
+    captured = capsys.readouterr()
+    recs = _records(captured.out)
+    assert rc == 1
+    assert [r["index"] for r in recs] == [0, 1, 2]
+    assert recs[0]["result"]["outputs"]["text"] == "a"
+    assert recs[1]["result"]["error"]["code"] == "WORKER_ERROR"
+    assert recs[2]["result"]["outputs"]["text"] == "b"
+    assert "[batch] 3 items" in captured.err
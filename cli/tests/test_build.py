@@ -0,0 +1,75 @@
+# cli/tests/test_build.py
+import hashlib
+import os
+import shutil
+import tarfile
+import types
+
+import pytest
+
+import aps_cli.app as app
+
+
+def _agent(path):
+    (path / "aps").mkdir(parents=True)
+    (path / "src" / "echo" / "__pycache__").mkdir(parents=True)
+    (path / "aps" / "agent.yaml").write_text("aps_version: 0.1\nid: dev.echo\nname: Echo\nversion: 0.1.0\n")
+    (path / "src" / "echo" / "main.py").write_text("print('hi')\n")
+    (path / "src" / "echo" / "run.sh").write_text("#!/bin/sh\n")
+    os.chmod(path / "src" / "echo" / "run.sh", 0o775)
+    (path / "src" / "echo" / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"\0" * 16)
+    (path / "src" / "echo" / "stale.pyc").write_bytes(b"\0" * 16)
+    (path / "README.md").write_text("# echo\n")
+    return path
+
+
+def _build(src, dist, **kw):
+    assert app.cmd_build(types.SimpleNamespace(path=str(src), dist=str(dist), **kw)) == 0
+    pkg = dist / "dev.echo.aps.tar.gz"
+    return pkg, hashlib.sha256(pkg.read_bytes()).hexdigest()
+
+
+def test_build_is_deterministic_and_normalized(tmp_path, monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    pkg, digest = _build(_agent(tmp_path / "a"), tmp_path / "dist-a")
+
+    # same sources elsewhere, other mtimes/inodes/owner: same bytes
+    other = _agent(tmp_path / "b")
+    os.utime(other / "src" / "echo" / "main.py", (1_000_000, 1_000_000))
+    assert _build(other, tmp_path / "dist-b")[1] == digest
+
+    raw = pkg.read_bytes()
+    assert raw[3] == 0 and raw[4:8] == b"\0\0\0\0"  # gzip: no name, no timestamp
+    with tarfile.open(pkg) as tf:
+        members = tf.getmembers()
+    names = [m.name for m in members]
+    assert names[:-1] == sorted(names[:-1]) and names[-1] == "aps/files.json"
+    assert not any("__pycache__" in n or n.endswith(".pyc") for n in names)
+    assert {(m.mtime, m.uid, m.gid, m.uname, m.gname) for m in members} == {(0, 0, 0, "", "")}
+    modes = {m.name: m.mode for m in members}
+    assert modes["src/echo/run.sh"] == 0o755 and modes["src/echo/main.py"] == 0o644 and modes["src"] == 0o755
+
+
+def test_unchanged_rebuild_is_a_cache_hit(tmp_path, monkeypatch, capsys):
+    src = _agent(tmp_path / "a")
+    pkg, digest = _build(src, tmp_path / "dist")
+    stamp = os.stat(pkg).st_mtime_ns
+
+    monkeypatch.setattr(app.merkle, "HashingReader", lambda f: pytest.fail("sources re-read"))
+    capsys.readouterr()
+    assert _build(src, tmp_path / "dist")[1] == digest
+    assert "up to date" in capsys.readouterr().err
+    assert os.stat(pkg).st_mtime_ns == stamp
+    monkeypatch.undo()
+
+    # touched but identical: rebuilt, byte-identical
+    os.utime(src / "README.md", (2_000_000, 2_000_000))
+    assert _build(src, tmp_path / "dist")[1] == digest
+    assert _build(src, tmp_path / "dist", no_cache=True)[1] == digest
+
+    (src / "src" / "echo" / "main.py").write_text("print('bye')\n")
+    assert _build(src, tmp_path / "dist")[1] != digest
+
+    # a replaced artifact is rebuilt, not trusted
+    shutil.copy(src / "README.md", pkg)
+    assert tarfile.is_tarfile(_build(src, tmp_path / "dist")[0])
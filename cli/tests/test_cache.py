@@ -0,0 +1,117 @@
+# cli/tests/test_cache.py
+import hashlib
+import io
+import tarfile
+import threading
+import time
+import types
+from pathlib import Path
+
+import aps_cli.app as app
+from aps_cli import cache
+
+
+def _make_tarball(version="0.2.0") -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, body in {
+            "aps/agent.yaml": f"aps_version: 0.1\nid: dev.echo\nname: Echo\nversion: {version}\n",
+            "src/main.py": "print('hi')\n",
+        }.items():
+            data = body.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class _Resp:
+    def __init__(self, payload=None, body=b""):
+        self._payload, self._body, self.status_code = payload, body, 200
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            time.sleep(0.01)  # widen the race window for concurrent pulls
+            yield self._body[i:i + chunk_size]
+
+
+def _fake_registry(monkeypatch, body: bytes, version="0.2.0"):
+    downloads = []
+
+    def fake_get(url, timeout=10, stream=False, headers=None):
+        if "/download" in url:
+            downloads.append(url)
+            return _Resp(body=body)
+        return _Resp({"id": "dev.echo", "version": version})
+
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=fake_get))
+    return downloads
+
+
+def _pull_ns(**kw):
+    return types.SimpleNamespace(agent="dev.echo", registry="http://reg", version="latest", **kw)
+
+
+def test_blob_writer_dedups_and_index_roundtrip(tmp_path):
+    root = tmp_path / "c"
+    digests = []
+    for _ in range(2):
+        with cache.BlobWriter(root) as w:
+            w.write(b"payload")
+            digests.append(w.commit())
+    assert digests[0] == digests[1] == hashlib.sha256(b"payload").hexdigest()
+    assert cache.verify_blob(root, digests[0])
+    assert list((root / ".blobs" / "tmp").iterdir()) == []
+
+    assert cache.index_get(root, "dev.echo", "1.0.0") is None
+    cache.index_put(root, "dev.echo", "1.0.0", digests[0])
+    assert cache.index_get(root, "dev.echo", "1.0.0") == digests[0]
+
+
+def test_install_replaces_incomplete_target(tmp_path):
+    blob = tmp_path / "pkg.tar.gz"
+    blob.write_bytes(_make_tarball())
+    target = tmp_path / "dev.echo" / "0.2.0"
+    (target / "src").mkdir(parents=True)  # half-extracted leftovers, no manifest
+    assert not cache.is_installed(target)
+
+    cache.install(blob, target, app._extract_agent_pkg)
+    assert cache.is_installed(target)
+    assert (target / "src" / "main.py").exists()
+    assert sorted(p.name for p in target.parent.iterdir()) == ["0.2.0"]
+
+
+def test_pull_populates_blob_store_and_index(monkeypatch):
+    body = _make_tarball()
+    downloads = _fake_registry(monkeypatch, body)
+
+    assert app.cmd_pull(_pull_ns()) == 0
+    digest = hashlib.sha256(body).hexdigest()
+    assert cache.index_get(app.CACHE_DIR, "dev.echo", "0.2.0") == digest
+    assert cache.blob_path(Path(app.CACHE_DIR), digest).read_bytes() == body
+    assert cache.is_installed(app.cached_agent_dir("dev.echo", "0.2.0"))
+
+    # cached: no second download unless forced
+    assert app.cmd_pull(_pull_ns()) == 0
+    assert len(downloads) == 1
+    assert app.cmd_pull(_pull_ns(force=True)) == 0
+    assert len(downloads) == 2
+
+
+def test_concurrent_pulls_download_once(monkeypatch):
+    downloads = _fake_registry(monkeypatch, _make_tarball() * 4)
+    rcs = []
+    threads = [threading.Thread(target=lambda: rcs.append(app.cmd_pull(_pull_ns()))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert rcs == [0] * 4
+    assert len(downloads) == 1
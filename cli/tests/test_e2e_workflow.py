@@ -234,6 +234,19 @@ def test_registry_integration(tmp_path, monkeypatch):
         )
         assert result.returncode == 0, f"publish failed: {result.stderr}"
         print("✅ Published to registry")
+
+        # Package metadata recorded at publish time, without downloading
+        result = subprocess.run(
+            [sys.executable, "-m", "aps_cli.app", "inspect", "registry://dev.registry-test-agent",
+             "--files", "--registry", registry_url],
+            capture_output=True,
+            text=True
+        )
+        assert result.returncode == 0, f"inspect failed: {result.stderr}"
+        info = json.loads(result.stdout)
+        assert info["file_count"] == len(info["files"]) > 0
+        assert "aps/agent.yaml" in [f["path"] for f in info["files"]]
+        print("✅ Inspected package metadata")
         
         # Step 4: Pull from registry to a different location
         pull_dir = tmp_path / "pulled"
@@ -0,0 +1,161 @@
+# cli/tests/test_forkserver.py
+import io
+import json
+import os
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+import aps_cli.app as app
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="fork server requires os.fork()")
+
+
+def _make_module_agent(root: Path):
+    """
+    `python -m fk.main` agent. fk.heavy records every import so tests can
+    check that the zygote imported dependencies exactly once.
+    """
+    (root / "aps").mkdir(parents=True, exist_ok=True)
+    (root / "src" / "fk").mkdir(parents=True, exist_ok=True)
+    (root / "aps" / "agent.yaml").write_text(
+        """aps_version: 0.1
+id: dev.fork
+name: Fork
+version: 0.0.1
+summary: Forked echo
+runtimes:
+  - kind: python
+    entrypoint: ["python", "-m", "fk.main"]
+""",
+        encoding="utf-8",
+    )
+    (root / "src" / "fk" / "__init__.py").write_text("", encoding="utf-8")
+    (root / "src" / "fk" / "heavy.py").write_text(
+        "import os\n"
+        "with open(os.path.join(os.environ['APS_AGENT_ROOT'], 'imports.log'), 'a') as f:\n"
+        "    f.write(f'{os.getpid()}\\n')\n",
+        encoding="utf-8",
+    )
+    (root / "src" / "fk" / "main.py").write_text(
+        r"""import sys, os, json, time
+from fk import heavy
+
+def main():
+    req = json.loads(sys.stdin.read() or "{}")
+    inputs = req.get("inputs") or {}
+    if inputs.get("sleep"):
+        time.sleep(inputs["sleep"])
+    print("[fork] child log")
+    print(json.dumps({"status": "ok", "outputs": {"text": inputs.get("text", ""),
+                                                 "pid": os.getpid(), "ppid": os.getppid()}}))
+
+if __name__ == "__main__":
+    main()
+""",
+        encoding="utf-8",
+    )
+    return root
+
+
+def _req(text, **extra):
+    return json.dumps({"aps_version": "0.1", "operation": "run", "inputs": {"text": text, **extra}})
+
+
+def test_module_entrypoint_parsing():
+    assert app._module_entrypoint(["/usr/bin/python3", "-m", "rag.main", "--x"]) == ("rag.main", ["--x"])
+    assert app._module_entrypoint(["python", "src/echo/main.py"]) is None
+    assert app._module_entrypoint(None) is None
+
+
+def test_fork_server_forks_per_request_and_imports_once(tmp_path):
+    from aps_cli.forkserver import ForkServer
+
+    root = _make_module_agent(tmp_path / "agent")
+    fs = ForkServer(root)
+    try:
+        results = [fs.run(_req(t)) for t in ("a", "b", "c")]
+    finally:
+        fs.close()
+
+    finals = [r[0] for r in results]
+    assert [f["outputs"]["text"] for f in finals] == ["a", "b", "c"]
+    assert results[0][1] == ["[fork] child log"]
+    # a fresh child per request, all forked from the same zygote
+    assert len({f["outputs"]["pid"] for f in finals}) == 3
+    assert len({f["outputs"]["ppid"] for f in finals}) == 1
+    # dependencies were imported once, in the zygote
+    assert (root / "imports.log").read_text().split() == [str(finals[0]["outputs"]["ppid"])]
+
+
+def test_fork_server_timeout_keeps_zygote(tmp_path):
+    from aps_cli.forkserver import ForkServer
+
+    root = _make_module_agent(tmp_path / "agent")
+    fs = ForkServer(root)
+    try:
+        with pytest.raises(TimeoutError):
+            fs.run(_req("slow", sleep=5), timeout=0.5)
+        final, _ = fs.run(_req("after"), timeout=10)
+        assert final["outputs"]["text"] == "after"
+    finally:
+        fs.close()
+
+
+def test_fork_server_caps_concurrent_children(tmp_path):
+    from aps_cli.forkserver import ForkServer
+
+    root = _make_module_agent(tmp_path / "agent")
+    fs = ForkServer(root, max_children=1)
+    results = []
+    try:
+        fs.run(_req("warm"), timeout=10)  # start the zygote outside the timing
+        threads = [threading.Thread(target=lambda t=t: results.append(fs.run(_req(t, sleep=0.4), timeout=10)))
+                   for t in ("a", "b")]
+        t0 = time.monotonic()
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        elapsed = time.monotonic() - t0
+    finally:
+        fs.close()
+    assert sorted(r[0]["outputs"]["text"] for r in results) == ["a", "b"]
+    assert elapsed >= 0.8  # the second child was only forked after the first finished
+    assert fs._pending == {}
+
+
+def test_fork_server_replaced_zygote_keeps_new_requests(tmp_path):
+    import signal
+    from aps_cli.forkserver import ForkServer
+
+    root = _make_module_agent(tmp_path / "agent")
+    fs = ForkServer(root)
+    try:
+        fs.run(_req("first"), timeout=10)
+        old = fs._proc
+        os.kill(old.pid, signal.SIGKILL)
+        old.wait()
+        results = []
+        th = threading.Thread(target=lambda: results.append(fs.run(_req("next", sleep=0.5), timeout=10)))
+        th.start()
+        while not fs._pending:  # the request is registered with the replacement zygote
+            time.sleep(0.01)
+        assert fs._proc is not old
+        fs._read_frames(old)  # the old zygote's reader reaching EOF late
+        th.join()
+    finally:
+        fs.close()
+    assert results[0][0]["outputs"]["text"] == "next"
+
+
+def test_run_mode_fork_falls_back_for_file_entrypoint(fabricate_cached_agent, monkeypatch, capsys):
+    _, _, root = fabricate_cached_agent
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps({"text": "spawned"})))
+    ns = types.SimpleNamespace(path=str(root), stream=False, input=None, timeout=10, mode="fork")
+    assert app.cmd_run(ns) == 0
+    out = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert out["outputs"]["text"] == "spawned"
@@ -0,0 +1,103 @@
+# cli/tests/test_frame_scanner.py
+import io
+import json
+import types
+from pathlib import Path
+
+import aps_cli.app as app
+
+
+def test_scanner_parses_only_tail_candidates(monkeypatch):
+    calls = []
+    real = app._is_json_status_line
+    monkeypatch.setattr(app, "_is_json_status_line", lambda line: calls.append(line) or real(line))
+
+    logged = []
+    sc = app._FrameScanner(logged.append, tail=4)
+    for i in range(1000):
+        sc.feed(json.dumps({"event": "progress", "i": i}) + "\n")
+    sc.feed('{"status":"ok","outputs":{"x":1}}\n')
+    sc.feed("trailing log\n")
+
+    final = sc.finish()
+    assert final == {"status": "ok", "outputs": {"x": 1}}
+    # only the candidate frame was parsed, not the 1000 JSON-looking (status-less) log lines
+    assert len(calls) == 1
+    assert len(logged) == 1001
+    assert logged[-1] == "trailing log"
+    assert '{"status":"ok","outputs":{"x":1}}' not in logged
+
+
+def test_scanner_falls_back_to_aged_out_frame():
+    logged = []
+    sc = app._FrameScanner(logged.append, tail=2)
+    sc.feed('{"status":"ok","outputs":{}}')
+    for i in range(5):
+        sc.feed(f"late log {i}")
+    assert sc.finish() == {"status": "ok", "outputs": {}}
+
+
+def test_scanner_keeps_final_frame_behind_many_json_events():
+    logged = []
+    sc = app._FrameScanner(logged.append)  # default 32-line tail
+    sc.feed('{"status":"ok","outputs":{"n":1}}')
+    for i in range(40):
+        sc.feed(json.dumps({"event": i}))
+    lines = ['{"status":"ok","outputs":{"n":1}}'] + [json.dumps({"event": i}) for i in range(40)]
+    assert sc.finish() == app._split_final(lines)[0] == {"status": "ok", "outputs": {"n": 1}}
+    assert len(logged) == 41
+
+
+def test_scanner_defers_parsing_aged_out_status_lines(monkeypatch):
+    calls = []
+    real = app._is_json_status_line
+    monkeypatch.setattr(app, "_is_json_status_line", lambda line: calls.append(line) or real(line))
+
+    sc = app._FrameScanner(tail=4)
+    for i in range(500):
+        sc.feed(json.dumps({"status": "progress", "i": i}))
+    sc.feed('{"status":"ok","outputs":{}}')
+    sc.feed('{"event": "done", "field": "status"}')  # mentions "status" but is no frame
+    for i in range(10):
+        sc.feed(f"late log {i}")
+    assert calls == []  # nothing parsed while feeding
+    assert sc.finish() == {"status": "ok", "outputs": {}}
+    assert len(calls) == 2  # the non-frame, then the frame
+
+
+def test_scanner_without_frame_logs_everything():
+    logged = []
+    sc = app._FrameScanner(logged.append, tail=3)
+    for i in range(5):
+        sc.feed(f"line {i}")
+    assert sc.finish() is None
+    assert logged == [f"line {i}" for i in range(5)]
+
+
+def test_sync_run_streams_large_output_to_log(tmp_path, monkeypatch, capsys):
+    root = tmp_path / "chatty"
+    (root / "aps").mkdir(parents=True)
+    (root / "src").mkdir()
+    (root / "aps" / "agent.yaml").write_text(
+        "aps_version: 0.1\nid: dev.chatty\nname: Chatty\nversion: 0.0.1\n"
+        "runtimes:\n  - kind: python\n    entrypoint: python src/main.py\n",
+        encoding="utf-8",
+    )
+    (root / "src" / "main.py").write_text(
+        "import sys, json\n"
+        "sys.stdin.read()\n"
+        "for i in range(20000):\n"
+        "    print(json.dumps({'status': 'progress', 'i': i, 'pad': 'x' * 64}))\n"
+        "print(json.dumps({'status': 'ok', 'outputs': {'n': 20000}}))\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr("sys.stdin", io.StringIO("{}"))
+    ns = types.SimpleNamespace(path=str(root), stream=False, input=None, timeout=60)
+    assert app.cmd_run(ns) == 0
+    assert json.loads(capsys.readouterr().out.strip()) == {"status": "ok", "outputs": {"n": 20000}}
+
+    logs = list(Path(app.LOGS_DIR / "dev.chatty" / "0.0.1").glob("*.log"))
+    text = logs[0].read_text(encoding="utf-8")
+    body, result = text.split("## RESULT\n")
+    assert body.count('"status": "progress"') == 20000
+    assert json.loads(result) == {"status": "ok", "outputs": {"n": 20000}}
@@ -0,0 +1,169 @@
+# cli/tests/test_pool.py
+import io
+import json
+import tempfile
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+import aps_cli.app as app
+from aps_cli import pool
+
+
+def _make_worker_agent(root: Path, worker: bool = True):
+    """
+    Agent that serves one envelope per stdin line when APS_WORKER=1 and
+    reports its pid so tests can tell warm reuse from a fresh spawn.
+    """
+    (root / "aps").mkdir(parents=True, exist_ok=True)
+    (root / "src" / "echo").mkdir(parents=True, exist_ok=True)
+    (root / "aps" / "agent.yaml").write_text(
+        """aps_version: 0.1
+id: dev.worker
+name: Worker
+version: 0.0.1
+summary: Persistent echo
+runtimes:
+  - kind: python
+    entrypoint: python src/echo/main.py
+    worker: %s
+""" % ("true" if worker else "false"),
+        encoding="utf-8",
+    )
+    (root / "src" / "echo" / "main.py").write_text(
+        r"""import sys, os, json, time
+
+def answer(raw):
+    req = json.loads(raw) if raw.strip() else {}
+    if req.get("operation") == "ping":
+        return {"status": "ok", "outputs": {"pong": True}}
+    inputs = req.get("inputs") or {}
+    if inputs.get("sleep"):
+        time.sleep(inputs["sleep"])
+    if inputs.get("crash"):
+        open(inputs["crash"], "a").write("x")
+        os._exit(3)
+    print(f"[worker] handling {inputs.get('text','')}", flush=True)
+    return {"status": "ok", "outputs": {"text": inputs.get("text", ""), "pid": os.getpid()}}
+
+if os.environ.get("APS_WORKER") == "1":
+    for line in sys.stdin:
+        if line.strip():
+            print(json.dumps(answer(line)), flush=True)
+else:
+    print(json.dumps(answer(sys.stdin.read() or "")))
+""",
+        encoding="utf-8",
+    )
+    return root
+
+
+def _req(text, **extra):
+    return json.dumps({"aps_version": "0.1", "operation": "run", "inputs": {"text": text, **extra}})
+
+
+def test_pool_reuses_and_recycles_workers(tmp_path):
+    root = _make_worker_agent(tmp_path / "agent")
+    p = pool.WorkerPool(root, size=1, max_requests=2)
+    try:
+        first, logs = p.run(_req("a"))
+        second, _ = p.run(_req("b"))
+        third, _ = p.run(_req("c"))
+    finally:
+        p.close()
+
+    assert first["outputs"]["text"] == "a"
+    assert logs == ["[worker] handling a"]
+    # same warm process for the first two, recycled after max_requests
+    assert first["outputs"]["pid"] == second["outputs"]["pid"]
+    assert third["outputs"]["pid"] != second["outputs"]["pid"]
+
+
+def test_pool_timeout_kills_worker_and_evicts_idle(tmp_path):
+    root = _make_worker_agent(tmp_path / "agent")
+    p = pool.WorkerPool(root, size=1, idle_timeout=0.0)
+    try:
+        with pytest.raises(TimeoutError):
+            p.run(_req("slow", sleep=5), timeout=0.5)
+        ok, _ = p.run(_req("after"))
+        assert ok["outputs"]["text"] == "after"
+        assert p.idle_count() == 1
+        assert p.evict_idle() == 1
+        assert p.idle_count() == 0
+    finally:
+        p.close()
+
+
+def test_pool_retries_only_undelivered_requests(tmp_path):
+    root = _make_worker_agent(tmp_path / "agent")
+    marker = tmp_path / "handled"
+    p = pool.WorkerPool(root, size=1)
+    try:
+        # died mid-request: the side effect happened once and the error surfaces
+        with pytest.raises(pool.WorkerError):
+            p.run(_req("boom", crash=str(marker)), timeout=10)
+        assert marker.read_text() == "x"
+
+        # died while idle (and not noticed by the liveness check): retried on a fresh worker
+        w = p._checkout()
+        w.proc.kill()
+        w.proc.wait()
+        w.alive = lambda: True
+        p._idle.append(w)
+        ok, _ = p.run(_req("again"), timeout=10)
+        assert ok["outputs"]["text"] == "again"
+    finally:
+        p.close()
+
+
+def test_pool_manager_keys_by_root(tmp_path):
+    a = _make_worker_agent(tmp_path / "a")
+    b = _make_worker_agent(tmp_path / "b")  # same id@version, different directory
+    manager = pool.PoolManager(size=1)
+    try:
+        pa, pb = manager.get(a), manager.get(b)
+        assert pa is not pb
+        assert manager.get(a) is pa
+        assert pa.run(_req("x"))[0]["outputs"]["text"] == "x"
+    finally:
+        manager.close()
+
+
+def test_run_mode_pool_uses_daemon(tmp_path, monkeypatch, capsys):
+    if not hasattr(pool.socketserver, "ThreadingUnixStreamServer"):
+        pytest.skip("unix sockets not available")
+    root = _make_worker_agent(tmp_path / "agent")
+    # keep the socket path short (AF_UNIX path limit)
+    sock = str(Path(tempfile.mkdtemp(prefix="aps")) / "pool.sock")
+    monkeypatch.setenv("APS_POOL_SOCKET", sock)
+
+    manager = pool.PoolManager(size=1)
+    server = pool.make_server(sock, manager)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        pids = []
+        for text in ("one", "two"):
+            monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps({"text": text})))
+            ns = types.SimpleNamespace(path=str(root), stream=False, input=None, timeout=10, mode="pool")
+            assert app.cmd_run(ns) == 0
+            out = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+            assert out["outputs"]["text"] == text
+            pids.append(out["outputs"]["pid"])
+        assert pids[0] == pids[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+        manager.close()
+
+
+def test_run_mode_pool_falls_back_without_opt_in(tmp_path, monkeypatch, capsys):
+    root = _make_worker_agent(tmp_path / "agent", worker=False)
+    monkeypatch.setenv("APS_POOL_SOCKET", str(tmp_path / "missing.sock"))
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps({"text": "plain"})))
+    ns = types.SimpleNamespace(path=str(root), stream=False, input=None, timeout=10, mode="pool")
+    assert app.cmd_run(ns) == 0
+    out = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert out["outputs"]["text"] == "plain"
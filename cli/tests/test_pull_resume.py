@@ -0,0 +1,142 @@
+# cli/tests/test_pull_resume.py
+import hashlib
+import os
+import shutil
+import types
+from pathlib import Path
+
+import pytest
+
+import aps_cli.app as app
+from aps_cli import cache
+
+from .test_cache import _make_tarball
+
+
+class _RangeResp:
+    def __init__(self, status, body, headers, fail_after=None):
+        self.status_code, self._body, self.headers = status, body, headers
+        self._fail_after = fail_after
+
+    def json(self):
+        return {"id": "dev.echo", "version": "0.2.0"}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        sent = 0
+        for i in range(0, len(self._body), 512):
+            if self._fail_after is not None and sent >= self._fail_after:
+                raise ConnectionError("connection reset")
+            piece = self._body[i:i + 512]
+            sent += len(piece)
+            yield piece
+
+
+class _RangeRegistry:
+    """Serves one package with Range/If-Range/If-None-Match semantics like the registry."""
+
+    def __init__(self, body: bytes, checksum=None):
+        self.body = body
+        self.sha = checksum or hashlib.sha256(body).hexdigest()
+        self.requests = []
+        self.fail_after = None
+
+    def get(self, url, timeout=10, stream=False, headers=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        if "/download" not in url:
+            return _RangeResp(200, b"", {})
+        base = {"ETag": f'"{self.sha}"', "X-APS-Digest": f"sha256:{self.sha}", "Accept-Ranges": "bytes"}
+        if headers.get("If-None-Match") == base["ETag"]:
+            return _RangeResp(304, b"", base)
+        rng = headers.get("Range")
+        if rng and headers.get("If-Range", base["ETag"]) == base["ETag"]:
+            start, _, end = rng[len("bytes="):].partition("-")
+            start, end = int(start), int(end) if end else len(self.body) - 1
+            if start >= len(self.body):
+                return _RangeResp(416, b"", {})
+            part = self.body[start:end + 1]
+            return _RangeResp(206, part, {**base, "Content-Range": f"bytes {start}-{end}/{len(self.body)}"})
+        fail, self.fail_after = self.fail_after, None
+        return _RangeResp(200, self.body, base, fail_after=fail)
+
+
+def _pull(monkeypatch, reg, **kw):
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=reg.get))
+    ns = types.SimpleNamespace(agent="dev.echo", registry="http://reg", version="0.2.0", **kw)
+    return app.cmd_pull(ns)
+
+
+def _padded_tarball() -> bytes:
+    # incompressible padding so the tarball spans several download pieces
+    return _make_tarball() + os.urandom(6000)
+
+
+def test_interrupted_pull_resumes_with_range(monkeypatch, capsys):
+    body = _padded_tarball()
+    reg = _RangeRegistry(body)
+    reg.fail_after = 2048
+    with pytest.raises(ConnectionError):
+        _pull(monkeypatch, reg)
+    part = Path(app.CACHE_DIR) / ".blobs" / "tmp" / "dev.echo@0.2.0.part"
+    assert part.stat().st_size == 2048
+
+    assert _pull(monkeypatch, reg) == 0
+    assert reg.requests[-1] == {"Range": "bytes=2048-", "If-Range": f'"{reg.sha}"'}
+    assert cache.index_get(app.CACHE_DIR, "dev.echo", "0.2.0") == reg.sha
+    assert not part.exists()
+    assert "resumed at" in capsys.readouterr().err
+
+
+def test_fetched_blob_is_on_disk_before_commit(monkeypatch):
+    body = _padded_tarball()
+    reg = _RangeRegistry(body)
+    with cache.BlobWriter(app.CACHE_DIR, key="dev.echo@0.2.0") as blob:
+        app._fetch_to_blob("http://reg/v1/agents/dev.echo/versions/0.2.0/download", blob, http=reg)
+        # the signature check reads blob.path before the blob is committed
+        assert blob.path.read_bytes() == body
+        blob.discard()
+
+
+def test_parallel_pull_assembles_pieces(monkeypatch):
+    monkeypatch.setattr(app, "PIECE_SIZE", 1024)
+    body = _padded_tarball()
+    reg = _RangeRegistry(body)
+    assert _pull(monkeypatch, reg, parallel=4) == 0
+    ranges = [h["Range"] for h in reg.requests if "Range" in h]
+    assert len(ranges) == 1 + (len(body) + 1023) // 1024  # probe + one per piece
+    assert cache.blob_path(Path(app.CACHE_DIR), reg.sha).read_bytes() == body
+    assert cache.is_installed(app.cached_agent_dir("dev.echo", "0.2.0"))
+
+
+def test_checksum_mismatch_is_rejected(monkeypatch):
+    reg = _RangeRegistry(_make_tarball(), checksum="0" * 64)
+    assert _pull(monkeypatch, reg) == 1
+    assert not cache.is_installed(app.cached_agent_dir("dev.echo", "0.2.0"))
+    assert cache.index_get(app.CACHE_DIR, "dev.echo", "0.2.0") is None
+
+
+def test_missing_install_is_revalidated_with_304(monkeypatch, capsys):
+    reg = _RangeRegistry(_padded_tarball())
+    assert _pull(monkeypatch, reg) == 0
+    target = Path(app.cached_agent_dir("dev.echo", "0.2.0"))
+    shutil.rmtree(target)  # extracted copy removed; blob + index remain
+    reg.requests.clear()
+
+    assert _pull(monkeypatch, reg) == 0
+    assert reg.requests == [{"If-None-Match": f'"{reg.sha}"'}]  # one bodyless round trip
+    assert cache.is_installed(target)
+    assert "not modified" in capsys.readouterr().err
+
+    # registry content changed: the conditional GET misses and a full download follows
+    shutil.rmtree(target)
+    reg.body = _padded_tarball()
+    reg.sha = hashlib.sha256(reg.body).hexdigest()
+    assert _pull(monkeypatch, reg) == 0
+    assert cache.index_get(app.CACHE_DIR, "dev.echo", "0.2.0") == reg.sha
@@ -13,3 +13,17 @@ def test_rag_local(tmp_path, monkeypatch):
     ns = types.SimpleNamespace(path=str(root), stream=False, input=None, timeout=30)
     rc = app.cmd_run(ns)
     assert rc == 0
+
+def test_rag_worker_survives_bad_requests():
+    import os, subprocess, sys
+    root = Path(__file__).parent.parent.parent / "examples" / "rag-agent"
+    lines = ["not json", "[1, 2]", '{"inputs": {"query": "APS", "top_k": "x"}}',
+             '{"aps_version":"0.1","operation":"run","inputs":{"query":"APS","top_k":1}}']
+    proc = subprocess.run([sys.executable, "src/rag/main.py"], input="\n".join(lines) + "\n",
+                          capture_output=True, text=True, cwd=str(root), timeout=60,
+                          env={**os.environ, "APS_WORKER": "1"})
+    frames = [json.loads(l) for l in proc.stdout.splitlines()]
+    assert proc.returncode == 0
+    assert len(frames) == 4
+    assert frames[2]["status"] == "error"
+    assert frames[3]["status"] == "ok" and frames[3]["outputs"]["matches"]
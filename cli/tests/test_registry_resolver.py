@@ -1,5 +1,6 @@
 # cli/tests/test_registry_resolver.py
 from pathlib import Path
+import io
 import types
 import argparse
 
@@ -77,3 +78,98 @@ def test_resolve_registry_fails_on_bad_http(monkeypatch, dummy_resp):
     except Exception as e:
         # The resolver should mention HTTP or 'failed to resolve'
         assert "failed to resolve" in str(e) or "HTTP" in str(e)
+
+
+def _install(agent_id, version):
+    d = app.CACHE_DIR / agent_id / version
+    (d / "aps").mkdir(parents=True, exist_ok=True)
+    (d / "aps" / "agent.yaml").write_text("aps_version: '0.1'\n", encoding="utf-8")
+    return d
+
+
+def _no_network(*a, **k):
+    raise AssertionError("unexpected network call")
+
+
+def test_resolve_pinned_cached_needs_no_network(monkeypatch):
+    d = _install("dev.echo", "0.0.5")
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=_no_network))
+    assert app._resolve_registry_path_if_needed("registry://dev.echo@0.0.5") == str(d)
+
+
+def test_resolve_latest_uses_meta_cache_then_revalidates(monkeypatch, dummy_resp):
+    d = _install("dev.echo", "0.1.0")
+    calls = []
+
+    def fake_get(url, timeout=10, headers=None):
+        calls.append(headers)
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return dummy_resp({}, status=304)
+        r = dummy_resp({"id": "dev.echo", "version": "0.1.0"})
+        r.headers = {"ETag": '"v1"'}
+        return r
+
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=fake_get))
+    assert app._resolve_registry_path_if_needed("registry://dev.echo") == str(d)
+    assert app._resolve_registry_path_if_needed("registry://dev.echo") == str(d)
+    assert calls == [None]  # second lookup served from the metadata cache
+
+    monkeypatch.setenv("APS_META_TTL", "0")
+    assert app._resolve_registry_path_if_needed("registry://dev.echo") == str(d)
+    assert calls == [None, {"If-None-Match": '"v1"'}]
+
+
+def test_resolve_falls_back_to_stale_meta_when_registry_down(monkeypatch, dummy_resp):
+    d = _install("dev.echo", "0.1.0")
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(
+        get=lambda url, timeout=10: dummy_resp({"id": "dev.echo", "version": "0.1.0"})))
+    app._resolve_registry_path_if_needed("registry://dev.echo")
+
+    def down(url, timeout=10, headers=None):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setenv("APS_META_TTL", "0")
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=down))
+    assert app._resolve_registry_path_if_needed("registry://dev.echo") == str(d)
+
+
+def test_resolve_offline_uses_newest_installed(monkeypatch):
+    for v in ("0.9.0", "0.10.0", "0.10.0-rc1"):
+        _install("dev.echo", v)
+    monkeypatch.setenv("APS_OFFLINE", "1")
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=_no_network))
+    assert app._resolve_registry_path_if_needed("registry://dev.echo").endswith("0.10.0")
+    try:
+        app._resolve_registry_path_if_needed("registry://dev.echo@1.0.0")
+        assert False, "expected exception"
+    except FileNotFoundError as e:
+        assert "offline" in str(e)
+
+
+def test_pull_latest_offline_without_metadata(monkeypatch):
+    monkeypatch.setenv("APS_OFFLINE", "1")
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=_no_network))
+    ns = argparse.Namespace(agent="dev.nowhere", registry="http://reg", version=None)
+    try:
+        app.cmd_pull(ns)
+        assert False, "expected exception"
+    except FileNotFoundError as e:
+        assert "offline" in str(e)
+
+
+def test_run_flags_do_not_leak_into_environment(fabricate_cached_agent, monkeypatch, capsys):
+    for var in ("APS_OFFLINE", "APS_VERIFY", "APS_REQUIRE_SIGNATURE", "APS_PUBKEY"):
+        monkeypatch.delenv(var, raising=False)
+    _, _, root = fabricate_cached_agent
+    seen = {}
+
+    def fake_helper(path, req, timeout_s=None):
+        seen.update({k: v for k, v in app.os.environ.items() if k.startswith("APS_")})
+        return 0
+
+    monkeypatch.setattr(app, "helper_run_agent", fake_helper)
+    monkeypatch.setattr("sys.stdin", io.StringIO("{}"))
+    ns = types.SimpleNamespace(path=str(root), stream=False, input=None, timeout=10, mode="spawn",
+                               offline=True, verify=True, require_signature=True, pubkey="k.pem")
+    assert app.cmd_run(ns) == 0
+    assert not {"APS_OFFLINE", "APS_VERIFY", "APS_REQUIRE_SIGNATURE", "APS_PUBKEY"} & set(seen)
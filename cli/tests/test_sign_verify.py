@@ -37,3 +37,270 @@ def test_keygen_sign_verify_roundtrip(tmp_path, monkeypatch):
     pkg.write_bytes(b"tampered")
     rc = app.cmd_verify(type("NS", (), {"package": str(pkg), "signature": str(sig), "pubkey": str(pub)})())
     assert rc == 1
+
+
+def _keypair(tmp_path, monkeypatch, name="testkey"):
+    monkeypatch.setattr(app, "KEYS_DIR", tmp_path / "keys")
+    monkeypatch.setattr(app, "PUBS_DIR", tmp_path / "keys.pub")
+    app.KEYS_DIR.mkdir(parents=True, exist_ok=True)
+    app.PUBS_DIR.mkdir(parents=True, exist_ok=True)
+    assert app.cmd_keygen(type("NS", (), {"name": name})()) == 0
+    return app._load_private_key(app._key_path(name)), app._pub_path(name)
+
+
+def _package(tmp_path, agent_id="dev.echo", version="0.1.0"):
+    import io, tarfile
+    pkg = tmp_path / f"{agent_id}.aps.tar.gz"
+    with tarfile.open(pkg, "w:gz") as tf:
+        for name, data in (("aps/agent.yaml", f"id: {agent_id}\nversion: {version}\n".encode()),
+                           ("src/main.py", b"print('hi')\n")):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return pkg
+
+
+class _Resp:
+    def __init__(self, body, status=200):
+        self.body, self.status_code, self.headers = body, status, {}
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _fake_registry(monkeypatch, body: bytes, sig: bytes) -> list:
+    """Serves body as the download and sig at the .sig URL; returns the requested URLs."""
+    import types
+    fetched = []
+
+    def fake_get(url, timeout=10, stream=False, headers=None):
+        fetched.append(url)
+        if url.endswith(".sig"):
+            return _Resp(sig)
+        return _Resp(body) if "/download" in url else _Resp(b"", status=404)
+
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=fake_get))
+    return fetched
+
+
+def test_sign_writes_digest_envelope(tmp_path, monkeypatch, capsys):
+    import base64, hashlib
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    pkg = _package(tmp_path)
+    capsys.readouterr()
+    assert app.cmd_sign(type("NS", (), {"package": str(pkg), "key": "testkey"})()) == 0
+    out = json.loads(capsys.readouterr().out)
+
+    env = json.loads(Path(str(pkg) + ".sig").read_text())
+    meta = json.loads(base64.b64decode(env["payload"]))
+    assert meta == {
+        "format": "aps-sig/v1", "file": pkg.name,
+        "digest": "sha256:" + hashlib.sha256(pkg.read_bytes()).hexdigest(),
+        "size": pkg.stat().st_size, "id": "dev.echo", "version": "0.1.0",
+        "key": out["fingerprint"],
+    }
+    assert out["digest"] == meta["digest"]
+
+    rc = app.cmd_verify(type("NS", (), {"package": str(pkg), "signature": None, "pubkey": str(pub)})())
+    assert rc == 0
+    assert json.loads(capsys.readouterr().out)["version"] == "0.1.0"
+
+
+def test_legacy_raw_signature_still_verifies(tmp_path, monkeypatch):
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    pkg = _package(tmp_path)
+    sig = Path(str(pkg) + ".sig")
+    sig.write_bytes(priv.sign(pkg.read_bytes()))
+    assert app.cmd_verify(type("NS", (), {"package": str(pkg), "signature": str(sig), "pubkey": str(pub)})()) == 0
+    sig.write_bytes(priv.sign(b"something else"))
+    assert app.cmd_verify(type("NS", (), {"package": str(pkg), "signature": str(sig), "pubkey": str(pub)})()) == 1
+
+
+def test_envelope_checks_known_digest_without_rereading(tmp_path, monkeypatch):
+    import hashlib
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    pkg = _package(tmp_path)
+    digest, size = hashlib.sha256(pkg.read_bytes()).hexdigest(), pkg.stat().st_size
+    sig = json.dumps(app._sign_envelope(priv, pkg, digest, size, "dev.echo", "0.1.0")).encode()
+    pub_key = app._load_public_key(pub)
+
+    def no_read(path):
+        raise AssertionError("package re-read")
+    monkeypatch.setattr(app._cache, "file_sha256", no_read)
+
+    ok, msg, _ = app._check_signature(pub_key, sig, pkg, digest=digest, size=size,
+                                      agent_id="dev.echo", version="0.1.0")
+    assert ok, msg
+    assert not app._check_signature(pub_key, sig, pkg, digest="0" * 64, size=size)[0]
+    assert not app._check_signature(pub_key, sig, pkg, digest=digest, size=size + 1)[0]
+    # a validly signed envelope for another package/version is rejected
+    ok, msg, _ = app._check_signature(pub_key, sig, pkg, digest=digest, size=size,
+                                      agent_id="dev.echo", version="0.2.0")
+    assert not ok and "version" in msg
+
+    # a different key's envelope fails even with matching digest
+    other, _ = _keypair(tmp_path / "other", monkeypatch, name="other")
+    forged = json.dumps(app._sign_envelope(other, pkg, digest, size)).encode()
+    assert not app._check_signature(pub_key, forged, pkg, digest=digest, size=size)[0]
+
+
+def test_verified_packages_hit_the_trust_cache(tmp_path, monkeypatch):
+    import hashlib, types
+    import pytest
+    from aps_cli import cache
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    pkg = _package(tmp_path, version="0.2.0")
+    body = pkg.read_bytes()
+    digest = hashlib.sha256(body).hexdigest()
+    sig = json.dumps(app._sign_envelope(priv, pkg, digest, len(body), "dev.echo", "0.2.0")).encode()
+    fetched = _fake_registry(monkeypatch, body, sig)
+    ns = types.SimpleNamespace(agent="dev.echo", registry="http://reg", version="0.2.0", verify=True,
+                               require_signature=True, pubkey=str(pub))
+    assert app.cmd_pull(ns) == 0
+    assert any(u.endswith(".sig") for u in fetched)
+
+    # installed and verified: no network, no signature check
+    monkeypatch.setenv("APS_REQUIRE_SIGNATURE", "1")
+    monkeypatch.setenv("APS_PUBKEY", str(pub))
+    check = app._check_signature
+    monkeypatch.setattr(app, "_check_signature", lambda *a, **k: pytest.fail("re-verified"))
+    fetched.clear()
+    assert app._resolve_registry_path_if_needed("registry://dev.echo@0.2.0").endswith("0.2.0")
+    assert app.cmd_pull(ns) == 0
+    assert fetched == []
+
+    # cached bytes changed: the record is dropped and verification fails
+    monkeypatch.setattr(app, "_check_signature", check)
+    blob = cache.blob_path(app.CACHE_DIR, digest)
+    blob.write_bytes(body[:20] + bytes([body[20] ^ 0xff]) + body[21:])
+    with pytest.raises(RuntimeError):
+        app._resolve_registry_path_if_needed("registry://dev.echo@0.2.0")
+    assert cache.trust_get(app.CACHE_DIR, digest, app._pub_fingerprint(priv.public_key())) is None
+
+
+def _built_agent(tmp_path):
+    """aps build of a small agent with an asset; returns the tarball."""
+    import types
+    src = tmp_path / "agent"
+    (src / "aps").mkdir(parents=True)
+    (src / "src").mkdir()
+    (src / "assets").mkdir()
+    (src / "aps" / "agent.yaml").write_text("aps_version: 0.1\nid: dev.echo\nname: Echo\nversion: 0.3.0\n")
+    (src / "src" / "main.py").write_text("print('hi')\n")
+    (src / "assets" / "weights.bin").write_bytes(bytes(range(256)) * 64)
+    assert app.cmd_build(types.SimpleNamespace(path=str(src), dist=str(tmp_path / "dist"))) == 0
+    return tmp_path / "dist" / "dev.echo.aps.tar.gz"
+
+
+def test_build_and_sign_commit_to_per_file_merkle_root(tmp_path, monkeypatch, capsys):
+    import base64, types
+    from aps_cli import merkle
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    pkg = _built_agent(tmp_path)
+    capsys.readouterr()
+    assert app.cmd_sign(types.SimpleNamespace(package=str(pkg), key="testkey")) == 0
+    sig = Path(str(pkg) + ".sig")
+    meta = json.loads(base64.b64decode(json.loads(sig.read_text())["payload"]))
+    assert meta["files"]["count"] == 3
+
+    agent = tmp_path / "extracted"
+    app._extract_agent_pkg(str(pkg), agent)
+    entries = merkle.load_manifest((agent / merkle.FILES_MANIFEST).read_bytes())
+    assert sorted(e["path"] for e in entries) == ["aps/agent.yaml", "assets/weights.bin", "src/main.py"]
+    assert meta["files"]["root"] == "sha256:" + merkle.merkle_root(entries)
+
+    def verify(*files):
+        return app.cmd_verify(types.SimpleNamespace(package=str(agent), signature=str(sig), pubkey=str(pub),
+                                                    file=list(files) or None, jobs=2))
+    assert verify() == 0
+    (agent / "assets" / "weights.bin").write_bytes(b"\0" * (256 * 64))
+    assert verify("src/main.py") == 0  # only the files asked for are read
+    capsys.readouterr()
+    assert verify() == 1
+    assert json.loads(capsys.readouterr().out)["error"]["files"] == ["assets/weights.bin: sha256 mismatch"]
+
+    # the manifest itself is pinned by the signed root
+    entries[0]["sha256"] = "0" * 64
+    (agent / merkle.FILES_MANIFEST).write_bytes(merkle.manifest_bytes(entries))
+    assert verify("src/main.py") == 1
+
+
+def test_installed_agent_checks_are_incremental(tmp_path, monkeypatch, capsys):
+    import types
+    import pytest
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    pkg = _built_agent(tmp_path)
+    assert app.cmd_sign(types.SimpleNamespace(package=str(pkg), key="testkey")) == 0
+    _fake_registry(monkeypatch, pkg.read_bytes(), Path(str(pkg) + ".sig").read_bytes())
+    assert app.cmd_pull(types.SimpleNamespace(agent="dev.echo", registry="http://reg", version="0.3.0",
+                                              verify=True, require_signature=True, pubkey=str(pub))) == 0
+
+    ns = types.SimpleNamespace(package="registry://dev.echo", signature=None, pubkey=str(pub), file=None, jobs=None)
+    assert app.cmd_verify(ns) == 0
+    # a clean tree is not re-hashed while the files' stat is unchanged
+    sha = app.merkle.file_sha256
+    monkeypatch.setattr(app.merkle, "file_sha256", lambda p: pytest.fail(f"re-hashed {p}"))
+    assert app.cmd_verify(ns) == 0
+
+    monkeypatch.setattr(app.merkle, "file_sha256", sha)
+    main = app.cached_agent_dir("dev.echo", "0.3.0") / "src" / "main.py"
+    main.write_text("print('HI')\n")
+    capsys.readouterr()
+    assert app.cmd_verify(ns) == 1
+    assert "src/main.py: sha256 mismatch" in capsys.readouterr().out
+
+
+def test_verify_all_reports_jsonl_for_directory_and_cache(tmp_path, monkeypatch, capsys):
+    import types
+    priv, pub = _keypair(tmp_path, monkeypatch)
+    # a second key in the keyring
+    app._write_public_key(app._pub_path("other"), app.ed25519.Ed25519PrivateKey.generate().public_key())
+
+    pkgs = tmp_path / "pkgs"
+    for i, version in enumerate(["0.1.0", "0.2.0", "0.3.0"]):
+        (pkgs / str(i)).mkdir(parents=True)
+        pkg = _package(pkgs / str(i), version=version)
+        if i < 2:
+            assert app.cmd_sign(types.SimpleNamespace(package=str(pkg), key="testkey")) == 0
+    legacy = pkgs / "0" / "dev.echo.aps.tar.gz"
+    Path(f"{legacy}.sig").write_bytes(priv.sign(legacy.read_bytes()))
+    capsys.readouterr()
+
+    report = tmp_path / "report.jsonl"
+    ns = types.SimpleNamespace(all=True, package=str(pkgs), pubkey=None, jobs=2, report=str(report))
+    assert app.cmd_verify(ns) == 1  # one package is unsigned
+    recs = [json.loads(line) for line in report.read_text().splitlines()]
+    assert [(r["package"].split("/")[-2], r["status"]) for r in recs] == [
+        ("0", "ok"), ("1", "ok"), ("2", "no_signature")]
+    assert {r.get("key") for r in recs[:2]} == {"testkey"}
+
+    # cached packages: signatures kept at pull, trust cache reused, tampering caught
+    pkg = pkgs / "1" / "dev.echo.aps.tar.gz"
+    _fake_registry(monkeypatch, pkg.read_bytes(), Path(f"{pkg}.sig").read_bytes())
+    assert app.cmd_pull(types.SimpleNamespace(agent="dev.echo", registry="http://reg", version="0.2.0",
+                                              verify=True, require_signature=True, pubkey=str(pub))) == 0
+    capsys.readouterr()
+    ns = types.SimpleNamespace(all=True, package=None, pubkey=None, jobs=2, report=None)
+    assert app.cmd_verify(ns) == 0
+    (rec,) = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert (rec["id"], rec["version"], rec["status"], rec.get("cached")) == ("dev.echo", "0.2.0", "ok", True)
+
+    blob = Path(rec["package"])
+    blob.write_bytes(blob.read_bytes()[:-4] + b"\0\0\0\1")
+    assert app.cmd_verify(ns) == 1
+    assert json.loads(capsys.readouterr().out)["status"] == "bad_signature"
+
+
+def test_verify_all_missing_source_is_a_json_error(tmp_path, monkeypatch, capsys):
+    import types
+    _keypair(tmp_path, monkeypatch)
+    capsys.readouterr()
+    ns = types.SimpleNamespace(all=True, package=str(tmp_path / "nope"), pubkey=None, jobs=1, report=None)
+    assert app.cmd_verify(ns) == 1
+    assert json.loads(capsys.readouterr().out)["error"]["code"] == "NOT_FOUND"
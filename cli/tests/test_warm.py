@@ -0,0 +1,85 @@
+# cli/tests/test_warm.py
+import types
+
+import aps_cli.app as app
+from aps_cli import cache
+
+from .test_cache import _make_tarball
+from .test_pull_resume import _RangeRegistry
+
+
+class _MultiRegistry:
+    """Range-capable fake registry for several id@version packages (stands in for a Session)."""
+
+    def __init__(self, versions):
+        self.pkgs = {(i, v): _RangeRegistry(_make_tarball(v)) for i, v in versions}
+        self.downloads = []
+
+    def get(self, url, timeout=10, stream=False, headers=None, params=None):
+        if url.endswith("/v1/search"):
+            agents = [{"id": i, "version": v} for (i, v) in sorted(self.pkgs, reverse=True)]
+            start = int(params.get("after", 0))  # one hit per page: exercises paging
+            page = {"agents": agents[start:start + 1], "next": str(start + 1) if start + 1 < len(agents) else None}
+            return types.SimpleNamespace(status_code=200, raise_for_status=lambda: None, json=lambda: page)
+        agent_id = url.split("/v1/agents/")[1].split("/")[0]
+        if "/download" not in url:  # latest-version metadata
+            latest = max(v for (i, v) in self.pkgs if i == agent_id)
+            return types.SimpleNamespace(status_code=200, headers={}, json=lambda: {"id": agent_id, "version": latest})
+        version = url.rsplit("version=", 1)[1]
+        self.downloads.append((agent_id, version))
+        return self.pkgs[(agent_id, version)].get(url, timeout=timeout, stream=stream, headers=headers)
+
+
+def _warm(monkeypatch, reg, **kw):
+    monkeypatch.setattr(app, "_http_session", lambda pool_size: reg)
+    ns = dict(lockfile=None, search=None, registry="http://reg", workers=4, parallel=None)
+    ns.update(kw)
+    return app.cmd_warm(types.SimpleNamespace(**ns))
+
+
+def test_warm_from_lockfile_pulls_concurrently_and_skips_cached(monkeypatch, tmp_path, capsys):
+    versions = [(f"dev.a{i}", "1.0.0") for i in range(6)]
+    reg = _MultiRegistry(versions)
+    lock = tmp_path / "aps.lock"
+    lines = ["# node bootstrap"] + [f"{i}@{v}  sha256:{reg.pkgs[(i, v)].sha}" for i, v in versions]
+    lock.write_text("\n".join(lines + [lines[1]]) + "\n", encoding="utf-8")  # duplicate entry
+
+    assert _warm(monkeypatch, reg, lockfile=str(lock)) == 0
+    assert sorted(reg.downloads) == sorted(versions)
+    for i, v in versions:
+        assert cache.is_installed(app.cached_agent_dir(i, v))
+        assert cache.index_get(app.CACHE_DIR, i, v) == reg.pkgs[(i, v)].sha
+    assert "pulled=6 cached=0 error=0" in capsys.readouterr().err
+
+    # second run: digests match, nothing is downloaded
+    assert _warm(monkeypatch, reg, lockfile=str(lock)) == 0
+    assert len(reg.downloads) == 6
+    assert "pulled=0 cached=6" in capsys.readouterr().err
+
+
+def test_warm_digest_mismatch_fails_entry(monkeypatch, tmp_path, capsys):
+    reg = _MultiRegistry([("dev.a", "1.0.0")])
+    lock = tmp_path / "aps.lock"
+    lock.write_text(f"dev.a@1.0.0 sha256:{'0' * 64}\n", encoding="utf-8")
+    assert _warm(monkeypatch, reg, lockfile=str(lock)) == 1
+    assert not cache.is_installed(app.cached_agent_dir("dev.a", "1.0.0"))
+    assert "error=1" in capsys.readouterr().err
+
+
+def test_warm_from_search_takes_latest(monkeypatch):
+    reg = _MultiRegistry([("dev.a", "1.0.0"), ("dev.a", "1.1.0"), ("dev.b", "0.1.0")])
+    assert _warm(monkeypatch, reg, search="dev") == 0
+    assert sorted(reg.downloads) == [("dev.a", "1.1.0"), ("dev.b", "0.1.0")]
+
+
+def test_warm_latest_lookups_use_the_shared_session(monkeypatch, tmp_path):
+    reg = _MultiRegistry([("dev.a", "1.0.0"), ("dev.a", "1.1.0")])
+
+    def no_direct_requests(*a, **k):
+        raise AssertionError("metadata fetched outside the pooled session")
+
+    monkeypatch.setattr(app, "requests", types.SimpleNamespace(get=no_direct_requests))
+    lock = tmp_path / "aps.lock"
+    lock.write_text("dev.a\n", encoding="utf-8")
+    assert _warm(monkeypatch, reg, lockfile=str(lock)) == 0
+    assert reg.downloads == [("dev.a", "1.1.0")]
@@ -3,79 +3,35 @@
 # Endpoints:
 #   POST /agp/execute   (json: { "agent": "<path|registry://id>", "inputs": {...}, "timeout": null })
 #     -> {"status":"ok","outputs":{...}}
-#   GET  /agp/execute/stream?agent=...  (body: same JSON as above, but respond as SSE)
+#   POST /agp/execute/stream  (body: same JSON as above, but respond as SSE;
+#                              one SSE event per APS JSONL event, data = event JSON)
+#
+# Agents run through aps_cli.runner.AsyncRunner, so handlers never block the
+# event loop and one gateway process can drive many concurrent runs.
 #
 # Requires: fastapi, uvicorn, pyyaml, requests (already in your repo/venv)
 
-from fastapi import FastAPI, Request, Response, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
-import subprocess, os, json, shlex, time
-from pathlib import Path
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse
+import json
 
-app = FastAPI(title="APS AGP Gateway", version="0.1")
+from aps_cli.runner import AsyncRunner
 
-def _run_aps(agent: str, inputs: dict, stream: bool=False, timeout: int|None=None):
-    env = {"aps_version":"0.1","operation":"run","inputs":inputs or {}}
-    req = json.dumps(env)
-    # Use installed CLI 'aps' so registry:// works and resolver pulls when needed
-    cmd = ["aps", "run"]
-    if stream: cmd.append("--stream")
-    cmd.append(agent)
+app = FastAPI(title="APS AGP Gateway", version="0.1")
 
-    child_env = os.environ.copy()
-    child_env.setdefault("PYTHONUNBUFFERED", "1")
+def _envelope(inputs: dict) -> dict:
+    return {"aps_version":"0.1","operation":"run","inputs":inputs or {}}
 
-    if not stream:
-        p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=child_env)
-        out, _ = p.communicate(input=req, timeout=timeout)
-        # extract final JSON line
-        final = None
-        for line in (out or "").splitlines():
-            line = line.strip()
-            if line.startswith("{") and line.endswith("}"):
-                try:
-                    obj = json.loads(line)
-                    if "status" in obj: final = obj
-                except Exception:
-                    pass
-        return final or {"status":"error","error":{"code":"NO_FINAL_RESPONSE","message":"Agent produced no final JSON"}}
-    else:
-        # streaming as SSE
-        p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=child_env, bufsize=1)
-        try:
-            to_send = req if req.endswith("\n") else req+"\n"
-            p.stdin.write(to_send); p.stdin.flush(); p.stdin.close()
-        except Exception:
-            pass
+async def _run_aps(agent: str, inputs: dict, timeout: int|None=None) -> dict:
+    return await AsyncRunner(agent, timeout=timeout).run(_envelope(inputs))
 
-        def _gen():
-            final = None
-            start = time.time()
-            while True:
-                line = p.stdout.readline()
-                if not line:
-                    if p.poll() is not None: break
-                    time.sleep(0.01)
-                    if timeout and (time.time()-start)>timeout:
-                        p.kill(); break
-                    continue
-                s = line.strip()
-                # Non-JSON lines as log events
-                if not (s.startswith("{") and s.endswith("}")):
-                    yield f"event: log\ndata: {s}\n\n"
-                    continue
-                try:
-                    obj = json.loads(s)
-                    if "status" in obj:
-                        final = obj
-                        yield f"event: final\ndata: {json.dumps(obj)}\n\n"
-                except Exception:
-                    yield f"event: log\ndata: {s}\n\n"
-            if not final:
-                err = {"status":"error","error":{"code":"NO_FINAL_RESPONSE","message":"Agent produced no final JSON"}}
-                yield f"event: final\ndata: {json.dumps(err)}\n\n"
+def _stream_aps(agent: str, inputs: dict, timeout: int|None=None) -> StreamingResponse:
+    async def _gen():
+        # typed events (log/progress/token/partial_output/metric/final) map 1:1 onto SSE events
+        async for ev in AsyncRunner(agent, timeout=timeout).stream(_envelope(inputs), events=True):
+            yield f"event: {ev['type']}\ndata: {json.dumps(ev)}\n\n"
 
-        return StreamingResponse(_gen(), media_type="text/event-stream")
+    return StreamingResponse(_gen(), media_type="text/event-stream")
 
 @app.post("/agp/execute")
 async def agp_execute(req: Request):
@@ -85,7 +41,7 @@ async def agp_execute(req: Request):
     timeout = body.get("timeout", None)
     if not agent:
         raise HTTPException(400, "missing 'agent'")
-    res = _run_aps(agent, inputs, stream=False, timeout=timeout)
+    res = await _run_aps(agent, inputs, timeout=timeout)
     return JSONResponse(res)
 
 @app.post("/agp/execute/stream")
@@ -96,12 +52,10 @@ async def agp_execute_stream(req: Request):
     timeout = body.get("timeout", None)
     if not agent:
         raise HTTPException(400, "missing 'agent'")
-    res = _run_aps(agent, inputs, stream=True, timeout=timeout)
-    return res
+    return _stream_aps(agent, inputs, timeout=timeout)
 
 # For local dev:
 #   uvicorn interop.agp.gateway:app --reload --port 8090
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8090)
-
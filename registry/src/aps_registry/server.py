@@ -1,14 +1,53 @@
 # registry/src/aps_registry/server.py
 # FastAPI app factory for the APS Registry (no globals)
 from __future__ import annotations
-import os
+import os, re, json, tarfile
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, UploadFile, File, Query, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
-from .store import Store
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+from .store import Store, UploadTooLarge
+from .storage import BlobStorage, storage_from_spec
 
-def create_app(root: str) -> FastAPI:
-    app = FastAPI(title="APS Registry", version="0.1")
-    app.state.store = Store(root)
+MULTIPART_SLACK = 64 * 1024  # form boundaries/headers around the file part
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+def _max_upload_from_env() -> int | None:
+    v = os.environ.get("APS_REGISTRY_MAX_UPLOAD_MB")
+    return int(float(v) * 1024 * 1024) if v else None
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # weak comparison, as If-None-Match requires
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def create_app(root: str, max_upload: int | None = None, storage: BlobStorage | str | None = None) -> FastAPI:
+    """
+    max_upload: publish size limit in bytes (default: $APS_REGISTRY_MAX_UPLOAD_MB, else unlimited).
+    storage: a BlobStorage or spec ("fs", "sharded", "s3://bucket/prefix"; default $APS_REGISTRY_STORAGE, else "fs").
+    """
+    if not isinstance(storage, BlobStorage):
+        storage = storage_from_spec(storage or os.environ.get("APS_REGISTRY_STORAGE"), root)
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        app.state.store.close()
+
+    app = FastAPI(title="APS Registry", version="0.1", lifespan=lifespan)
+    app.state.store = Store(root, max_upload=max_upload if max_upload is not None else _max_upload_from_env(),
+                            storage=storage)
+
+    @app.middleware("http")
+    async def upload_limit(request: Request, call_next):
+        # Reject oversized publishes from Content-Length before the body is parsed;
+        # save_upload still enforces the limit for chunked/unknown-length bodies
+        limit = request.app.state.store.max_upload
+        length = request.headers.get("content-length", "")
+        if limit is not None and request.url.path == "/v1/publish" and length.isdigit() \
+                and int(length) > limit + MULTIPART_SLACK:
+            return JSONResponse({"detail": f"upload exceeds {limit} bytes"}, status_code=413)
+        return await call_next(request)
 
     @app.get("/healthz")
     def healthz():
@@ -16,35 +55,181 @@ def create_app(root: str) -> FastAPI:
 
     @app.post("/v1/publish")
     def publish(request: Request, file: UploadFile = File(...)):
-        # Read whole file in memory for simplicity; you can stream to disk if needed
-        data = file.file.read()
         store: Store = request.app.state.store
-        tmp = store.save_upload(file.filename, data)
-        agent = store.index_package(tmp)
+        # Stream to a unique temp file (constant memory, hashed on the fly)
+        try:
+            tmp, sha256 = store.save_upload(file.filename, file.file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        try:
+            agent = store.index_package(tmp, sha256=sha256)
+        except (FileNotFoundError, KeyError, tarfile.TarError) as e:
+            raise HTTPException(status_code=400, detail=f"invalid package: {e}")
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
         return {"status":"ok","agent":agent}
 
     @app.get("/v1/search")
-    def search(request: Request, q: str = Query("")):
+    def search(request: Request, q: str = Query(""), limit: int = Query(50, ge=1, le=500),
+               after: str | None = None, cursor: str | None = None):
+        """Ranked search, paged like /v1/agents: pass the previous page's `next` as `after` (`cursor` is an alias)."""
         store: Store = request.app.state.store
-        return {"agents": store.search(q)}
+        try:
+            agents, next_cursor = store.search(q, limit=limit, cursor=after if after is not None else cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"agents": agents, "next": next_cursor}
+
+    @app.get("/v1/agents")
+    def list_agents(request: Request, limit: int = Query(50, ge=1, le=500), after: str | None = None,
+                    versions: str = Query("latest", pattern="^(latest|all)$"), format: str = Query("json")):
+        """
+        Catalogue listing in id order, keyset-paginated by `after` (the previous page's `next`).
+        format=ndjson (or Accept: application/x-ndjson) streams every row from `after` on,
+        one JSON object per line, without building the list in memory.
+        """
+        store: Store = request.app.state.store
+        all_versions = versions == "all"
+        ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+        try:
+            agents, next_key = store.list_agents(limit=500 if ndjson else limit, after=after,
+                                                 all_versions=all_versions)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not ndjson:
+            return {"agents": agents, "next": next_key}
+
+        def lines():
+            for row in agents:
+                yield json.dumps(row) + "\n"
+            if next_key is not None:
+                for row in store.iter_agents(after=next_key, all_versions=all_versions):
+                    yield json.dumps(row) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
 
     @app.get("/v1/agents/{agent_id}")
-    def get_agent(request: Request, agent_id: str):
+    def get_agent(request: Request, agent_id: str, version: str | None = None):
         store: Store = request.app.state.store
-        meta = store.get_agent(agent_id)
-        if "error" in meta:
+        entry = store.manifest_json(agent_id, version)
+        if entry is None:
             raise HTTPException(status_code=404, detail="not found")
-        return meta
+        body, etag = entry
+        # no-cache: clients may keep the manifest but revalidate (If-None-Match -> 304)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    @app.get("/v1/stats")
+    def stats(request: Request):
+        store: Store = request.app.state.store
+        return {"manifest_cache": store.manifests.stats()}
+
+    @app.get("/v1/agents/{agent_id}/package")
+    def package_info(request: Request, agent_id: str, version: str | None = None, files: bool = True):
+        """Publish-time package metadata: digest, sizes, file count, per-file hashes."""
+        store: Store = request.app.state.store
+        info = store.package_info(agent_id, version, files=files)
+        if info is None:
+            raise HTTPException(status_code=404, detail="package not found")
+        return info
+
+    def send_blob(request: Request, store: Store, digest: str, cache_control: str, filename: str | None = None):
+        # Conditional GET: a client holding these bytes gets a bodyless 304
+        # (only for a blob we still have; an unknown or deleted digest is a 404).
+        headers = {"ETag": f'"{digest}"', "X-APS-Digest": f"sha256:{digest}", "Cache-Control": cache_control}
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            if not store.ensure_blob(digest):
+                raise HTTPException(status_code=404, detail="package file not found")
+            return Response(status_code=304, headers=headers)
+        path = store.storage.local_path(digest)
+        if path is None:
+            # remote storage: the client fetches from it directly (Range works there too)
+            url = store.storage.presigned_url(digest, filename) if store.ensure_blob(digest) else None
+            if url is None:
+                raise HTTPException(status_code=404, detail="package file not found")
+            return RedirectResponse(url, status_code=307, headers=headers)
+        # FileResponse handles Range / If-Range (Accept-Ranges: bytes) and hands
+        # the file to the server's zero-copy path (http.response.pathsend) when offered
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if not store.ensure_blob(digest):
+                raise HTTPException(status_code=404, detail="package file not found")
+            st = os.stat(path)
+        return FileResponse(path, stat_result=st, media_type="application/gzip", filename=filename, headers=headers)
 
     @app.get("/v1/agents/{agent_id}/download")
     def download_agent(request: Request, agent_id: str, version: str | None = None):
         store: Store = request.app.state.store
-        ver = version or store.latest_version(agent_id)
-        if not ver:
+        ref = store.download_ref(agent_id, version)
+        if ref is None:
             raise HTTPException(status_code=404, detail="agent not found")
-        pkg = store.package_path(agent_id, ver)
-        if not os.path.exists(pkg):
-            raise HTTPException(status_code=404, detail="package file not found")
-        return FileResponse(pkg, media_type="application/gzip", filename=f"{agent_id}-{ver}.aps.tar.gz")
+        ver, sha256 = ref
+        # "latest" (and a re-published version) can change: caches must revalidate
+        return send_blob(request, store, sha256, "no-cache", filename=f"{agent_id}-{ver}.aps.tar.gz")
+
+    @app.get("/v1/blobs/sha256/{digest}")
+    def get_blob(request: Request, digest: str):
+        """Package by content digest: immutable, cacheable forever."""
+        if not _DIGEST.fullmatch(digest):
+            raise HTTPException(status_code=404, detail="not a sha256 digest")
+        store: Store = request.app.state.store
+        return send_blob(request, store, digest, "public, max-age=31536000, immutable")
 
     return app
+
+def app_from_env() -> FastAPI:
+    """uvicorn factory (multi-worker): `uvicorn --factory aps_registry.server:app_from_env`; root from $APS_REGISTRY_ROOT."""
+    return create_app(os.environ.get("APS_REGISTRY_ROOT", "registry_data"))
+
+def serve(root: str, host: str = "0.0.0.0", port: int = 8080, workers: int = 1,
+          max_upload_mb: float | None = None, storage: str | None = None, log_level: str = "info"):
+    """
+    Run the registry. workers > 1 starts that many uvicorn worker processes on one
+    listening socket; each builds its app with app_from_env, and the Store keeps
+    them consistent (WAL, BEGIN IMMEDIATE writes, data_version cache checks).
+    """
+    import socket
+    import uvicorn
+    if workers <= 1:
+        app = create_app(root, max_upload=int(max_upload_mb * 1024 * 1024) if max_upload_mb else None,
+                         storage=storage)
+        uvicorn.run(app, host=host, port=port, log_level=log_level)
+        return
+    os.environ["APS_REGISTRY_ROOT"] = root
+    if max_upload_mb:
+        os.environ["APS_REGISTRY_MAX_UPLOAD_MB"] = str(max_upload_mb)
+    if storage:
+        os.environ["APS_REGISTRY_STORAGE"] = storage
+    config = uvicorn.Config("aps_registry.server:app_from_env", factory=True, host=host, port=port,
+                            workers=workers, log_level=log_level)
+    sock = config.bind_socket()
+    # uvicorn binds with proto=0, so asyncio skips TCP_NODELAY on accepted connections
+    # and keep-alive responses stall ~40ms (Nagle + delayed ACK). Accepted sockets
+    # inherit the option from the listener.
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    from uvicorn.supervisors import Multiprocess
+    try:
+        supervisor = Multiprocess(config, sockets=[sock])
+    except TypeError:  # uvicorn < 0.30 takes the worker entry point explicitly
+        supervisor = Multiprocess(config, target=uvicorn.Server(config).run, sockets=[sock])
+    supervisor.run()
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog="aps-registry", description="Serve an APS registry")
+    ap.add_argument("--root", default=os.environ.get("APS_REGISTRY_ROOT", "registry_data"))
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--max-upload-mb", type=float, default=None)
+    ap.add_argument("--storage", default=None, help="fs, sharded or s3://BUCKET[/PREFIX]")
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args(argv)
+    serve(args.root, host=args.host, port=args.port, workers=args.workers,
+          max_upload_mb=args.max_upload_mb, storage=args.storage, log_level=args.log_level)
+
+if __name__ == "__main__":
+    main()
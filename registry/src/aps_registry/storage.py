@@ -0,0 +1,152 @@
+# registry/src/aps_registry/storage.py
+# Package blob storage backends for the APS Registry
+# ------------------------------------------------------------
+# Packages are stored by content: the key is the tarball's sha256 and a blob
+# never changes once written. The SQLite index maps id@version -> digest, so
+# several registry replicas can share one backend.
+#
+#   FilesystemStorage         <dir>/sha256/<digest>
+#   ShardedFilesystemStorage  <dir>/sha256/<d[0:2]>/<d[2:4]>/<digest>
+#   S3Storage                 s3://<bucket>/<prefix>sha256/<digest>  (boto3; MinIO etc.
+#                             via endpoint_url); downloads redirect to presigned URLs
+#
+# storage_from_spec() builds one from a string: "fs", "sharded" or
+# "s3://bucket[/prefix]" (registry serve --storage / $APS_REGISTRY_STORAGE).
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import os, shutil, threading
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional
+
+
+class BlobStorage(ABC):
+    """Content-addressed package storage. Keys are sha256 hex digests."""
+
+    @abstractmethod
+    def put(self, digest: str, src_path: str) -> None:
+        """Store the (already verified) file at src_path under digest; src_path is consumed."""
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        """True if a blob is stored under digest."""
+
+    @abstractmethod
+    def open(self, digest: str) -> BinaryIO:
+        """Readable stream of the blob; FileNotFoundError if absent."""
+
+    def local_path(self, digest: str) -> Optional[str]:
+        """Filesystem path the server can send directly (FileResponse), or None."""
+        return None
+
+    def presigned_url(self, digest: str, filename: Optional[str] = None) -> Optional[str]:
+        """Time-limited URL clients can fetch the blob from directly, or None."""
+        return None
+
+
+class FilesystemStorage(BlobStorage):
+    """Blobs as files in one directory: <dir>/sha256/<digest>."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "sha256"), exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, "sha256", digest)
+
+    def put(self, digest: str, src_path: str) -> None:
+        dst = self.path(digest)
+        if os.path.exists(dst):
+            os.unlink(src_path)  # same content already stored
+            return
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.replace(src_path, dst)
+        except OSError:  # src on another filesystem
+            tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(src_path, tmp)
+            os.replace(tmp, dst)
+            os.unlink(src_path)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path(digest), "rb")
+
+    def local_path(self, digest: str) -> Optional[str]:
+        return self.path(digest)
+
+
+class ShardedFilesystemStorage(FilesystemStorage):
+    """Two levels of 256-way fan-out, so no directory holds more than a few thousand blobs."""
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, "sha256", digest[:2], digest[2:4], digest)
+
+
+class S3Storage(BlobStorage):
+    """
+    Blobs as S3 objects (<prefix>sha256/<digest>). Works with any S3-compatible
+    endpoint (MinIO, moto, ...). Downloads are served as redirects to presigned
+    GET URLs, so package bytes never pass through the registry process.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 presign_ttl: int = 300, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("S3 storage needs boto3: pip install 'aps-registry[s3]'")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.presign_ttl = presign_ttl
+
+    def key(self, digest: str) -> str:
+        return f"{self.prefix}sha256/{digest}"
+
+    def put(self, digest: str, src_path: str) -> None:
+        if not self.exists(digest):
+            self.client.upload_file(src_path, self.bucket, self.key(digest),
+                                    ExtraArgs={"ContentType": "application/gzip",
+                                               "Metadata": {"sha256": digest}})
+        os.unlink(src_path)
+
+    def exists(self, digest: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(digest))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def open(self, digest: str) -> BinaryIO:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(digest))["Body"]
+        except ClientError as e:
+            raise FileNotFoundError(f"blob {digest} not in s3://{self.bucket}/{self.key(digest)}") from e
+
+    def presigned_url(self, digest: str, filename: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self.key(digest)}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.presign_ttl)
+
+
+def storage_from_spec(spec: Optional[str], root: str) -> BlobStorage:
+    """"fs" (default), "sharded" (both under <root>/blobs) or "s3://bucket[/prefix]"."""
+    spec = (spec or "fs").strip()
+    if spec == "fs":
+        return FilesystemStorage(os.path.join(root, "blobs"))
+    if spec == "sharded":
+        return ShardedFilesystemStorage(os.path.join(root, "blobs"))
+    if spec.startswith("s3://"):
+        bucket, _, prefix = spec[len("s3://"):].partition("/")
+        return S3Storage(bucket, prefix, endpoint_url=os.environ.get("APS_REGISTRY_S3_ENDPOINT") or None)
+    raise ValueError(f"unknown storage backend: {spec!r} (fs, sharded or s3://bucket[/prefix])")
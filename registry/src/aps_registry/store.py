@@ -1,19 +1,120 @@
 # registry/src/aps_registry/store.py
 from __future__ import annotations
-import os, json, sqlite3, tarfile
-from typing import Dict, List
+import os, re, json, shutil, sqlite3, tarfile, hashlib, tempfile, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .storage import BlobStorage, FilesystemStorage
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+CHUNK = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Upload exceeded the configured size limit (HTTP 413)."""
+
+
+_SEMVER = re.compile(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+
+def _num(digits: str) -> str:
+    # length prefix: numeric order survives plain string comparison, any size
+    digits = digits.lstrip("0") or "0"
+    return f"{len(digits):02d}{digits}"
+
+def version_sort_key(version: str) -> str:
+    """
+    String whose ORDER BY matches semver precedence:
+      0.0.9 < 0.0.10,  1.0.0-alpha < 1.0.0-alpha.1 < 1.0.0-beta.2 < 1.0.0-beta.11 < 1.0.0
+    Missing minor/patch count as 0, a leading "v" and +build metadata are ignored.
+    Versions that are not semver-like sort below all others (lexically among themselves).
+    """
+    m = _SEMVER.match(version.strip())
+    if not m:
+        return "0" + version
+    major, minor, patch, pre = m.groups()
+    key = "1" + "".join(_num(x or "0") for x in (major, minor, patch))
+    if not pre:
+        return key + "~"  # a release ranks above its prereleases ("~" > "!")
+    # numeric identifiers < alphanumeric ones; " " sorts below every identifier
+    # character, so a shorter identifier list ranks lower when it is a prefix
+    return key + "!" + " ".join("0" + _num(x) if x.isdigit() else "1" + x for x in pre.split("."))
+
+class ManifestCache:
+    """
+    Thread-safe LRU of serialized manifest responses: (id, version|None) -> (body, etag).
+    version None is "latest". Store.index_package invalidates an id's entries; commits
+    from other processes clear it (see Store._sync_caches).
+    `epoch` changes on every invalidation: a put() carrying an older epoch was read
+    from the database before that invalidation and is dropped.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._data: "OrderedDict[Tuple[str, Optional[str]], Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.epoch = 0
+
+    def get(self, key) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry: Tuple[bytes, str], epoch: Optional[int] = None):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def invalidate(self, agent_id: str):
+        with self._lock:
+            self.epoch += 1
+            for key in [k for k in self._data if k[0] == agent_id]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"size": len(self._data), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
 
 class Store:
     """
-    Simple filesystem + SQLite-backed store.
+    SQLite index + pluggable package storage (see storage.py).
     Layout:
       <root>/
         index.db
-        packages/<id>/<ver>/agent.aps.tar.gz
+        blobs/sha256/...  package tarballs by digest (default filesystem storage)
+        uploads/          in-flight publishes (one unique temp file each)
+        packages/<id>/<ver>/agent.aps.tar.gz   legacy layout; read, and moved
+                                               into storage on first download
     """
-    def __init__(self, root: str):
+    def __init__(self, root: str, max_upload: Optional[int] = None, manifest_cache_size: int = 1024,
+                 storage: Optional[BlobStorage] = None):
         self.root = root
-        os.makedirs(self.packages_dir, exist_ok=True)
+        self.max_upload = max_upload  # bytes; None = unlimited
+        self.manifests = ManifestCache(manifest_cache_size)
+        self.storage = storage or FilesystemStorage(os.path.join(root, "blobs"))
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._watch: Optional[sqlite3.Connection] = None  # see _sync_caches
+        self._watch_lock = threading.Lock()
         self._init_db()
 
     @property
@@ -24,13 +125,87 @@ class Store:
     def packages_dir(self) -> str:
         return os.path.join(self.root, "packages")
 
-    # ------------ DB helpers (fresh connection per call)
+    @property
+    def uploads_dir(self) -> str:
+        return os.path.join(self.root, "uploads")
 
-    def _conn(self):
-        return sqlite3.connect(self.db_path, check_same_thread=False)
+    # ------------ DB helpers (one long-lived connection per thread)
+
+    # WAL lets readers run concurrently with the (single) writer; NORMAL sync is
+    # durable across app crashes in WAL mode and avoids an fsync per commit
+    PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-16384",     # 16 MiB page cache per connection
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",   # 256 MiB
+    )
+
+    def _conn(self) -> sqlite3.Connection:
+        """
+        This thread's connection, opened on first use. Server handlers run on a
+        bounded thread pool, so the number of connections stays bounded; each
+        keeps its compiled statements (cached_statements) and page cache warm.
+        Use as `with self._conn() as conn:` for a transaction (it is not closed).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Write transaction that takes the database write lock up front (BEGIN IMMEDIATE),
+        so read-then-write sequences are serialized across threads and worker processes.
+        Waits up to busy_timeout for another writer.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def _sync_caches(self):
+        """
+        Drop cached manifests if anything committed since the last check, from any
+        thread or worker process. PRAGMA data_version on a dedicated connection only
+        moves on commits by other connections, and reading it costs no I/O.
+        """
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._data_version = None
+            version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+            changed, self._data_version = version != self._data_version, version
+        if changed:
+            self.manifests.clear()
+
+    def close(self):
+        """Close every connection opened by this store (all threads)."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        with self._watch_lock:
+            if self._watch is not None:
+                conns.append(self._watch)
+            self._watch = None
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
 
     def _init_db(self):
-        with self._conn() as conn:
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")  # persistent: recorded in the db file
+        # several workers may start at once: one migrates, the rest then see the result
+        with self._write() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS agents (
                     id TEXT NOT NULL,
@@ -41,91 +216,465 @@ class Store:
                     PRIMARY KEY (id, version)
                 )
             """)
+            self._migrate(conn)
+            self._init_search(conn)
+
+    # columns added after the initial schema: name -> SQL type
+    _COLUMNS = {"sha256": "TEXT", "size": "INTEGER", "sort_key": "TEXT",
+                "unpacked_size": "INTEGER", "file_count": "INTEGER"}
+
+    def _migrate(self, conn):
+        have = {row[1] for row in conn.execute("PRAGMA table_info(agents)")}
+        for col, typ in self._COLUMNS.items():
+            if col not in have:
+                conn.execute(f"ALTER TABLE agents ADD COLUMN {col} {typ}")
+        # rows published before sort_key existed
+        rows = conn.execute("SELECT id, version FROM agents WHERE sort_key IS NULL").fetchall()
+        conn.executemany(
+            "UPDATE agents SET sort_key = ? WHERE id = ? AND version = ?",
+            [(version_sort_key(str(v)), i, v) for i, v in rows],
+        )
+        # latest version of an id = one backward step on this index
+        conn.execute("CREATE INDEX IF NOT EXISTS agents_id_sort_key ON agents (id, sort_key)")
+        # /v1/blobs lookups for packages published before blobs/ existed
+        conn.execute("CREATE INDEX IF NOT EXISTS agents_sha256 ON agents (sha256)")
+        # per-file listing of each package, recorded at publish time
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS package_files (
+                id TEXT NOT NULL,
+                version TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mode INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (id, version, path)
+            ) WITHOUT ROWID
+        """)
+
+    @staticmethod
+    def _file_sha256(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
 
     # ------------ Publish path
 
-    def save_upload(self, filename: str, data: bytes) -> str:
-        tmp = os.path.join(self.root, "_upload.tmp.tar.gz")
-        with open(tmp, "wb") as f:
-            f.write(data)
-        return tmp
+    def save_upload(self, filename: str, src: BinaryIO) -> Tuple[str, str]:
+        """
+        Stream an upload to a unique temp file in CHUNK-sized reads, hashing as it goes.
+        Returns (tmp_path, sha256). Raises UploadTooLarge past max_upload (temp file removed).
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.uploads_dir, suffix=".aps.tar.gz")
+        h, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: src.read(CHUNK), b""):
+                    size += len(chunk)
+                    if self.max_upload is not None and size > self.max_upload:
+                        raise UploadTooLarge(f"upload exceeds {self.max_upload} bytes")
+                    h.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp, h.hexdigest()
 
-    def index_package(self, tmp_pkg_path: str) -> Dict:
-        # Read manifest from tar to know id/version
+    @staticmethod
+    def _scan_package(src: BinaryIO) -> Tuple[Optional[bytes], List[Tuple[str, int, int, str]]]:
+        """
+        One sequential pass over the tarball stream: (aps/agent.yaml bytes or None,
+        [(path, size, mode, sha256)] for every regular file).
+        """
+        manifest, files = None, []
+        with tarfile.open(fileobj=src, mode="r|gz") as tf:
+            for member in tf:
+                if not member.isfile():
+                    continue
+                h = hashlib.sha256()
+                f = tf.extractfile(member)
+                data = b""
+                for chunk in iter(lambda: f.read(CHUNK), b""):
+                    h.update(chunk)
+                    if member.name == "aps/agent.yaml":
+                        data += chunk
+                if member.name == "aps/agent.yaml":
+                    manifest = data
+                files.append((member.name, member.size, member.mode, h.hexdigest()))
+        return manifest, files
+
+    def index_package(self, tmp_pkg_path: str, sha256: Optional[str] = None) -> Dict:
+        # Read manifest (id/version) and the file listing in one pass over the tarball
         import yaml
-        with tarfile.open(tmp_pkg_path, "r:gz") as tf:
-            try:
-                member = tf.getmember("aps/agent.yaml")
-            except KeyError:
-                raise FileNotFoundError("package missing aps/agent.yaml")
-            manifest_yaml = tf.extractfile(member).read().decode("utf-8")
-        manifest = yaml.safe_load(manifest_yaml)
+        with open(tmp_pkg_path, "rb") as f:
+            manifest_yaml, files = self._scan_package(f)
+        if manifest_yaml is None:
+            raise FileNotFoundError("package missing aps/agent.yaml")
+        manifest = yaml.safe_load(manifest_yaml.decode("utf-8"))
 
         agent_id = manifest["id"]
         version  = manifest["version"]
         name     = manifest.get("name","")
         summary  = manifest.get("summary","")
 
-        dest_dir = os.path.join(self.packages_dir, agent_id, version)
-        os.makedirs(dest_dir, exist_ok=True)
-        dest_pkg = os.path.join(dest_dir, "agent.aps.tar.gz")
+        # Storage key, ETag and X-APS-Digest; save_upload computes it while streaming
+        sha256 = sha256 or self._file_sha256(tmp_pkg_path)
+        size = os.path.getsize(tmp_pkg_path)
 
-        # Move uploaded file into packages/...
-        if os.path.exists(dest_pkg):
-            # Overwrite on re-publish of same version (or choose to reject)
-            os.remove(dest_pkg)
-        os.replace(tmp_pkg_path, dest_pkg)
+        # Blob first, then the index row: a re-published version switches digest atomically
+        self.storage.put(sha256, tmp_pkg_path)
 
-        # Upsert manifest row
-        with self._conn() as conn:
+        # Upsert manifest row (+ file listing and the id's search document) in one
+        # transaction; concurrent publishers (threads or worker processes) serialize here
+        with self._write() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO agents (id, version, name, summary, manifest) VALUES (?,?,?,?,?)",
-                (agent_id, version, name, summary, json.dumps(manifest)),
+                "INSERT OR REPLACE INTO agents (id, version, name, summary, manifest, sha256, size, sort_key, "
+                "unpacked_size, file_count) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (agent_id, version, name, summary, json.dumps(manifest), sha256, size,
+                 version_sort_key(str(version)), sum(f[1] for f in files), len(files)),
             )
+            self._put_files(conn, agent_id, version, files)
+            self._reindex_search(conn, agent_id)
+        self.manifests.invalidate(agent_id)
 
         return {"id": agent_id, "version": version, "name": name, "summary": summary}
 
+    # ------------ Search index
+    #
+    # search_ids holds one row per agent id: its latest version. Its rowid keys
+    # the id's FTS5 document (agents_fts), built from the latest manifest, so a
+    # query touches one document per id however many versions exist.
+
+    # bm25 column weights: id, name, summary, labels, capabilities
+    BM25_WEIGHTS = (10.0, 5.0, 2.0, 3.0, 1.0)
+
+    def _init_search(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_ids (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                version TEXT NOT NULL
+            )
+        """)
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS agents_fts USING fts5("
+                "agent_id, name, summary, labels, capabilities, tokenize='unicode61')"
+            )
+            self.has_fts = True
+        except sqlite3.OperationalError:  # SQLite built without FTS5: LIKE fallback
+            self.has_fts = False
+        indexed = conn.execute("SELECT COUNT(*) FROM search_ids").fetchone()[0]
+        total = conn.execute("SELECT COUNT(DISTINCT id) FROM agents").fetchone()[0]
+        if indexed != total:
+            for (agent_id,) in conn.execute("SELECT DISTINCT id FROM agents").fetchall():
+                self._reindex_search(conn, agent_id)
+
+    @staticmethod
+    def _search_text(manifest: Dict) -> Tuple[str, str]:
+        """(labels, capabilities) text for the FTS document."""
+        meta = manifest.get("metadata") or {}
+        labels = []
+        for src in (meta.get("tags"), meta.get("labels"), manifest.get("labels")):
+            if isinstance(src, dict):
+                labels += [f"{k} {v}" for k, v in src.items()]
+            elif isinstance(src, list):
+                labels += [str(x) for x in src]
+        words = []
+
+        def walk(node):
+            # descriptions, tool names and input/output property names
+            if isinstance(node, dict):
+                for k, v in node.items():
+                    if k in ("description", "name", "title") and isinstance(v, str):
+                        words.append(v)
+                    elif k == "properties" and isinstance(v, dict):
+                        words.extend(v.keys())
+                    walk(v)
+            elif isinstance(node, list):
+                for v in node:
+                    walk(v)
+
+        walk([manifest.get("capabilities"), manifest.get("inputs"), manifest.get("outputs")])
+        return " ".join(labels), " ".join(words)
+
+    def _reindex_search(self, conn, agent_id: str):
+        row = conn.execute(
+            "SELECT version, name, summary, manifest FROM agents WHERE id = ? ORDER BY sort_key DESC LIMIT 1",
+            (agent_id,),
+        ).fetchone()
+        if not row:
+            return
+        version, name, summary, manifest = row
+        conn.execute(
+            "INSERT INTO search_ids (id, version) VALUES (?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET version = excluded.version",
+            (agent_id, version),
+        )
+        if not self.has_fts:
+            return
+        rowid = conn.execute("SELECT rowid FROM search_ids WHERE id = ?", (agent_id,)).fetchone()[0]
+        labels, caps = self._search_text(json.loads(manifest))
+        conn.execute("DELETE FROM agents_fts WHERE rowid = ?", (rowid,))
+        conn.execute(
+            "INSERT INTO agents_fts (rowid, agent_id, name, summary, labels, capabilities) VALUES (?,?,?,?,?,?)",
+            (rowid, agent_id, name or "", summary or "", labels, caps),
+        )
+
+    @staticmethod
+    def _fts_query(q: str) -> Optional[str]:
+        # every word must match, as a prefix; quoting keeps FTS5 syntax out of user input
+        terms = re.findall(r"\w+", q)
+        return " AND ".join(f'"{t}"*' for t in terms) if terms else None
+
     # ------------ Query path
 
-    def search(self, q: str) -> List[Dict]:
-        sql = """
-            SELECT id, version, name, summary
-            FROM agents
-            {where}
-            ORDER BY id ASC, version DESC
+    def search(self, q: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
         """
-        params = ()
-        if q:
+        Latest version of each matching agent, best match first (BM25; by id when q is empty).
+        Returns (agents, next_cursor); pass next_cursor back for the following page.
+        """
+        if not q:
+            return self.list_agents(limit=limit, after=cursor)
+        try:
+            offset = int(cursor) if cursor else 0
+        except ValueError:
+            raise ValueError(f"invalid cursor: {cursor!r}")
+        cols = "s.id, s.version, a.name, a.summary"
+        join = "JOIN agents a ON a.id = s.id AND a.version = s.version"
+        match = self._fts_query(q)
+        if self.has_fts and match:
+            sql = f"""
+                SELECT {cols} FROM agents_fts f
+                JOIN search_ids s ON s.rowid = f.rowid {join}
+                WHERE agents_fts MATCH ?
+                ORDER BY bm25(agents_fts, {", ".join(map(str, self.BM25_WEIGHTS))}), s.id
+                LIMIT ? OFFSET ?
+            """
+            params = (match, limit + 1, offset)
+        else:
             like = f"%{q}%"
-            where = "WHERE id LIKE ? OR name LIKE ? OR summary LIKE ?"
-            params = (like, like, like)
+            sql = f"""
+                SELECT {cols} FROM search_ids s {join}
+                WHERE s.id LIKE ? OR a.name LIKE ? OR a.summary LIKE ?
+                ORDER BY s.id LIMIT ? OFFSET ?
+            """
+            params = (like, like, like, limit + 1, offset)
+        with self._conn() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        next_cursor = str(offset + limit) if len(rows) > limit else None
+        return [self._summary_row(r) for r in rows[:limit]], next_cursor
+
+    @staticmethod
+    def _summary_row(r) -> Dict:
+        return {"id": r[0], "version": r[1], "name": r[2] or "", "summary": r[3] or ""}
+
+    def list_agents(self, limit: int = 50, after: Optional[str] = None,
+                    all_versions: bool = False) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Catalogue page in key order, resumed after the key `after` (keyset pagination: each
+        page is an index range scan, however deep). Keys are ids, or "id@version" with
+        all_versions (every published version, with digest and size, for mirrors).
+        Returns (agents, next_key); next_key is None on the last page.
+        """
+        if all_versions:
+            sql = """
+                SELECT id, version, name, summary, sha256, size FROM agents
+                WHERE (id, version) > (?, ?) ORDER BY id, version LIMIT ?
+            """
+            agent_id, sep, version = (after or "").rpartition("@")
+            if after and not sep:
+                raise ValueError(f"invalid cursor: {after!r}")
+            params = (agent_id, version, limit + 1)
         else:
-            where = ""
-        sql = sql.format(where=where)
+            sql = """
+                SELECT s.id, s.version, a.name, a.summary FROM search_ids s
+                JOIN agents a ON a.id = s.id AND a.version = s.version
+                WHERE s.id > ? ORDER BY s.id LIMIT ?
+            """
+            params = (after or "", limit + 1)
         with self._conn() as conn:
-            cur = conn.execute(sql, params)
-            rows = cur.fetchall()
-        return [{"id": r[0], "version": r[1], "name": r[2] or "", "summary": r[3] or ""} for r in rows]
+            rows = conn.execute(sql, params).fetchall()
+        out = []
+        for r in rows[:limit]:
+            row = self._summary_row(r)
+            if all_versions:
+                row.update(sha256=r[4], size=r[5])
+            out.append(row)
+        next_key = None
+        if len(rows) > limit:
+            last = out[-1]
+            next_key = f"{last['id']}@{last['version']}" if all_versions else last["id"]
+        return out, next_key
+
+    def iter_agents(self, after: Optional[str] = None, all_versions: bool = False,
+                    page_size: int = 500) -> Iterator[Dict]:
+        """Whole catalogue (from `after`), fetched a page at a time."""
+        while True:
+            rows, after = self.list_agents(limit=page_size, after=after, all_versions=all_versions)
+            yield from rows
+            if after is None:
+                return
 
-    def get_agent(self, agent_id: str) -> Dict:
+    def manifest_json(self, agent_id: str, version: Optional[str] = None) -> Optional[Tuple[bytes, str]]:
+        """
+        (JSON body, strong ETag) of the manifest for id@version (latest when version is None),
+        or None. Served from the in-process LRU; the body is the stored JSON, never re-parsed.
+        """
+        key = (agent_id, version)
+        self._sync_caches()
+        epoch = self.manifests.epoch
+        entry = self.manifests.get(key)
+        if entry is not None:
+            return entry
         with self._conn() as conn:
-            cur = conn.execute(
-                "SELECT manifest FROM agents WHERE id = ? ORDER BY version DESC LIMIT 1",
-                (agent_id,),
-            )
-            row = cur.fetchone()
+            if version is None:
+                row = conn.execute(
+                    "SELECT manifest FROM agents WHERE id = ? ORDER BY sort_key DESC LIMIT 1", (agent_id,),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT manifest FROM agents WHERE id = ? AND version = ?", (agent_id, version),
+                ).fetchone()
         if not row:
+            return None
+        body = row[0].encode("utf-8")
+        entry = (body, f'"{hashlib.sha256(body).hexdigest()}"')
+        self.manifests.put(key, entry, epoch)
+        return entry
+
+    def get_agent(self, agent_id: str, version: Optional[str] = None) -> Dict:
+        entry = self.manifest_json(agent_id, version)
+        if entry is None:
             return {"error":"not_found","id":agent_id}
-        return json.loads(row[0])
+        return json.loads(entry[0])
 
     def latest_version(self, agent_id: str) -> str | None:
         with self._conn() as conn:
             cur = conn.execute(
-                "SELECT version FROM agents WHERE id = ? ORDER BY version DESC LIMIT 1",
+                "SELECT version FROM agents WHERE id = ? ORDER BY sort_key DESC LIMIT 1",
                 (agent_id,)
             )
             row = cur.fetchone()
         return row[0] if row else None
 
-    def package_path(self, agent_id: str, version: str) -> str:
+    def legacy_package_path(self, agent_id: str, version: str) -> str:
+        """Where registries before content-addressed storage kept id@version."""
         return os.path.join(self.packages_dir, agent_id, version, "agent.aps.tar.gz")
+
+    # ------------ Content-addressed blobs
+    #
+    # Packages live in self.storage under their sha256, and a digest always
+    # names the same bytes, so blob responses can be cached forever.
+
+    def download_ref(self, agent_id: str, version: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """(version, sha256) of id@version (latest when None) in one indexed lookup, or None."""
+        with self._conn() as conn:
+            if version is None:
+                row = conn.execute(
+                    "SELECT version, sha256 FROM agents WHERE id = ? ORDER BY sort_key DESC LIMIT 1", (agent_id,),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT version, sha256 FROM agents WHERE id = ? AND version = ?", (agent_id, version),
+                ).fetchone()
+        if not row:
+            return None
+        version, sha256 = row
+        sha256 = sha256 or self.package_sha256(agent_id, version)
+        return (version, sha256) if sha256 else None
+
+    def ensure_blob(self, digest: str) -> bool:
+        """
+        True if storage holds blob `digest`, importing it from the legacy packages/
+        tree for rows published before content-addressed storage.
+        """
+        if self.storage.exists(digest):
+            return True
+        with self._conn() as conn:
+            rows = conn.execute("SELECT id, version FROM agents WHERE sha256 = ?", (digest,)).fetchall()
+        for agent_id, version in rows:
+            pkg = self.legacy_package_path(agent_id, version)
+            if os.path.exists(pkg) and self._file_sha256(pkg) == digest:
+                fd, tmp = tempfile.mkstemp(dir=self.uploads_dir, suffix=".aps.tar.gz")
+                os.close(fd)
+                shutil.copyfile(pkg, tmp)
+                self.storage.put(digest, tmp)
+                return True
+        return False
+
+    def open_blob(self, digest: str) -> BinaryIO:
+        if not self.ensure_blob(digest):
+            raise FileNotFoundError(f"blob {digest} not stored")
+        return self.storage.open(digest)
+
+    @staticmethod
+    def _put_files(conn, agent_id: str, version: str, files):
+        conn.execute("DELETE FROM package_files WHERE id = ? AND version = ?", (agent_id, version))
+        conn.executemany(
+            "INSERT INTO package_files (id, version, path, size, mode, sha256) VALUES (?,?,?,?,?,?)",
+            [(agent_id, version, *f) for f in files],
+        )
+
+    def package_info(self, agent_id: str, version: Optional[str] = None, files: bool = True) -> Optional[Dict]:
+        """
+        Publish-time metadata of id@version (latest when None): digest, compressed and
+        unpacked sizes, file count and (files=True) the per-file listing. Rows published
+        before these were recorded are scanned once and filled in.
+        """
+        version = version or self.latest_version(agent_id)
+        if not version:
+            return None
+        sha256 = self.package_sha256(agent_id, version)  # backfills sha256/size
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT size, unpacked_size, file_count FROM agents WHERE id = ? AND version = ?",
+                (agent_id, version),
+            ).fetchone()
+        if not row or not sha256:
+            return None
+        size, unpacked_size, file_count = row
+        if file_count is None:
+            with self.open_blob(sha256) as f:
+                _, listing = self._scan_package(f)
+            unpacked_size, file_count = sum(f[1] for f in listing), len(listing)
+            with self._conn() as conn:
+                conn.execute(
+                    "UPDATE agents SET unpacked_size = ?, file_count = ? WHERE id = ? AND version = ?",
+                    (unpacked_size, file_count, agent_id, version),
+                )
+                self._put_files(conn, agent_id, version, listing)
+        info = {"id": agent_id, "version": version, "sha256": sha256, "size": size,
+                "unpacked_size": unpacked_size, "file_count": file_count}
+        if files:
+            with self._conn() as conn:
+                info["files"] = [
+                    {"path": r[0], "size": r[1], "mode": r[2], "sha256": r[3]}
+                    for r in conn.execute(
+                        "SELECT path, size, mode, sha256 FROM package_files WHERE id = ? AND version = ? ORDER BY path",
+                        (agent_id, version),
+                    )
+                ]
+        return info
+
+    def package_sha256(self, agent_id: str, version: str) -> Optional[str]:
+        """sha256 of the stored tarball; computed and recorded for rows published before it was tracked."""
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM agents WHERE id = ? AND version = ?", (agent_id, version)
+            ).fetchone()
+        if not row:
+            return None
+        if row[0]:
+            return row[0]
+        pkg = self.legacy_package_path(agent_id, version)
+        if not os.path.exists(pkg):
+            return None
+        sha256 = self._file_sha256(pkg)
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE agents SET sha256 = ?, size = ? WHERE id = ? AND version = ?",
+                (sha256, os.path.getsize(pkg), agent_id, version),
+            )
+        return sha256
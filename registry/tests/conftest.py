@@ -0,0 +1,44 @@
+# registry/tests/conftest.py
+import io
+import tarfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aps_registry.server import create_app
+
+
+def make_package(agent_id="dev.echo", version="0.1.0", summary="Echo test agent", extra: bytes = b"",
+                 name="Echo", manifest_extra: str = "") -> bytes:
+    """Minimal flat APS tarball: aps/agent.yaml + src/main.py (+ optional padding file / manifest YAML)."""
+    files = {
+        "aps/agent.yaml": (
+            f"aps_version: 0.1\nid: {agent_id}\nname: {name}\nversion: {version}\nsummary: {summary}\n"
+            "runtimes:\n  - kind: python\n    entrypoint: python src/main.py\n" + manifest_extra
+        ).encode("utf-8"),
+        "src/main.py": b"print('hi')\n",
+    }
+    if extra:
+        files["data/blob.bin"] = extra
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for path, data in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path):
+    return TestClient(create_app(str(tmp_path / "registry")))
+
+
+@pytest.fixture
+def publish(client):
+    def _publish(**kw) -> bytes:
+        data = make_package(**kw)
+        r = client.post("/v1/publish", files={"file": ("agent.aps.tar.gz", data)})
+        assert r.status_code == 200, r.text
+        return data
+    return _publish
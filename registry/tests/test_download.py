@@ -0,0 +1,87 @@
+# registry/tests/test_download.py
+import hashlib
+import os
+import sqlite3
+
+from aps_registry.store import Store
+
+
+def test_download_sends_checksum_and_serves_ranges(client, publish):
+    data = publish(extra=os.urandom(4096))
+    sha = hashlib.sha256(data).hexdigest()
+
+    full = client.get("/v1/agents/dev.echo/download", params={"version": "0.1.0"})
+    assert full.status_code == 200
+    assert full.content == data
+    assert full.headers["x-aps-digest"] == f"sha256:{sha}"
+    assert full.headers["etag"] == f'"{sha}"'
+    assert full.headers["accept-ranges"] == "bytes"
+
+    part = client.get("/v1/agents/dev.echo/download", params={"version": "0.1.0"},
+                      headers={"Range": "bytes=100-", "If-Range": f'"{sha}"'})
+    assert part.status_code == 206
+    assert part.content == data[100:]
+    assert part.headers["content-range"] == f"bytes 100-{len(data) - 1}/{len(data)}"
+
+    # stale validator: full body instead of a range
+    stale = client.get("/v1/agents/dev.echo/download", params={"version": "0.1.0"},
+                       headers={"Range": "bytes=100-", "If-Range": '"other"'})
+    assert stale.status_code == 200
+    assert stale.content == data
+
+
+def test_migrate_adds_columns_and_backfills_checksum(tmp_path):
+    root = tmp_path / "old"
+    (root / "packages" / "dev.echo" / "0.1.0").mkdir(parents=True)
+    (root / "packages" / "dev.echo" / "0.1.0" / "agent.aps.tar.gz").write_bytes(b"legacy")
+    with sqlite3.connect(root / "index.db") as conn:
+        conn.execute("CREATE TABLE agents (id TEXT NOT NULL, version TEXT NOT NULL, name TEXT, "
+                     "summary TEXT, manifest TEXT NOT NULL, PRIMARY KEY (id, version))")
+        conn.execute("INSERT INTO agents VALUES ('dev.echo','0.1.0','Echo','','{}')")
+
+    store = Store(str(root))
+    assert store.package_sha256("dev.echo", "0.1.0") == hashlib.sha256(b"legacy").hexdigest()
+    with sqlite3.connect(root / "index.db") as conn:
+        assert conn.execute("SELECT sha256, size FROM agents").fetchone() == (
+            hashlib.sha256(b"legacy").hexdigest(), 6)
+
+
+def test_blob_by_digest_is_immutable_and_conditional(client, publish):
+    old = publish(version="0.1.0", extra=os.urandom(2048))
+    old_sha = hashlib.sha256(old).hexdigest()
+
+    r = client.get(f"/v1/blobs/sha256/{old_sha}")
+    assert r.status_code == 200 and r.content == old
+    assert r.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert r.headers["etag"] == f'"{old_sha}"'
+
+    r304 = client.get(f"/v1/blobs/sha256/{old_sha}", headers={"If-None-Match": f'"{old_sha}"'})
+    assert r304.status_code == 304 and r304.content == b""
+    dl304 = client.get("/v1/agents/dev.echo/download", headers={"If-None-Match": f'"{old_sha}"'})
+    assert dl304.status_code == 304 and dl304.headers["cache-control"] == "no-cache"
+
+    part = client.get(f"/v1/blobs/sha256/{old_sha}", headers={"Range": "bytes=0-9"})
+    assert part.status_code == 206 and part.content == old[:10]
+
+    # re-publishing the version leaves the old digest's bytes intact
+    new = publish(version="0.1.0", extra=os.urandom(2048))
+    assert client.get(f"/v1/blobs/sha256/{old_sha}").content == old
+    assert client.get("/v1/agents/dev.echo/download", headers={"If-None-Match": f'"{old_sha}"'}).content == new
+
+    assert client.get(f"/v1/blobs/sha256/{'0' * 64}").status_code == 404
+    unknown = "0" * 64
+    assert client.get(f"/v1/blobs/sha256/{unknown}", headers={"If-None-Match": f'"{unknown}"'}).status_code == 404
+    assert client.get("/v1/blobs/sha256/not-a-digest").status_code == 404
+
+
+def test_legacy_packages_move_into_storage_on_demand(client, publish):
+    data = publish()
+    sha = hashlib.sha256(data).hexdigest()
+    store = client.app.state.store
+    # published before content-addressed storage: only packages/<id>/<ver> exists
+    legacy = store.legacy_package_path("dev.echo", "0.1.0")
+    os.makedirs(os.path.dirname(legacy))
+    os.replace(store.storage.path(sha), legacy)
+
+    assert client.get(f"/v1/blobs/sha256/{sha}").content == data
+    assert os.path.exists(store.storage.path(sha)) and os.path.exists(legacy)
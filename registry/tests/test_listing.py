@@ -0,0 +1,53 @@
+# registry/tests/test_listing.py
+import json
+
+
+def _page_through(client, **params):
+    seen, after = [], None
+    while True:
+        body = client.get("/v1/agents", params={**params, **({"after": after} if after else {})}).json()
+        seen += body["agents"]
+        after = body["next"]
+        if after is None:
+            return seen
+
+
+def test_keyset_pages_cover_catalogue_once(client, publish):
+    for i in range(5):
+        publish(agent_id=f"dev.agent{i}", version="0.1.0")
+        publish(agent_id=f"dev.agent{i}", version="0.2.0")
+
+    latest = _page_through(client, limit=2)
+    assert [(a["id"], a["version"]) for a in latest] == [(f"dev.agent{i}", "0.2.0") for i in range(5)]
+    first = client.get("/v1/agents", params={"limit": 2}).json()
+    assert first["next"] == "dev.agent1"
+
+    every = _page_through(client, limit=3, versions="all")
+    assert [(a["id"], a["version"]) for a in every] == [
+        (f"dev.agent{i}", v) for i in range(5) for v in ("0.1.0", "0.2.0")]
+    assert all(len(a["sha256"]) == 64 and a["size"] > 0 for a in every)
+
+    assert client.get("/v1/agents", params={"versions": "all", "after": "dev.agent1"}).status_code == 400
+    assert client.get("/v1/agents", params={"versions": "some"}).status_code == 422
+
+
+def test_ndjson_streams_everything_after_cursor(client, publish):
+    for i in range(3):
+        publish(agent_id=f"dev.agent{i}")
+
+    r = client.get("/v1/agents", params={"format": "ndjson", "after": "dev.agent0"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in r.text.splitlines()] == ["dev.agent1", "dev.agent2"]
+
+    r = client.get("/v1/agents", headers={"Accept": "application/x-ndjson"})
+    assert len(r.text.splitlines()) == 3
+
+
+def test_iter_agents_spans_pages(client, publish):
+    for i in range(5):
+        publish(agent_id=f"dev.agent{i}")
+    store = client.app.state.store
+    assert [a["id"] for a in store.iter_agents(page_size=2)] == [f"dev.agent{i}" for i in range(5)]
+    assert [a["id"] for a in store.search("", limit=2)[0]] == ["dev.agent0", "dev.agent1"]
+    assert store.search("", limit=2, cursor="dev.agent1")[0][0]["id"] == "dev.agent2"
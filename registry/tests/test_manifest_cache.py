@@ -0,0 +1,66 @@
+# registry/tests/test_manifest_cache.py
+import io
+
+from aps_registry.store import Store
+
+from conftest import make_package
+
+
+def _stats(client):
+    return client.get("/v1/stats").json()["manifest_cache"]
+
+
+def test_etag_and_conditional_get(client, publish):
+    publish(version="0.1.0")
+    r = client.get("/v1/agents/dev.echo")
+    assert r.status_code == 200 and r.json()["version"] == "0.1.0"
+    etag = r.headers["etag"]
+    assert etag.startswith('"') and r.headers["cache-control"] == "no-cache"
+
+    for inm in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        r304 = client.get("/v1/agents/dev.echo", headers={"If-None-Match": inm})
+        assert r304.status_code == 304 and r304.headers["etag"] == etag and r304.content == b""
+    assert client.get("/v1/agents/dev.echo", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    # publishing a new version changes "latest" and its ETag
+    publish(version="0.2.0")
+    r = client.get("/v1/agents/dev.echo", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["version"] == "0.2.0" and r.headers["etag"] != etag
+
+
+def test_cache_hits_and_invalidation(client, publish):
+    publish(version="0.1.0")
+    base = _stats(client)
+    for _ in range(3):
+        client.get("/v1/agents/dev.echo")
+    client.get("/v1/agents/dev.echo", params={"version": "0.1.0"})
+    s = _stats(client)
+    assert (s["misses"] - base["misses"], s["hits"] - base["hits"], s["size"]) == (2, 2, 2)
+
+    publish(version="0.2.0")
+    assert _stats(client)["size"] == 0
+    assert client.get("/v1/agents/dev.echo").json()["version"] == "0.2.0"
+    assert client.get("/v1/agents/dev.echo", params={"version": "0.1.0"}).json()["version"] == "0.1.0"
+    assert client.get("/v1/agents/dev.echo", params={"version": "9.9.9"}).status_code == 404
+    assert client.get("/v1/agents/dev.nope").status_code == 404
+
+
+def test_lru_evicts_oldest(client, publish):
+    store = client.app.state.store
+    store.manifests.capacity = 2
+    for i in range(3):
+        publish(agent_id=f"dev.agent{i}")
+    for i in range(3):
+        client.get(f"/v1/agents/dev.agent{i}")
+    assert [k[0] for k in store.manifests._data] == ["dev.agent1", "dev.agent2"]
+
+
+def test_commits_from_another_process_clear_the_cache(client, publish):
+    publish(version="0.1.0")
+    assert client.get("/v1/agents/dev.echo").json()["version"] == "0.1.0"
+    # a second Store on the same root stands in for another uvicorn worker
+    other = Store(client.app.state.store.root)
+    tmp, sha = other.save_upload("a.aps.tar.gz", io.BytesIO(make_package(version="0.2.0")))
+    other.index_package(tmp, sha256=sha)
+    other.close()
+    assert client.get("/v1/agents/dev.echo").json()["version"] == "0.2.0"
@@ -0,0 +1,38 @@
+# registry/tests/test_package_info.py
+import hashlib
+
+
+def test_publish_records_digest_sizes_and_files(client, publish):
+    data = publish(version="0.1.0", extra=b"x" * 5000)
+    info = client.get("/v1/agents/dev.echo/package").json()
+    assert info["sha256"] == hashlib.sha256(data).hexdigest()
+    assert info["size"] == len(data)
+    assert info["file_count"] == 3
+    by_path = {f["path"]: f for f in info["files"]}
+    assert sorted(by_path) == ["aps/agent.yaml", "data/blob.bin", "src/main.py"]
+    assert by_path["data/blob.bin"]["sha256"] == hashlib.sha256(b"x" * 5000).hexdigest()
+    assert by_path["src/main.py"]["size"] == len(b"print('hi')\n")
+    assert info["unpacked_size"] == sum(f["size"] for f in info["files"])
+
+    brief = client.get("/v1/agents/dev.echo/package", params={"files": "false"}).json()
+    assert "files" not in brief and brief["file_count"] == 3
+    assert client.get("/v1/agents/dev.echo/package", params={"version": "9.9.9"}).status_code == 404
+
+
+def test_republish_replaces_listing(client, publish):
+    publish(version="0.1.0", extra=b"x")
+    publish(version="0.1.0")
+    info = client.get("/v1/agents/dev.echo/package", params={"version": "0.1.0"}).json()
+    assert [f["path"] for f in info["files"]] == ["aps/agent.yaml", "src/main.py"]
+
+
+def test_legacy_rows_are_backfilled(client, publish):
+    publish(version="0.1.0")
+    store = client.app.state.store
+    with store._conn() as conn:
+        conn.execute("UPDATE agents SET unpacked_size = NULL, file_count = NULL")
+        conn.execute("DELETE FROM package_files")
+    info = store.package_info("dev.echo")
+    assert info["file_count"] == 2 and len(info["files"]) == 2
+    with store._conn() as conn:
+        assert conn.execute("SELECT file_count FROM agents").fetchone()[0] == 2
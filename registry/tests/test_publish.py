@@ -0,0 +1,69 @@
+# registry/tests/test_publish.py
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aps_registry.server import create_app
+from aps_registry.store import CHUNK, Store, UploadTooLarge
+
+from conftest import make_package
+
+
+class _Chunked(io.BytesIO):
+    """File-like that records read sizes (the upload must never be read whole)."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.sizes = []
+
+    def read(self, n=-1):
+        self.sizes.append(n)
+        return super().read(n)
+
+
+def test_save_upload_streams_to_unique_files(tmp_path):
+    store = Store(str(tmp_path / "reg"))
+    payloads = [os.urandom(3 * CHUNK + i) for i in range(4)]
+    results = [None] * len(payloads)
+
+    def upload(i):
+        src = _Chunked(payloads[i])
+        results[i] = store.save_upload("agent.aps.tar.gz", src)
+        assert all(0 < n <= CHUNK for n in src.sizes)
+
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(len(payloads))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({path for path, _ in results}) == len(payloads)
+    for data, (path, sha) in zip(payloads, results):
+        assert sha == hashlib.sha256(data).hexdigest()
+        with open(path, "rb") as f:
+            assert f.read() == data
+
+
+def test_save_upload_enforces_limit(tmp_path):
+    store = Store(str(tmp_path / "reg"), max_upload=CHUNK)
+    with pytest.raises(UploadTooLarge):
+        store.save_upload("big.aps.tar.gz", io.BytesIO(os.urandom(CHUNK + 1)))
+    assert os.listdir(store.uploads_dir) == []
+
+
+def test_publish_limits_and_errors(tmp_path):
+    client = TestClient(create_app(str(tmp_path / "reg"), max_upload=64 * 1024))
+    ok = client.post("/v1/publish", files={"file": ("a.aps.tar.gz", make_package())})
+    assert ok.status_code == 200
+    assert ok.json()["agent"]["id"] == "dev.echo"
+
+    big = make_package(extra=os.urandom(256 * 1024))
+    assert client.post("/v1/publish", files={"file": ("a.aps.tar.gz", big)}).status_code == 413
+
+    bad = client.post("/v1/publish", files={"file": ("a.aps.tar.gz", b"not a tarball")})
+    assert bad.status_code == 400
+    assert os.listdir(tmp_path / "reg" / "uploads") == []
@@ -0,0 +1,94 @@
+# registry/tests/test_search.py
+import io
+
+import pytest
+
+from aps_registry.store import Store
+
+from conftest import make_package
+
+TOOLS = """capabilities:
+  tools:
+    - name: translate
+      description: Translate text between languages
+      inputs:
+        properties:
+          target_language: {type: string}
+metadata:
+  tags: [nlp, i18n]
+"""
+
+
+def _ids(client, **params):
+    r = client.get("/v1/search", params=params)
+    assert r.status_code == 200, r.text
+    return [a["id"] for a in r.json()["agents"]]
+
+
+def test_ranks_id_and_name_above_summary(client, publish):
+    publish(agent_id="dev.summarize", name="Summarizer", summary="Condense long documents")
+    publish(agent_id="dev.notes", name="Notes", summary="Keeps notes; can summarize them")
+    publish(agent_id="dev.echo", summary="Echo test agent")
+    assert _ids(client, q="summarize") == ["dev.summarize", "dev.notes"]
+    assert _ids(client, q="summ") == ["dev.summarize", "dev.notes"]  # prefix match
+    assert _ids(client, q="keeps notes") == ["dev.notes"]            # every term must match
+
+
+def test_matches_labels_and_capabilities(client, publish):
+    publish(agent_id="dev.translator", name="Translator", summary="Language helper", manifest_extra=TOOLS)
+    publish(agent_id="dev.echo")
+    assert _ids(client, q="i18n") == ["dev.translator"]
+    assert _ids(client, q="target_language") == ["dev.translator"]
+    assert _ids(client, q="between languages") == ["dev.translator"]
+
+
+def test_indexes_latest_version_only(client, publish):
+    publish(version="0.1.0", summary="old wording")
+    publish(version="0.2.0", summary="new wording")
+    assert _ids(client, q="old") == []
+    r = client.get("/v1/search", params={"q": "wording"}).json()
+    assert [(a["id"], a["version"], a["summary"]) for a in r["agents"]] == [("dev.echo", "0.2.0", "new wording")]
+
+
+def test_query_syntax_is_not_interpreted(client, publish):
+    publish()
+    for q in ['"', "echo OR", "NEAR(", "*", "-echo", "echo:"]:
+        assert client.get("/v1/search", params={"q": q}).status_code == 200
+
+
+def test_pagination_after(client, publish):
+    for i in range(5):
+        publish(agent_id=f"dev.agent{i}")
+    seen, after = [], None
+    while True:
+        params = {"limit": 2, **({"after": after} if after else {})}
+        body = client.get("/v1/search", params=params).json()
+        seen += [a["id"] for a in body["agents"]]
+        after = body["next"]
+        if after is None:
+            break
+    assert seen == [f"dev.agent{i}" for i in range(5)]
+    # same continuation token as /v1/agents; `cursor` still works as an alias
+    assert client.get("/v1/agents", params={"limit": 2}).json()["next"] == "dev.agent1"
+    assert client.get("/v1/search", params={"limit": 2, "cursor": "dev.agent1"}).json()["agents"][0]["id"] == "dev.agent2"
+    assert client.get("/v1/search", params={"q": "dev", "after": "nope"}).status_code == 400
+    assert client.get("/v1/search", params={"q": "dev", "limit": 2}).json()["next"] == "2"  # ranked: offset
+    assert client.get("/v1/search", params={"q": "dev", "cursor": "nope"}).status_code == 400
+    assert client.get("/v1/search", params={"limit": 0}).status_code == 422
+
+
+@pytest.mark.parametrize("has_fts", [True, False])
+def test_reopen_backfills_index_and_like_fallback(tmp_path, has_fts):
+    root = str(tmp_path / "registry")
+    store = Store(root)
+    tmp, sha = store.save_upload("a.aps.tar.gz", io.BytesIO(make_package(summary="Echo test agent")))
+    store.index_package(tmp, sha256=sha)
+    with store._conn() as conn:
+        conn.execute("DELETE FROM search_ids")  # pre-FTS database
+    store.close()
+
+    store = Store(root)
+    store.has_fts = has_fts
+    assert [a["id"] for a in store.search("echo")[0]] == ["dev.echo"]
+    assert store.search("missing") == ([], None)
+    store.close()
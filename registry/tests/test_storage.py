@@ -0,0 +1,98 @@
+# registry/tests/test_storage.py
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aps_registry.server import create_app
+from aps_registry.storage import (
+    BlobStorage, FilesystemStorage, S3Storage, ShardedFilesystemStorage, storage_from_spec,
+)
+
+from conftest import make_package
+
+
+def _publish(client, **kw) -> bytes:
+    data = make_package(**kw)
+    r = client.post("/v1/publish", files={"file": ("agent.aps.tar.gz", data)})
+    assert r.status_code == 200, r.text
+    return data
+
+
+@pytest.mark.parametrize("cls", [FilesystemStorage, ShardedFilesystemStorage])
+def test_filesystem_backends_roundtrip(tmp_path, cls):
+    storage = cls(str(tmp_path / "blobs"))
+    src = tmp_path / "pkg"
+    src.write_bytes(b"payload")
+    digest = hashlib.sha256(b"payload").hexdigest()
+    storage.put(digest, str(src))
+    assert not src.exists() and storage.exists(digest)
+    with storage.open(digest) as f:
+        assert f.read() == b"payload"
+
+    dup = tmp_path / "dup"
+    dup.write_bytes(b"payload")
+    storage.put(digest, str(dup))  # idempotent; source still consumed
+    assert not dup.exists()
+    assert not storage.exists("0" * 64)
+
+
+def test_sharded_layout_and_serving(tmp_path):
+    client = TestClient(create_app(str(tmp_path / "reg"), storage="sharded"))
+    data = _publish(client)
+    sha = hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "reg" / "blobs" / "sha256" / sha[:2] / sha[2:4] / sha).read_bytes() == data
+    assert client.get("/v1/agents/dev.echo/download").content == data
+    assert client.get("/v1/agents/dev.echo/package").json()["file_count"] == 2
+
+
+def test_storage_from_spec(tmp_path):
+    assert type(storage_from_spec(None, str(tmp_path))) is FilesystemStorage
+    assert type(storage_from_spec("sharded", str(tmp_path))) is ShardedFilesystemStorage
+    with pytest.raises(ValueError):
+        storage_from_spec("ftp://x", str(tmp_path))
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoOpen(BlobStorage):
+        def put(self, digest, src_path): pass
+        def exists(self, digest): return False
+
+    with pytest.raises(TypeError):
+        NoOpen()
+
+
+@pytest.fixture
+def s3():
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="aps")
+        yield client
+
+
+def test_s3_backend_redirects_to_presigned_url(tmp_path, s3):
+    import requests
+
+    client = TestClient(create_app(str(tmp_path / "reg"), storage=S3Storage("aps", "registry", client=s3)))
+    data = _publish(client, extra=os.urandom(1024))
+    sha = hashlib.sha256(data).hexdigest()
+    assert s3.head_object(Bucket="aps", Key=f"registry/sha256/{sha}")["ContentLength"] == len(data)
+    assert not (tmp_path / "reg" / "blobs").exists()
+
+    r = client.get("/v1/agents/dev.echo/download", follow_redirects=False)
+    assert r.status_code == 307
+    assert r.headers["x-aps-digest"] == f"sha256:{sha}"
+    assert requests.get(r.headers["location"]).content == data
+
+    # conditional GETs never leave the registry
+    r304 = client.get(f"/v1/blobs/sha256/{sha}", headers={"If-None-Match": f'"{sha}"'}, follow_redirects=False)
+    assert r304.status_code == 304
+    # metadata backfill reads through the backend
+    store = client.app.state.store
+    with store._conn() as conn:
+        conn.execute("UPDATE agents SET file_count = NULL")
+    assert client.get("/v1/agents/dev.echo/package").json()["file_count"] == 3
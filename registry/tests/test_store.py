@@ -0,0 +1,61 @@
+# registry/tests/test_store.py
+import io
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from aps_registry.store import Store
+
+from conftest import make_package
+
+
+def test_connections_are_per_thread_and_reused(tmp_path):
+    store = Store(str(tmp_path / "reg"))
+    main = store._conn()
+    assert store._conn() is main
+    assert main.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert main.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(store._conn()))
+    t.start()
+    t.join()
+    assert seen[0] is not main
+
+    store.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        main.execute("SELECT 1")
+    # usable again after close (fresh connection)
+    assert store.search("") == ([], None)
+
+
+def _publish_versions(root, worker, count):
+    # a fresh Store per process, like one uvicorn worker each
+    store = Store(root)
+    for i in range(count):
+        tmp, sha = store.save_upload("a.aps.tar.gz", io.BytesIO(make_package(version=f"{worker}.{i}.0")))
+        store.index_package(tmp, sha256=sha)
+    store.close()
+
+
+def test_concurrent_worker_processes_publish_safely(tmp_path):
+    root = str(tmp_path / "reg")  # schema is created by whichever worker starts first
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_publish_versions, args=(root, w, 5)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert [p.exitcode for p in procs] == [0] * 4
+
+    store = Store(root)
+    with store._conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM agents").fetchone()[0] == 20
+        assert conn.execute("SELECT COUNT(DISTINCT version) FROM package_files").fetchone()[0] == 20
+    assert store.latest_version("dev.echo") == "3.4.0"
+    assert store.search("echo")[0][0]["version"] == "3.4.0"
+    assert store.package_info("dev.echo", "0.0.0")["file_count"] == 2
+    assert list(os.scandir(store.uploads_dir)) == []
@@ -0,0 +1,52 @@
+# registry/tests/test_versions.py
+import random
+import sqlite3
+
+from aps_registry.store import Store, version_sort_key
+
+# semver.org precedence example, plus numeric-vs-lexical traps
+ORDERED = [
+    "0.0.9", "0.0.10", "0.1.0", "0.9.0", "0.10.0",
+    "1.0.0-alpha", "1.0.0-alpha.1", "1.0.0-alpha.beta", "1.0.0-beta",
+    "1.0.0-beta.2", "1.0.0-beta.11", "1.0.0-rc.1", "1.0.0",
+    "1.9.0", "1.10.0", "2.0.0", "10.0.0", "123456789012.0.0",
+]
+
+
+def test_sort_key_matches_semver_precedence():
+    shuffled = ORDERED[:]
+    random.Random(0).shuffle(shuffled)
+    assert sorted(shuffled, key=version_sort_key) == ORDERED
+    assert version_sort_key("v1.2.3+build.7") == version_sort_key("1.2.3")
+    assert version_sort_key("1.2") == version_sort_key("1.2.0")
+    assert version_sort_key("nightly") < version_sort_key("0.0.0")
+
+
+def test_latest_version_is_an_indexed_semver_lookup(tmp_path, client, publish):
+    for v in ["0.0.9", "0.0.10", "0.0.10-rc.1", "0.0.2"]:
+        publish(version=v)
+    assert client.get("/v1/agents/dev.echo").json()["version"] == "0.0.10"
+    # search lists each id once, at its latest version
+    assert [a["version"] for a in client.get("/v1/search").json()["agents"]] == ["0.0.10"]
+
+    store = client.app.state.store
+    plan = store._conn().execute(
+        "EXPLAIN QUERY PLAN SELECT version FROM agents WHERE id = ? ORDER BY sort_key DESC LIMIT 1",
+        ("dev.echo",),
+    ).fetchall()
+    detail = " ".join(row[-1] for row in plan)
+    assert "agents_id_sort_key" in detail and "TEMP B-TREE" not in detail
+
+
+def test_migration_backfills_sort_key(tmp_path):
+    root = tmp_path / "old"
+    root.mkdir()
+    with sqlite3.connect(root / "index.db") as conn:
+        conn.execute("CREATE TABLE agents (id TEXT NOT NULL, version TEXT NOT NULL, name TEXT, "
+                     "summary TEXT, manifest TEXT NOT NULL, PRIMARY KEY (id, version))")
+        for v in ["0.0.9", "0.0.10"]:
+            conn.execute("INSERT INTO agents VALUES ('dev.echo', ?, 'Echo', '', ?)", (v, f'{{"version": "{v}"}}'))
+
+    store = Store(str(root))
+    assert store.latest_version("dev.echo") == "0.0.10"
+    assert store.get_agent("dev.echo") == {"version": "0.0.10"}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+#
+# Registry throughput benchmark
+# Seeds a throwaway registry root, serves it with aps_registry.server.serve
+# (uvicorn, --workers N processes) and drives search / get /
+# download / publish from concurrent client processes (one keep-alive session
+# each). Prints requests/sec and latency percentiles per endpoint; with several
+# worker counts (--workers 1,2,4) it repeats the run for each and prints the
+# scaling relative to the first.
+#
+# Usage:
+#   python scripts/bench_registry.py [--agents 200] [--versions 3] [--workers 1,2,4]
+#                                    [--concurrency 16] [--duration 5] [--port 18080]
+#                                    [--endpoints search,get,download,publish]
+#
+
+import argparse, io, multiprocessing, os, random, subprocess, sys, tarfile, tempfile, time
+
+import requests
+
+
+def make_package(agent_id: str, version: str) -> bytes:
+    manifest = (
+        f"aps_version: 0.1\nid: {agent_id}\nname: {agent_id}\nversion: {version}\n"
+        f"summary: benchmark agent {agent_id}\n"
+        "runtimes:\n  - kind: python\n    entrypoint: python src/main.py\n"
+    ).encode("utf-8")
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in (("aps/agent.yaml", manifest), ("src/main.py", b"print('hi')\n" * 200)):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def seed(root: str, agents: int, versions: int):
+    from aps_registry.store import Store
+    store = Store(root)
+    for a in range(agents):
+        for v in range(versions):
+            tmp, sha = store.save_upload("bench.aps.tar.gz", io.BytesIO(make_package(f"bench.agent-{a}", f"1.{v}.0")))
+            store.index_package(tmp, sha256=sha)
+    store.close()
+
+
+def client(args):
+    base, endpoint, agents, deadline, seed_ = args
+    rnd = random.Random(seed_)
+    http = requests.Session()
+    lat = []
+    n = 0
+    while time.time() < deadline:
+        agent_id = f"bench.agent-{rnd.randrange(agents)}"
+        if endpoint == "publish":
+            # new versions of existing agents: concurrent writers across workers
+            n += 1
+            body = make_package(agent_id, f"2.{seed_}.{n}-{int(deadline)}")
+            t0 = time.perf_counter()
+            r = http.post(f"{base}/v1/publish", files={"file": ("a.aps.tar.gz", body)}, timeout=30)
+            r.raise_for_status()
+            lat.append(time.perf_counter() - t0)
+            continue
+        url = {
+            "search": f"{base}/v1/search?q={agent_id}",
+            "get": f"{base}/v1/agents/{agent_id}",
+            "download": f"{base}/v1/agents/{agent_id}/download",
+        }[endpoint]
+        t0 = time.perf_counter()
+        r = http.get(url, timeout=30)
+        r.raise_for_status()
+        _ = r.content
+        lat.append(time.perf_counter() - t0)
+    return lat
+
+
+def wait_healthy(base: str, proc, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"[bench] server exited with {proc.returncode}")
+        try:
+            if requests.get(f"{base}/healthz", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            time.sleep(0.1)
+    sys.exit("[bench] server did not become healthy")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--agents", type=int, default=200)
+    ap.add_argument("--versions", type=int, default=3)
+    ap.add_argument("--workers", default="1", help="uvicorn worker processes; comma list to compare (1,2,4)")
+    ap.add_argument("--concurrency", type=int, default=16, help="client processes")
+    ap.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint")
+    ap.add_argument("--port", type=int, default=18080)
+    ap.add_argument("--endpoints", default="search,get,download")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        t0 = time.time()
+        seed(root, args.agents, args.versions)
+        print(f"[bench] seeded {args.agents * args.versions} packages in {time.time() - t0:.1f}s "
+              f"(cpus={os.cpu_count()})")
+
+        base = f"http://127.0.0.1:{args.port}"
+        env = dict(os.environ, APS_REGISTRY_ROOT=root)
+        endpoints = args.endpoints.split(",")
+        rates = {}  # (workers, endpoint) -> req/s
+        for workers in [int(w) for w in args.workers.split(",")]:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "aps_registry.server", "--root", root, "--port", str(args.port),
+                 "--workers", str(workers), "--log-level", "warning"],
+                env=env,
+            )
+            try:
+                wait_healthy(base, proc)
+                print(f"[bench] workers={workers} concurrency={args.concurrency} duration={args.duration}s")
+                with multiprocessing.Pool(args.concurrency) as pool:
+                    for endpoint in endpoints:
+                        deadline = time.time() + args.duration
+                        jobs = [(base, endpoint, args.agents, deadline, i) for i in range(args.concurrency)]
+                        lat = sorted(x for part in pool.map(client, jobs) for x in part)
+                        n = len(lat)
+                        pct = lambda q: lat[min(n - 1, int(q * n))] * 1000 if n else 0.0
+                        rates[workers, endpoint] = n / args.duration
+                        print(f"  {endpoint:<9} {n / args.duration:8.0f} req/s   "
+                              f"p50={pct(0.50):6.2f}ms  p95={pct(0.95):6.2f}ms  p99={pct(0.99):6.2f}ms")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+        counts = sorted({w for w, _ in rates}, key=[int(w) for w in args.workers.split(",")].index)
+        if len(counts) > 1:
+            print("[bench] scaling vs workers=%d" % counts[0])
+            print("  " + "endpoint ".ljust(10) + "".join(f"{f'w={w}':>10}" for w in counts))
+            for endpoint in endpoints:
+                base_rate = rates[counts[0], endpoint] or 1.0
+                print("  " + endpoint.ljust(10) + "".join(f"{rates[w, endpoint] / base_rate:>9.2f}x" for w in counts))
+
+
+if __name__ == "__main__":
+    main()
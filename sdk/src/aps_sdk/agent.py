@@ -1,18 +1,29 @@
-import json, sys
+import json, os, sys
+
+def _respond(fn, raw: str) -> dict:
+    if not raw:
+        return {"status":"error","message":"empty"}
+    try:
+        req = json.loads(raw)
+    except Exception as e:
+        return {"status":"error","message":f"invalid json: {e}"}
+    if isinstance(req, dict) and req.get("operation") == "ping":
+        return {"status":"ok","outputs":{"pong": True}}
+    try:
+        out = fn(req.get("inputs") or {})
+        return {"status":"ok","outputs": out}
+    except Exception as e:
+        return {"status":"error","message":str(e)}
 
 def handler(fn):
     def _main():
+        # Persistent worker (APS_WORKER=1): one envelope per stdin line, one final frame per request
+        if os.environ.get("APS_WORKER") == "1":
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    print(json.dumps(_respond(fn, line)), flush=True)
+            return
         raw = sys.stdin.read().strip()
-        if not raw:
-            print(json.dumps({"status":"error","message":"empty"})); return
-        try:
-            req = json.loads(raw)
-        except Exception as e:
-            print(json.dumps({"status":"error","message":f"invalid json: {e}"})); return
-        try:
-            out = fn(req.get("inputs") or {})
-            print(json.dumps({"status":"ok","outputs": out}))
-        except Exception as e:
-            print(json.dumps({"status":"error","message":str(e)}))
+        print(json.dumps(_respond(fn, raw)))
     return _main
-
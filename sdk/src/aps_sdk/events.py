@@ -0,0 +1,41 @@
+import json, sys, os
+from typing import Optional
+
+# Structured events for `aps run --events jsonl` (see docs/specs/streaming.md).
+# When the CLI sets APS_EVENTS=jsonl each helper writes one line
+#   {"aps_event": "<type>", ...fields}
+# to stdout; the "aps_event" key comes first so the CLI classifies lines with a
+# prefix check. Without APS_EVENTS, log/progress fall back to plain stderr text
+# and the rest are no-ops, so agents behave the same under plain `aps run`.
+
+def enabled() -> bool:
+    return os.environ.get("APS_EVENTS") == "jsonl"
+
+def _emit(kind: str, **fields):
+    sys.stdout.write(json.dumps({"aps_event": kind, **fields}) + "\n")
+    sys.stdout.flush()
+
+def log(line: str, level: str = "info"):
+    if enabled():
+        _emit("log", line=line, level=level)
+    else:
+        print(line, file=sys.stderr, flush=True)
+
+def progress(current, total=None, message: Optional[str] = None):
+    if enabled():
+        _emit("progress", current=current, total=total, message=message)
+    else:
+        frac = f"{current}/{total}" if total is not None else f"{current}"
+        print(f"[progress] {frac}" + (f" {message}" if message else ""), file=sys.stderr, flush=True)
+
+def token(text: str):
+    if enabled():
+        _emit("token", text=text)
+
+def partial_output(outputs: dict):
+    if enabled():
+        _emit("partial_output", outputs=outputs)
+
+def metric(name: str, value, unit: Optional[str] = None):
+    if enabled():
+        _emit("metric", name=name, value=value, unit=unit)